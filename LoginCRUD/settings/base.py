@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,6 +49,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'Texcore.middleware.StatementTimeoutMiddleware',
 ]
 
 ROOT_URLCONF = 'LoginCRUD.urls'
@@ -73,12 +75,94 @@ WSGI_APPLICATION = 'LoginCRUD.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DATABASE_ENGINE selects the backend: 'sqlite' (default) or 'postgresql'.
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite').lower()
+
+# statement_timeout on PostgreSQL: the default is set once per connection;
+# report and export views raise it to the report budget while they run
+# (Texcore.middleware.StatementTimeoutMiddleware). 0 disables the timeout.
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', '5000'))
+DB_REPORT_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_REPORT_STATEMENT_TIMEOUT_MS', '30000'))
+
+if DATABASE_ENGINE == 'postgresql':
+    # psycopg 3 connection pool per worker. Pooling and CONN_MAX_AGE are
+    # mutually exclusive in Django, so persistent connections are only used
+    # when the pool is disabled (e.g. behind pgbouncer).
+    POSTGRES_POOL = os.environ.get('POSTGRES_POOL', 'True').lower() == 'true'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'textilapp'),
+            'USER': os.environ.get('POSTGRES_USER', 'textilapp_user'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': 0 if POSTGRES_POOL else int(os.environ.get('CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('POSTGRES_POOL_MIN_SIZE', '2')),
+                    'max_size': int(os.environ.get('POSTGRES_POOL_MAX_SIZE', '10')),
+                    'timeout': int(os.environ.get('POSTGRES_POOL_TIMEOUT', '10')),
+                } if POSTGRES_POOL else False,
+                # Server-side binding lets psycopg prepare repeated statements
+                # after `prepare_threshold` executions (0/None disables it).
+                'server_side_binding': True,
+                'prepare_threshold': int(os.environ.get('POSTGRES_PREPARE_THRESHOLD', '5')) or None,
+                # Session default, sent with the connection startup: no extra round trip
+                'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}',
+            },
+        }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        }
+    }
+
+# Reports and exports read from this alias when it is configured
+# (see Texcore/routers.py); otherwise they use 'default'.
+DATABASE_ROUTERS = ['Texcore.routers.ReportingRouter']
+REPORTING_DB_ALIAS = 'reporting'
+
+# Cached dashboard statistics (Texcore/services/cache_service.py). Writes bump
+# the key version; the timeout is only a safety net. DASHBOARD_CACHE=False
+# bypasses this cache and the report cache, e.g. to debug the queries of a dashboard.
+DASHBOARD_CACHE = os.environ.get('DASHBOARD_CACHE', 'True').lower() == 'true'
+DASHBOARD_CACHE_TIMEOUT = int(os.environ.get('DASHBOARD_CACHE_TIMEOUT', '300'))
+# Hit/miss counts (manage.py estadisticas_cache) are kept per process and
+# added to the shared counters at most this often, so hits do not write
+DASHBOARD_CACHE_STATS_INTERVAL = int(os.environ.get('DASHBOARD_CACHE_STATS_INTERVAL', '60'))
+
+# Cached report summaries (the statistics; the rows are always streamed fresh),
+# per filter set: seconds a value is served without recomputing (staleness
+# budget), seconds a stale value may still be served while one worker
+# recomputes it, and how long that worker holds the recompute lock.
+REPORT_CACHE_MAX_AGE = {
+    'reporte_preparaciones': int(os.environ.get('REPORT_CACHE_MAX_AGE_PREPARACIONES', '60')),
+    'reporte_hilaturas': int(os.environ.get('REPORT_CACHE_MAX_AGE_HILATURAS', '60')),
 }
+REPORT_CACHE_TIMEOUT = int(os.environ.get('REPORT_CACHE_TIMEOUT', '3600'))
+REPORT_CACHE_LOCK_TIMEOUT = int(os.environ.get('REPORT_CACHE_LOCK_TIMEOUT', '30'))
+
+# Rows per page in the list views (keyset pagination, see Texcore/paginacion.py)
+PAGINACION_TAMANO = int(os.environ.get('PAGINACION_TAMANO', '50'))
+
+# Report pages stream their table; rows read and rendered per block
+REPORTE_BLOQUE_FILAS = int(os.environ.get('REPORTE_BLOQUE_FILAS', '2000'))
+
+# Excel reports are written within the request (about 3,500 rows/s); larger
+# exports are refused so one stays well inside gunicorn's 120 s timeout.
+# CSV exports stream and have no limit.
+EXPORTACION_XLSX_MAX_FILAS = int(os.environ.get('EXPORTACION_XLSX_MAX_FILAS', '200000'))
+
+# Columnar snapshot for analysts (`manage.py exportar_analitica`, see Texcore/analitica.py):
+# DuckDB file, directory of Parquet files ('' for none) and rows per batch
+ANALITICA_DUCKDB_PATH = os.environ.get('ANALITICA_DUCKDB_PATH', str(BASE_DIR / 'analitica' / 'texcore.duckdb'))
+ANALITICA_PARQUET_DIR = os.environ.get('ANALITICA_PARQUET_DIR', str(BASE_DIR / 'analitica'))
+ANALITICA_LOTE_FILAS = int(os.environ.get('ANALITICA_LOTE_FILAS', '10000'))
 
 
 # Password validation
@@ -121,6 +205,9 @@ STATICFILES_DIRS = [BASE_DIR / "Texcore" / "static"]
 # Static files collected for production
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# ModelBackend that joins the Profile into the per-request user lookup
+AUTHENTICATION_BACKENDS = ['Texcore.backends.PerfilModelBackend']
+
 # Where to redirect users to log in (used by login_required)
 LOGIN_URL = '/login/'
 # After successful login, redirect here by default
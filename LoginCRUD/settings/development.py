@@ -9,10 +9,4 @@ DEBUG = True
 
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', 'testserver']
 
-# Database for development
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
\ No newline at end of file
+# Database for development: SQLite unless DATABASE_ENGINE=postgresql (see base.py)
@@ -20,13 +20,50 @@ RENDER_EXTERNAL_HOSTNAME = os.environ.get('RENDER_EXTERNAL_HOSTNAME')
 if RENDER_EXTERNAL_HOSTNAME:
     ALLOWED_HOSTS.append(RENDER_EXTERNAL_HOSTNAME)
 
-# Database configuration - SQLite (persistent in container)
-DATABASES = {
-    'default': {
+# Database configuration - SQLite (persistent in container) by default,
+# PostgreSQL with DATABASE_ENGINE=postgresql (see base.py)
+
+# SQLite tuning applied on every new connection (see Texcore/sqlite_tuning.py).
+# WAL lets the gunicorn workers read while another one writes; NORMAL sync is
+# safe with WAL and avoids an fsync per commit.
+SQLITE_TUNING = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', str(128 * 1024 * 1024))),
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', '-20000')),  # negative = KiB
+    'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'MEMORY'),
+}
+if os.environ.get('SQLITE_TUNING', 'True').lower() != 'true':
+    SQLITE_TUNING = {}
+
+# Reporting database - read-only snapshot of db.sqlite3 refreshed by
+# `manage.py refrescar_snapshot_reportes`. Set REPORTING_DB=off to read
+# reports from the main database.
+# On PostgreSQL use REPORTING_DB=replica and POSTGRES_REPLICA_HOST instead.
+REPORTING_DB = os.environ.get('REPORTING_DB', 'snapshot' if DATABASE_ENGINE == 'sqlite' else 'off').lower()
+if REPORTING_DB == 'snapshot':
+    REPORTING_SNAPSHOT_PATH = os.environ.get('REPORTING_SNAPSHOT_PATH', str(BASE_DIR / 'reporting.sqlite3'))
+    DATABASES[REPORTING_DB_ALIAS] = {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': f'file:{REPORTING_SNAPSHOT_PATH}?mode=ro&immutable=1',
+        'TEST': {'MIRROR': 'default'},
+    }
+elif REPORTING_DB == 'replica':
+    from psycopg import IsolationLevel
+
+    DATABASES[REPORTING_DB_ALIAS] = {
+        **DATABASES['default'],
+        'HOST': os.environ.get('POSTGRES_REPLICA_HOST', DATABASES['default']['HOST']),
+        'PORT': os.environ.get('POSTGRES_REPLICA_PORT', DATABASES['default']['PORT']),
+        'OPTIONS': {
+            **DATABASES['default']['OPTIONS'],
+            # One snapshot for the whole report transaction
+            'isolation_level': IsolationLevel.REPEATABLE_READ,
+            'options': f'-c statement_timeout={DB_REPORT_STATEMENT_TIMEOUT_MS}',
+        },
+        'TEST': {'MIRROR': 'default'},
     }
-}
 
 # Security settings
 SECURE_BROWSER_XSS_FILTER = True
@@ -48,6 +85,39 @@ STATICFILES_FINDERS = [
     'django.contrib.staticfiles.finders.AppDirectoriesFinder',
 ]
 
+# Templates: parsed once per worker and kept in memory (cached loader, even
+# with DEBUG=True), and compiled when the worker boots (see LoginCRUD/wsgi.py)
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+PRECOMPILAR_PLANTILLAS = os.environ.get('PRECOMPILAR_PLANTILLAS', 'True').lower() == 'true'
+
+# Cache shared by all gunicorn workers on the host (Texcore/cache_sqlite.py):
+# dashboards, reports and their version counters must be the same in every
+# worker, and there is no cache server. Kept apart from the database file so
+# cache writes never wait for the application's write lock.
+CACHES = {
+    'default': {
+        'BACKEND': 'Texcore.cache_sqlite.SQLiteCache',
+        'LOCATION': os.environ.get('CACHE_SQLITE_PATH', str(BASE_DIR / 'cache.sqlite3')),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '20000')),
+            'MAX_BYTES': int(os.environ.get('CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+        },
+    }
+}
+
 # Add WhiteNoise for static file serving
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -58,6 +128,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'Texcore.middleware.StatementTimeoutMiddleware',
 ]
 
 # WhiteNoise configuration
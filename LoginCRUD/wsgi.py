@@ -14,3 +14,14 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LoginCRUD.settings')
 
 application = get_wsgi_application()
+
+# Compile every template before this worker accepts requests (production)
+from django.conf import settings  # noqa: E402
+
+if getattr(settings, 'PRECOMPILAR_PLANTILLAS', False):
+    import logging
+
+    from Texcore.plantillas import precompilar_plantillas
+
+    for nombre, error in precompilar_plantillas()[1]:
+        logging.getLogger(__name__).error('Template %s failed to compile: %s', nombre, error)
@@ -1,7 +1,11 @@
+from django import forms
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import Materia, Profile, PreparacionMateria, DetallePreparacion, ProcesoHilatura, DetalleHilatura
+from .models import (
+    Materia, MovimientoStock, Profile, PreparacionMateria, DetallePreparacion, ProcesoHilatura, DetalleHilatura
+)
+from .services import contador_service, materia_service, preparacion_service, resumen_service, stock_service
 
 
 class ProfileInline(admin.StackedInline):
@@ -10,6 +14,32 @@ class ProfileInline(admin.StackedInline):
     verbose_name_plural = 'Perfil'
 
 
+class EstadisticasAdminMixin:
+    """Keep the state counters and daily rollups in sync with admin edits and deletes."""
+
+    def save_model(self, request, obj, form, change):
+        anterior = self.model.objects.get(pk=obj.pk) if change else None
+        super().save_model(request, obj, form, change)
+        if anterior is None:
+            contador_service.registrar_alta(obj)
+            resumen_service.registrar_alta(obj)
+        else:
+            dimensiones = contador_service.DIMENSIONES[self.model]
+            contador_service.registrar_cambio(obj, **{d: getattr(anterior, d) for d in dimensiones})
+            resumen_service.registrar_cambio(resumen_service.aportes(anterior), obj)
+
+    def delete_model(self, request, obj):
+        contador_service.registrar_baja(obj)
+        resumen_service.registrar_baja(obj)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        contador_service.registrar_bajas(queryset)
+        for obj in queryset:
+            resumen_service.registrar_baja(obj)
+        super().delete_queryset(request, queryset)
+
+
 class UserAdmin(BaseUserAdmin):
     inlines = (ProfileInline,)
 
@@ -20,12 +50,53 @@ class MateriaAdmin(admin.ModelAdmin):
     list_filter = ('tipo', 'fecha_ingreso', 'usuario_registro')
     search_fields = ('tipo', 'lote', 'usuario_registro__username')
     ordering = ('-id',)
-    readonly_fields = ('usuario_registro',)
+    # The reservation belongs to the preparations that hold it
+    readonly_fields = ('usuario_registro', 'cantidad_reservada')
+
+    def get_readonly_fields(self, request, obj=None):
+        # Stock of existing materias only changes through MovimientoStock
+        if obj is not None:
+            return self.readonly_fields + ('cantidad',)
+        return self.readonly_fields
 
     def save_model(self, request, obj, form, change):
+        anterior = Materia.objects.get(pk=obj.pk) if change else None
+        aportes_previos = resumen_service.aportes(anterior) if change else {}
         if not change:  # If creating new object
             obj.usuario_registro = request.user
-        super().save_model(request, obj, form, change)
+            super().save_model(request, obj, form, change)
+        elif form.changed_data:
+            # Only the edited columns: a full-row save would write back the
+            # balances read with the form over concurrent stock_service UPDATEs
+            obj.save(update_fields=form.changed_data + ['updated_at'])
+        resumen_service.registrar_cambio(aportes_previos, obj)
+        if anterior is not None and obj.tipo != anterior.tipo:
+            resumen_service.registrar_cambio_tipo_materia(obj, anterior.tipo)
+
+    def delete_model(self, request, obj):
+        # Cascaded preparations leave the counters and rollups in the service
+        materia_service.eliminar_materia(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            materia_service.eliminar_materia(obj)
+
+
+@admin.register(MovimientoStock)
+class MovimientoStockAdmin(admin.ModelAdmin):
+    list_display = ('id', 'materia', 'tipo', 'cantidad', 'saldo_resultante', 'usuario', 'fecha')
+    list_filter = ('tipo', 'fecha')
+    search_fields = ('materia__tipo', 'materia__lote', 'usuario__username')
+    ordering = ('-fecha',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Profile)
@@ -40,8 +111,44 @@ admin.site.unregister(User)
 admin.site.register(User, UserAdmin)
 
 
+class PreparacionMateriaAdminForm(forms.ModelForm):
+    """Check the stock a new or edited preparation needs before saving it."""
+
+    class Meta:
+        model = PreparacionMateria
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        anterior = self.instance
+        materia = cleaned_data.get('materia_prima', anterior.materia_prima)
+        cantidad = cleaned_data.get('cantidad_procesada', anterior.cantidad_procesada)
+        estado = cleaned_data.get('estado', anterior.estado)
+        necesita_stock = estado in preparacion_service.ESTADOS_CON_RESERVA or (
+            estado == 'completada' and anterior.estado != 'completada'
+        )
+        if materia is None or cantidad is None or not necesita_stock:
+            return cleaned_data
+        # What this preparation reserves now is available to it again
+        liberada = 0
+        if (anterior.pk and anterior.estado in preparacion_service.ESTADOS_CON_RESERVA
+                and anterior.materia_prima_id == materia.pk):
+            liberada = anterior.cantidad_procesada
+        materia.refresh_from_db(fields=['cantidad', 'cantidad_reservada', 'cantidad_disponible'])
+        valido, error_msg = preparacion_service.validar_stock_disponible(materia, cantidad - liberada)
+        if not valido:
+            raise forms.ValidationError(error_msg)
+        return cleaned_data
+
+
 @admin.register(PreparacionMateria)
-class PreparacionMateriaAdmin(admin.ModelAdmin):
+class PreparacionMateriaAdmin(EstadisticasAdminMixin, admin.ModelAdmin):
+    """
+    Stock moves with the preparation: new ones reserve their quantity, edits
+    go through preparacion_service.actualizar_preparacion() (which moves,
+    releases or consumes the reservation) and deletes release it.
+    """
+    form = PreparacionMateriaAdminForm
     list_display = ('id', 'materia_prima', 'tipo_proceso', 'estado', 'cantidad_procesada', 
                    'usuario_preparador', 'fecha_inicio')
     list_filter = ('estado', 'tipo_proceso', 'calidad_resultado', 'fecha_inicio')
@@ -49,6 +156,31 @@ class PreparacionMateriaAdmin(admin.ModelAdmin):
     ordering = ('-fecha_inicio',)
     readonly_fields = ('fecha_inicio', 'fecha_completado')
 
+    def get_readonly_fields(self, request, obj=None):
+        if obj is None:
+            # New preparations start pending, holding a reservation
+            return self.readonly_fields + ('estado',)
+        if obj.estado == 'completada':
+            # Its stock was already consumed
+            return self.readonly_fields + ('materia_prima', 'cantidad_procesada', 'estado')
+        return self.readonly_fields
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            preparacion_service.actualizar_preparacion(obj, usuario=request.user)
+            return
+        if obj.materia_prima_id and not stock_service.reservar_stock(obj.materia_prima, obj.cantidad_procesada):
+            _, error_msg = preparacion_service.validar_stock_disponible(obj.materia_prima, obj.cantidad_procesada)
+            raise ValueError(error_msg)
+        super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        preparacion_service.eliminar_preparacion(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset.select_related('materia_prima'):
+            preparacion_service.eliminar_preparacion(obj)
+
 
 @admin.register(DetallePreparacion)
 class DetallePreparacionAdmin(admin.ModelAdmin):
@@ -60,7 +192,7 @@ class DetallePreparacionAdmin(admin.ModelAdmin):
 
 
 @admin.register(ProcesoHilatura)
-class ProcesoHilaturaAdmin(admin.ModelAdmin):
+class ProcesoHilaturaAdmin(EstadisticasAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'etapa', 'estado', 'cantidad_fibra_entrada', 'cantidad_hilo_salida',
                    'rendimiento_proceso', 'usuario_operador', 'fecha_inicio')
     list_filter = ('estado', 'etapa', 'calidad_resultado', 'fecha_inicio')
@@ -0,0 +1,217 @@
+"""
+Columnar analytics snapshot - the production tables copied to DuckDB and Parquet.
+
+Analysts run their yield and quality studies against these files instead of
+the application database. `manage.py exportar_analitica` refreshes them:
+
+- Each table is copied incrementally. Rows whose updated_at is at or after
+  the newest one copied by the previous run (minus MARGEN) are read in
+  batches and upserted by primary key. Rows deleted from the source are
+  found by comparing primary keys, only when the row counts differ.
+- Columns are typed from the model fields: DecimalField becomes
+  DECIMAL(max_digits, decimal_places), datetimes TIMESTAMPTZ in UTC, foreign
+  keys the id of the related row. Choice fields keep their codes. A model
+  whose columns changed is copied again from scratch.
+- Each batch goes from values_list() to DuckDB as an Arrow table, which
+  DuckDB scans in one statement instead of one insert per row.
+- Then each table is written to `<directorio>/<tabla>.parquet` through a
+  temporary file, so readers never see a half-written file.
+
+Reads go through lectura_de_reportes(): with the reporting snapshot or
+replica configured, the export does not touch the database the app writes
+to. The DuckDB file is locked while a run writes to it; analysts should read
+the Parquet files, or open the DuckDB file read-only between runs.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Dict, List, Optional, Tuple, Type
+
+import duckdb
+import pyarrow as pa
+from django.conf import settings
+from django.db import models
+
+from .models import Materia, PreparacionMateria, DetallePreparacion, ProcesoHilatura, DetalleHilatura
+from .routers import lectura_de_reportes
+
+MODELOS: List[Type[models.Model]] = [
+    Materia, PreparacionMateria, DetallePreparacion, ProcesoHilatura, DetalleHilatura
+]
+
+# Rows changed this long before the previous watermark are read again: a
+# transaction that set updated_at before that run but committed after it
+# is still copied. Upserts make reading a row twice harmless.
+MARGEN = timedelta(minutes=5)
+
+# Per-table state: column signature, watermark and row count
+TABLA_ESTADO = '_estado_snapshot'
+
+# (column, DuckDB type, Arrow type)
+Columna = Tuple[str, str, pa.DataType]
+
+EPOCA = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _tipos(campo: models.Field) -> Tuple[str, pa.DataType]:
+    """DuckDB and Arrow types of a model field's column."""
+    if isinstance(campo, models.GeneratedField):
+        campo = campo.output_field
+    if isinstance(campo, models.ForeignKey):
+        campo = campo.target_field
+    if isinstance(campo, models.DecimalField):
+        return (f'DECIMAL({campo.max_digits},{campo.decimal_places})',
+                pa.decimal128(campo.max_digits, campo.decimal_places))
+    if isinstance(campo, models.BigIntegerField):
+        return 'BIGINT', pa.int64()
+    if isinstance(campo, models.IntegerField):
+        return 'INTEGER', pa.int32()
+    if isinstance(campo, models.DateTimeField):
+        return 'TIMESTAMPTZ', pa.timestamp('us', tz='UTC')
+    if isinstance(campo, models.DateField):
+        return 'DATE', pa.date32()
+    if isinstance(campo, models.BooleanField):
+        return 'BOOLEAN', pa.bool_()
+    if isinstance(campo, models.FloatField):
+        return 'DOUBLE', pa.float64()
+    if isinstance(campo, (models.CharField, models.TextField)):
+        return 'VARCHAR', pa.string()
+    raise ValueError(f'{campo.model.__name__}.{campo.name}: sin tipo columnar para {type(campo).__name__}')
+
+
+def columnas(modelo: Type[models.Model]) -> List[Columna]:
+    """Columns of the snapshot table of `modelo`, in field order."""
+    return [
+        (campo.attname, tipo if campo.null else f'{tipo} NOT NULL', tipo_arrow)
+        for campo in modelo._meta.concrete_fields
+        for tipo, tipo_arrow in [_tipos(campo)]
+    ]
+
+
+def _citar(ruta: str) -> str:
+    """SQL string literal for a path (COPY does not take parameters)."""
+    return "'" + ruta.replace("'", "''") + "'"
+
+
+def _lote_arrow(filas: List[tuple], columnas_tabla: List[Columna]) -> pa.Table:
+    valores = list(zip(*filas))
+    return pa.Table.from_arrays(
+        [pa.array(columna, type=tipo) for columna, (_, _, tipo) in zip(valores, columnas_tabla)],
+        names=[nombre for nombre, _, _ in columnas_tabla],
+    )
+
+
+def _sincronizar(
+    conexion: duckdb.DuckDBPyConnection,
+    modelo: Type[models.Model],
+    tamano_lote: int,
+    completo: bool
+) -> Dict[str, int]:
+    """Bring the table of `modelo` up to date; return rows copied, deleted and total."""
+    tabla = modelo._meta.model_name
+    columnas_tabla = columnas(modelo)
+    nombres = [nombre for nombre, _, _ in columnas_tabla]
+    pk = modelo._meta.pk.attname
+    firma = ', '.join(f'{nombre} {tipo}' for nombre, tipo, _ in columnas_tabla)
+    indice_marca = nombres.index('updated_at')
+
+    # Read as microseconds: TIMESTAMPTZ values need pytz on the Python side
+    estado = conexion.execute(
+        f'SELECT firma, epoch_us(marca) FROM {TABLA_ESTADO} WHERE tabla = ?', [tabla]
+    ).fetchone()
+    nueva = completo or estado is None or estado[0] != firma
+    marca = None if nueva or estado[1] is None else EPOCA + timedelta(microseconds=estado[1])
+
+    conexion.begin()
+    try:
+        if nueva:
+            conexion.execute(f'DROP TABLE IF EXISTS {tabla}')
+            conexion.execute(f'CREATE TABLE {tabla} ({firma}, PRIMARY KEY ({pk}))')
+
+        copiadas = borradas = 0
+        with lectura_de_reportes():
+            queryset = modelo.objects.order_by()
+            if marca is not None:
+                queryset = queryset.filter(updated_at__gte=marca - MARGEN)
+            filas = queryset.values_list(*nombres).iterator(chunk_size=tamano_lote)
+            while lote := list(islice(filas, tamano_lote)):
+                conexion.register('lote', _lote_arrow(lote, columnas_tabla))
+                conexion.execute(f'INSERT OR REPLACE INTO {tabla} SELECT * FROM lote')
+                conexion.unregister('lote')
+                copiadas += len(lote)
+                ultima = max(fila[indice_marca] for fila in lote)
+                marca = ultima if marca is None else max(marca, ultima)
+
+            # Every source row is in the snapshot now, so equal counts mean no deletions
+            total = modelo.objects.count()
+            sobrantes = conexion.execute(f'SELECT count(*) FROM {tabla}').fetchone()[0] - total
+            if sobrantes:
+                ids = modelo.objects.values_list('pk', flat=True).iterator(chunk_size=tamano_lote)
+                ids = pa.table({pk: pa.array(list(ids), type=pa.int64())})
+                conexion.register('ids', ids)
+                borradas = conexion.execute(
+                    f'DELETE FROM {tabla} WHERE {pk} NOT IN (SELECT {pk} FROM ids)'
+                ).fetchone()[0]
+                conexion.unregister('ids')
+
+        conexion.execute(
+            f'INSERT OR REPLACE INTO {TABLA_ESTADO} VALUES (?, ?, ?, ?, now())',
+            [tabla, firma, marca, total]
+        )
+        conexion.commit()
+    except BaseException:
+        conexion.rollback()
+        raise
+    return {'copiadas': copiadas, 'borradas': borradas, 'total': total}
+
+
+def _escribir_parquet(conexion: duckdb.DuckDBPyConnection, tabla: str, directorio: str) -> None:
+    destino = os.path.join(directorio, f'{tabla}.parquet')
+    temporal = f'{destino}.tmp'
+    conexion.execute(
+        f'COPY {tabla} TO {_citar(temporal)} (FORMAT PARQUET, COMPRESSION ZSTD)'
+    )
+    os.replace(temporal, destino)
+
+
+def exportar(
+    ruta: Optional[str] = None,
+    directorio_parquet: Optional[str] = None,
+    tamano_lote: Optional[int] = None,
+    completo: bool = False
+) -> Dict[str, Dict[str, int]]:
+    """
+    Refresh the DuckDB snapshot and, if a directory is given, its Parquet files.
+
+    Args:
+        ruta: DuckDB file, settings.ANALITICA_DUCKDB_PATH by default
+        directorio_parquet: Where to write one Parquet file per table;
+            settings.ANALITICA_PARQUET_DIR by default, '' to skip them
+        tamano_lote: Rows per batch, settings.ANALITICA_LOTE_FILAS by default
+        completo: Copy every table from scratch instead of incrementally
+
+    Returns:
+        {table: {'copiadas', 'borradas', 'total'}}
+    """
+    ruta = ruta or settings.ANALITICA_DUCKDB_PATH
+    if directorio_parquet is None:
+        directorio_parquet = settings.ANALITICA_PARQUET_DIR
+    tamano_lote = tamano_lote or settings.ANALITICA_LOTE_FILAS
+
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    if directorio_parquet:
+        os.makedirs(directorio_parquet, exist_ok=True)
+
+    resultado = {}
+    with duckdb.connect(ruta) as conexion:
+        conexion.execute(
+            f'CREATE TABLE IF NOT EXISTS {TABLA_ESTADO} ('
+            'tabla VARCHAR PRIMARY KEY, firma VARCHAR, marca TIMESTAMPTZ, '
+            'filas BIGINT, actualizado TIMESTAMPTZ)'
+        )
+        for modelo in MODELOS:
+            tabla = modelo._meta.model_name
+            resultado[tabla] = _sincronizar(conexion, modelo, tamano_lote, completo)
+            if directorio_parquet:
+                _escribir_parquet(conexion, tabla, directorio_parquet)
+    return resultado
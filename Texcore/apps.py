@@ -4,3 +4,19 @@ from django.apps import AppConfig
 class TexcoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Texcore'
+
+    def ready(self):
+        from django.apps import apps
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+        from .services import cache_service
+        from .sqlite_tuning import configurar_conexion_sqlite
+
+        connection_created.connect(configurar_conexion_sqlite, dispatch_uid='texcore_sqlite_tuning')
+
+        # Bump the cached dashboards that depend on a model when it is written
+        for etiqueta in cache_service.modelos_observados():
+            modelo = apps.get_model(etiqueta)
+            for accion, senal in (('save', post_save), ('delete', post_delete)):
+                senal.connect(cache_service.invalidar_por_senal, sender=modelo,
+                              dispatch_uid=f'texcore_cache_{accion}_{etiqueta}')
@@ -0,0 +1,24 @@
+"""
+Authentication backends for the Texcore app.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+class PerfilModelBackend(ModelBackend):
+    """
+    ModelBackend that loads the Profile together with the user.
+
+    Every protected view reads request.user.profile.role; joining the profile
+    in the per-request user lookup saves one query per request. The role is
+    read fresh on every request, so role changes apply immediately and there
+    is nothing to invalidate.
+    """
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.select_related('profile').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
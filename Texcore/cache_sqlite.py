@@ -0,0 +1,222 @@
+"""
+SQLite cache backend - one cache shared by every worker process on the host.
+
+Entries live in a WAL-mode SQLite file, so gunicorn workers see the same
+values (and the same version counters) without running a cache server.
+Integers are stored as SQL integers, which makes incr() a single atomic
+UPDATE; every other value is pickled.
+
+Settings:
+    CACHES = {'default': {
+        'BACKEND': 'Texcore.cache_sqlite.SQLiteCache',
+        'LOCATION': '/path/to/cache.sqlite3',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,            # entries kept after a purge
+            'MAX_BYTES': 64 * 1024 * 1024,   # size of the stored values
+            'CULL_FREQUENCY': 3,             # a purge frees 1/3 of each limit
+        },
+    }}
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+ESQUEMA = [
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' clave TEXT PRIMARY KEY, valor BLOB NOT NULL, expira REAL, usado REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_usado_idx ON cache (usado)',
+]
+
+# Live entries: no expiry or not expired yet (the parameter is the current time)
+VIGENTE = '(expira IS NULL OR expira > ?)'
+
+# A read refreshes the LRU timestamp at most this often (seconds), so hot
+# keys do not turn every cache hit into a write.
+RESOLUCION_LRU = 30
+
+# Writes per process between purges of expired and least recently used entries
+PURGA_CADA = 50
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._ruta = location
+        opciones = params.get('OPTIONS', {})
+        self._max_bytes = int(opciones.get('MAX_BYTES', 64 * 1024 * 1024))
+        self._espera = float(opciones.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+        self._escrituras = 0
+
+    def _conexion(self) -> sqlite3.Connection:
+        """One connection per thread and process (workers fork after import)."""
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is not None and self._local.pid == os.getpid():
+            return conexion
+        directorio = os.path.dirname(os.path.abspath(self._ruta))
+        os.makedirs(directorio, exist_ok=True)
+        conexion = sqlite3.connect(self._ruta, timeout=self._espera, isolation_level=None)
+        conexion.execute('PRAGMA journal_mode = WAL')
+        conexion.execute('PRAGMA synchronous = NORMAL')
+        for sentencia in ESQUEMA:
+            conexion.execute(sentencia)
+        self._local.conexion = conexion
+        self._local.pid = os.getpid()
+        return conexion
+
+    @staticmethod
+    def _codificar(valor):
+        if type(valor) is int:
+            return valor
+        return pickle.dumps(valor, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decodificar(valor):
+        if isinstance(valor, int):
+            return valor
+        return pickle.loads(valor)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        ahora = time.time()
+        conexion = self._conexion()
+        fila = conexion.execute(
+            f'SELECT valor, usado FROM cache WHERE clave = ? AND {VIGENTE}', (key, ahora)
+        ).fetchone()
+        if fila is None:
+            return default
+        if fila[1] < ahora - RESOLUCION_LRU:
+            conexion.execute('UPDATE cache SET usado = ? WHERE clave = ?', (ahora, key))
+        return self._decodificar(fila[0])
+
+    def get_many(self, keys, version=None):
+        claves = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not claves:
+            return {}
+        ahora = time.time()
+        conexion = self._conexion()
+        marcadores = ', '.join('?' * len(claves))
+        filas = conexion.execute(
+            f'SELECT clave, valor, usado FROM cache WHERE clave IN ({marcadores}) AND {VIGENTE}',
+            (*claves, ahora)
+        ).fetchall()
+        viejas = [(ahora, clave) for clave, _, usado in filas if usado < ahora - RESOLUCION_LRU]
+        if viejas:
+            conexion.executemany('UPDATE cache SET usado = ? WHERE clave = ?', viejas)
+        return {claves[clave]: self._decodificar(valor) for clave, valor, _ in filas}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._conexion().execute(
+            'INSERT INTO cache (clave, valor, expira, usado) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (clave) DO UPDATE SET '
+            'valor = excluded.valor, expira = excluded.expira, usado = excluded.usado',
+            (key, self._codificar(value), self.get_backend_timeout(timeout), time.time())
+        )
+        self._escrito()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        ahora = time.time()
+        expira = self.get_backend_timeout(timeout)
+        filas = [
+            (self.make_and_validate_key(key, version=version), self._codificar(value), expira, ahora)
+            for key, value in data.items()
+        ]
+        conexion = self._conexion()
+        with conexion:
+            conexion.execute('BEGIN IMMEDIATE')
+            conexion.executemany(
+                'INSERT INTO cache (clave, valor, expira, usado) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (clave) DO UPDATE SET '
+                'valor = excluded.valor, expira = excluded.expira, usado = excluded.usado',
+                filas
+            )
+        self._escrito()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        ahora = time.time()
+        # Atomic across processes: only inserts, or replaces an expired entry
+        cursor = self._conexion().execute(
+            'INSERT INTO cache (clave, valor, expira, usado) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (clave) DO UPDATE SET '
+            'valor = excluded.valor, expira = excluded.expira, usado = excluded.usado '
+            'WHERE cache.expira IS NOT NULL AND cache.expira <= ?',
+            (key, self._codificar(value), self.get_backend_timeout(timeout), ahora, ahora)
+        )
+        if cursor.rowcount:
+            self._escrito()
+        return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._conexion().execute(
+            f'UPDATE cache SET expira = ? WHERE clave = ? AND {VIGENTE}',
+            (self.get_backend_timeout(timeout), key, time.time())
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        # fetchall() runs the statement to completion, which releases the write lock
+        filas = self._conexion().execute(
+            f'UPDATE cache SET valor = valor + ? '
+            f"WHERE clave = ? AND typeof(valor) = 'integer' AND {VIGENTE} RETURNING valor",
+            (delta, clave, time.time())
+        ).fetchall()
+        if not filas:
+            raise ValueError(f"Key '{key}' not found")
+        return filas[0][0]
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._conexion().execute(
+            f'SELECT 1 FROM cache WHERE clave = ? AND {VIGENTE}', (key, time.time())
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._conexion().execute('DELETE FROM cache WHERE clave = ?', (key,)).rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        claves = [(self.make_and_validate_key(key, version=version),) for key in keys]
+        self._conexion().executemany('DELETE FROM cache WHERE clave = ?', claves)
+
+    def clear(self):
+        self._conexion().execute('DELETE FROM cache')
+
+    def _escrito(self):
+        self._escrituras += 1
+        if self._escrituras % PURGA_CADA == 0:
+            self.purgar()
+
+    def purgar(self):
+        """
+        Drop expired entries and, over MAX_ENTRIES or MAX_BYTES, the least
+        recently used ones down to (1 - 1/CULL_FREQUENCY) of each limit.
+        """
+        conexion = self._conexion()
+        conexion.execute('DELETE FROM cache WHERE expira <= ?', (time.time(),))
+        total, tamano = conexion.execute('SELECT count(*), total(length(valor)) FROM cache').fetchone()
+        if total <= self._max_entries and tamano <= self._max_bytes:
+            return
+        if not self._cull_frequency:
+            return self.clear()
+        conexion.execute(
+            'DELETE FROM cache WHERE clave IN ('
+            ' SELECT clave FROM ('
+            '  SELECT clave, row_number() OVER recientes AS n, sum(length(valor)) OVER recientes AS b'
+            '  FROM cache WINDOW recientes AS (ORDER BY usado DESC ROWS UNBOUNDED PRECEDING)'
+            ' ) WHERE n > ? OR b > ?'
+            ')',
+            (self._max_entries - self._max_entries // self._cull_frequency,
+             self._max_bytes - self._max_bytes // self._cull_frequency)
+        )
@@ -1,14 +1,33 @@
+import hashlib
 from functools import wraps
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
+from django.middleware.csrf import get_token
 from django.shortcuts import redirect
 from django.contrib import messages
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from .services.validadores_service import ultima_modificacion
 
 
-def role_required(role):
+# Roles allowed by each decorator, built once at import time.
+# None means any user with a profile.
+ROLES_PERMITIDOS = {
+    'admin': frozenset({'admin'}),
+    'operario': frozenset({'operario'}),
+    'preparador': frozenset({'preparador'}),
+    'admin_or_operario': frozenset({'admin', 'operario'}),
+    'admin_or_preparador': frozenset({'admin', 'preparador'}),
+    'any_role': None,
+}
+
+
+def _requiere_roles(roles, mensaje):
     """
-    Decorator to require a specific role.
-    Usage: @role_required('admin') or @role_required('operario')
+    Build a decorator that lets through users whose profile role is in `roles`.
+
+    The profile comes with the user (see Texcore.backends.PerfilModelBackend),
+    so the check does not query the database.
     """
     def decorator(view_func):
         @wraps(view_func)
@@ -19,9 +38,9 @@ def role_required(role):
                 messages.error(request, 'Tu usuario no tiene un perfil asignado. Contacta al administrador.')
                 return redirect('inicio')
             
-            # Check if user has the required role
-            if request.user.profile.role != role:
-                messages.error(request, f'No tienes permisos para acceder a esta página. Se requiere rol: {role}')
+            # Check if user has one of the allowed roles
+            if roles is not None and request.user.profile.role not in roles:
+                messages.error(request, mensaje)
                 return redirect('inicio')
             
             return view_func(request, *args, **kwargs)
@@ -29,6 +48,17 @@ def role_required(role):
     return decorator
 
 
+def role_required(role):
+    """
+    Decorator to require a specific role.
+    Usage: @role_required('admin') or @role_required('operario')
+    """
+    return _requiere_roles(
+        ROLES_PERMITIDOS.get(role, frozenset({role})),
+        f'No tienes permisos para acceder a esta página. Se requiere rol: {role}'
+    )
+
+
 def admin_required(view_func):
     """
     Decorator to require admin role.
@@ -58,21 +88,10 @@ def admin_or_operario_required(view_func):
     Decorator that allows both admin and operario roles.
     Usage: @admin_or_operario_required
     """
-    @wraps(view_func)
-    @login_required
-    def _wrapped_view(request, *args, **kwargs):
-        # Check if user has a profile
-        if not hasattr(request.user, 'profile'):
-            messages.error(request, 'Tu usuario no tiene un perfil asignado. Contacta al administrador.')
-            return redirect('inicio')
-        
-        # Check if user has admin or operario role
-        if request.user.profile.role not in ['admin', 'operario']:
-            messages.error(request, 'No tienes permisos para acceder a esta página.')
-            return redirect('inicio')
-        
-        return view_func(request, *args, **kwargs)
-    return _wrapped_view
+    return _requiere_roles(
+        ROLES_PERMITIDOS['admin_or_operario'],
+        'No tienes permisos para acceder a esta página.'
+    )(view_func)
 
 
 def admin_or_preparador_required(view_func):
@@ -80,21 +99,10 @@ def admin_or_preparador_required(view_func):
     Decorator that allows both admin and preparador roles.
     Usage: @admin_or_preparador_required
     """
-    @wraps(view_func)
-    @login_required
-    def _wrapped_view(request, *args, **kwargs):
-        # Check if user has a profile
-        if not hasattr(request.user, 'profile'):
-            messages.error(request, 'Tu usuario no tiene un perfil asignado. Contacta al administrador.')
-            return redirect('inicio')
-        
-        # Check if user has admin or preparador role
-        if request.user.profile.role not in ['admin', 'preparador']:
-            messages.error(request, 'No tienes permisos para acceder a esta página.')
-            return redirect('inicio')
-        
-        return view_func(request, *args, **kwargs)
-    return _wrapped_view
+    return _requiere_roles(
+        ROLES_PERMITIDOS['admin_or_preparador'],
+        'No tienes permisos para acceder a esta página.'
+    )(view_func)
 
 
 def any_role_required(view_func):
@@ -102,13 +110,52 @@ def any_role_required(view_func):
     Decorator that allows any authenticated user with a profile.
     Usage: @any_role_required
     """
-    @wraps(view_func)
-    @login_required
-    def _wrapped_view(request, *args, **kwargs):
-        # Check if user has a profile
-        if not hasattr(request.user, 'profile'):
-            messages.error(request, 'Tu usuario no tiene un perfil asignado. Contacta al administrador.')
-            return redirect('inicio')
-        
-        return view_func(request, *args, **kwargs)
-    return _wrapped_view
\ No newline at end of file
+    return _requiere_roles(ROLES_PERMITIDOS['any_role'], None)(view_func)
+
+
+def respuesta_condicional(validador, con_fecha=False):
+    """
+    Answer GETs with 304 Not Modified while `validador` returns the same value.
+    Usage: @respuesta_condicional(validadores_service.validador_lista_hilaturas)
+
+    `validador` receives the view's URL arguments and returns a cheap
+    freshness tuple (see services.validadores_service), or None to skip the
+    check. The ETag also covers the user, their role, the query string and
+    the CSRF secret, since the page depends on them: its forms carry a token
+    derived from that secret, which login rotates. With `con_fecha` a
+    Last-Modified header is sent too (browsers send If-None-Match with it,
+    which takes precedence); use it only where deletes always change the
+    validator's dates.
+    Pages with pending flash messages are never answered with 304.
+    Goes below the role decorator, so permissions are checked first.
+    """
+    def _valor(request, *args, **kwargs):
+        # condition() asks for the ETag and Last-Modified separately
+        if not hasattr(request, '_validador_condicional'):
+            if len(messages.get_messages(request)):
+                request._validador_condicional = None
+            else:
+                request._validador_condicional = validador(*args, **kwargs)
+        return request._validador_condicional
+
+    def _etag(request, *args, **kwargs):
+        valor = _valor(request, *args, **kwargs)
+        if valor is None:
+            return None
+        # get_token() creates the secret if the request has none and sends it, even with a 304
+        get_token(request)
+        firma = repr((
+            valor, request.user.pk, request.user.profile.role, request.GET.urlencode(),
+            request.META['CSRF_COOKIE']
+        ))
+        return hashlib.md5(firma.encode()).hexdigest()
+
+    def _ultima_modificacion(request, *args, **kwargs):
+        return ultima_modificacion(_valor(request, *args, **kwargs))
+
+    def decorator(view_func):
+        return cache_control(private=True, no_cache=True)(condition(
+            etag_func=_etag,
+            last_modified_func=_ultima_modificacion if con_fecha else None,
+        )(view_func))
+    return decorator
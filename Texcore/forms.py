@@ -1,6 +1,7 @@
 from django import forms
 from django.db.models import Q
 from .models import Materia, PreparacionMateria, DetallePreparacion, ProcesoHilatura, DetalleHilatura
+from .services import opciones_service
 
 
 class MateriaForm(forms.ModelForm):
@@ -12,7 +13,7 @@ class MateriaForm(forms.ModelForm):
         widgets = {
             'fecha_ingreso': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
             'tipo': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Tipo de materia'}),
-            'cantidad': forms.NumberInput(attrs={'class': 'form-control', 'min': 0}),
+            'cantidad': forms.NumberInput(attrs={'class': 'form-control', 'min': 0, 'step': '0.01'}),
             'unidad_medida': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Unidad de medida'}),
             'lote': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Lote/Referencia'}),
         }
@@ -74,14 +75,20 @@ class PreparacionMateriaForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         
-        # Solo mostrar materias disponibles para procesar
-        # Materias que no tienen preparaciones o que tienen preparaciones completadas/rechazadas
-        materias_disponibles = Materia.objects.filter(
-            Q(preparacionmateria__isnull=True) |
-            Q(preparacionmateria__estado__in=['completada', 'rechazada'])
-        ).distinct()
+        # Solo mostrar materias con stock disponible (no reservado)
+        # Al editar se mantiene la materia actual aunque su reserva agote el stock
+        campo = self.fields['materia_prima']
+        campo.queryset = Materia.objects.filter(
+            Q(cantidad_disponible__gt=0) |
+            Q(pk=self.instance.materia_prima_id)
+        )
         
-        self.fields['materia_prima'].queryset = materias_disponibles
+        # Las opciones salen de la caché; el queryset solo valida el id enviado
+        materias = opciones_service.get_materias_disponibles()
+        choices = opciones_service.como_choices(materias, campo.empty_label)
+        if self.instance.materia_prima_id and not any(m['id'] == self.instance.materia_prima_id for m in materias):
+            choices.append((self.instance.materia_prima_id, str(self.instance.materia_prima)))
+        campo.choices = choices
         
         # Hacer algunos campos opcionales
         self.fields['porcentaje_mezcla'].required = False
@@ -93,9 +100,15 @@ class PreparacionMateriaForm(forms.ModelForm):
         materia_prima = self.cleaned_data.get('materia_prima')
         
         if cantidad and materia_prima:
-            if cantidad > materia_prima.cantidad:
+            disponible = materia_prima.cantidad_disponible
+            # Al editar, la reserva propia de esta preparación vuelve a estar disponible
+            if self.instance.pk and self.instance.materia_prima_id == materia_prima.pk:
+                disponible += PreparacionMateria.objects.values_list(
+                    'cantidad_procesada', flat=True
+                ).get(pk=self.instance.pk)
+            if cantidad > disponible:
                 raise forms.ValidationError(
-                    f'La cantidad a procesar no puede exceder la cantidad disponible ({materia_prima.cantidad} {materia_prima.unidad_medida})'
+                    f'La cantidad a procesar no puede exceder la cantidad disponible ({disponible} {materia_prima.unidad_medida})'
                 )
         
         return cantidad
@@ -247,10 +260,12 @@ class ProcesoHilaturaForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         
-        # Solo mostrar preparaciones completadas
-        self.fields['preparacion_origen'].queryset = PreparacionMateria.objects.filter(
-            estado='completada'
-        ).order_by('-fecha_completado')
+        # Solo mostrar preparaciones completadas (opciones desde la caché)
+        campo = self.fields['preparacion_origen']
+        campo.queryset = PreparacionMateria.objects.filter(estado='completada')
+        campo.choices = opciones_service.como_choices(
+            opciones_service.get_preparaciones_completadas(), campo.empty_label
+        )
         
         # Hacer algunos campos opcionales
         self.fields['preparacion_origen'].required = False
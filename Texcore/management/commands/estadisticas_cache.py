@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from Texcore.services import cache_service
+
+
+class Command(BaseCommand):
+    help = (
+        'Mostrar aciertos y fallos de la caché de dashboards, reportes y fragmentos de plantilla. '
+        'Con LocMemCache los contadores son por proceso; usar una caché compartida para verlos globales. '
+        'Cada proceso suma los suyos cada DASHBOARD_CACHE_STATS_INTERVAL segundos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reiniciar',
+            action='store_true',
+            help='Poner los contadores a cero'
+        )
+
+    def handle(self, *args, **options):
+        if options['reiniciar']:
+            cache_service.reiniciar_estadisticas()
+            self.stdout.write(self.style.SUCCESS('Contadores reiniciados.'))
+            return
+
+        if not settings.DASHBOARD_CACHE:
+            self.stdout.write(self.style.WARNING('DASHBOARD_CACHE=False: la caché está desactivada.'))
+
+        self.stdout.write(f'{"entrada":<32}{"aciertos":>10}{"fallos":>10}{"% acierto":>11}{"versión":>15}')
+        for nombre, datos in cache_service.get_estadisticas().items():
+            total = datos['aciertos'] + datos['fallos']
+            porcentaje = (datos['aciertos'] / total * 100) if total else 0
+            version = '-' if datos['version'] is None else datos['version']
+            self.stdout.write(
+                f'{nombre:<32}{datos["aciertos"]:>10}{datos["fallos"]:>10}{porcentaje:>10.1f}%{version:>15}'
+            )
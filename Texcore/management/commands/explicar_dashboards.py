@@ -0,0 +1,73 @@
+from contextlib import ExitStack
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from Texcore.services import dashboard_service, hilatura_service
+
+
+class Command(BaseCommand):
+    help = 'Listar el SQL que ejecuta cada dashboard y cuántas idas y vueltas a la base necesita'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--usuario',
+            type=str,
+            help='Usuario para los dashboards de operario y preparador (por defecto el primero)'
+        )
+        parser.add_argument(
+            '--resumen',
+            action='store_true',
+            help='Mostrar solo el número de consultas, sin el SQL'
+        )
+
+    def handle(self, *args, **options):
+        if options['usuario']:
+            try:
+                usuario = User.objects.get(username=options['usuario'])
+            except User.DoesNotExist:
+                raise CommandError(f'El usuario "{options["usuario"]}" no existe.')
+        else:
+            usuario = User.objects.order_by('pk').first()
+
+        hoy = timezone.localdate().isoformat()
+        dashboards = [
+            ('admin', dashboard_service.get_admin_dashboard_stats, ()),
+            ('reporte_preparaciones', dashboard_service.get_reporte_preparaciones_stats, ()),
+            ('reporte_preparaciones (rango)', dashboard_service.get_reporte_preparaciones_stats, (hoy, hoy)),
+            ('estadisticas_hilatura', hilatura_service.obtener_estadisticas_hilatura, ()),
+            ('resumen_del_dia', dashboard_service.get_resumen_del_dia, ()),
+        ]
+        if usuario is not None:
+            dashboards += [
+                ('operario', dashboard_service.get_operario_dashboard_stats, (usuario,)),
+                ('preparador', dashboard_service.get_preparador_dashboard_stats, (usuario,)),
+            ]
+
+        for nombre, funcion, argumentos in dashboards:
+            consultas = self.capturar(funcion, argumentos)
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{nombre}: {len(consultas)} consultas'))
+            if not options['resumen']:
+                for alias, sql in consultas:
+                    self.stdout.write(f'  [{alias}] {sql}')
+
+    def capturar(self, funcion, argumentos) -> list:
+        """Run a dashboard and evaluate its lazy querysets, recording every query."""
+        with ExitStack() as stack:
+            capturas = {
+                alias: stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in connections
+            }
+            datos = funcion(*argumentos)
+            # Evaluate the lazy querysets like the template would
+            for valor in datos.values():
+                if hasattr(valor, '__iter__') and not isinstance(valor, (str, dict)):
+                    list(valor)
+        return [
+            (alias, consulta['sql'])
+            for alias, captura in capturas.items()
+            for consulta in captura.captured_queries
+        ]
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Texcore import analitica
+
+
+class Command(BaseCommand):
+    help = 'Actualizar el snapshot columnar (DuckDB y Parquet) que usan los análisis fuera de la base'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ruta', help='Archivo DuckDB (por defecto ANALITICA_DUCKDB_PATH)')
+        parser.add_argument(
+            '--parquet',
+            help="Directorio de los archivos Parquet (por defecto ANALITICA_PARQUET_DIR, '' para omitirlos)"
+        )
+        parser.add_argument('--lote', type=int, help='Filas por lote (por defecto ANALITICA_LOTE_FILAS)')
+        parser.add_argument(
+            '--completo',
+            action='store_true',
+            help='Copiar todas las tablas desde cero en lugar de solo los cambios'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=0,
+            help='Segundos entre actualizaciones; 0 actualiza una vez y termina'
+        )
+
+    def handle(self, *args, **options):
+        completo = options['completo']
+        while True:
+            inicio = time.monotonic()
+            try:
+                resultado = analitica.exportar(
+                    ruta=options['ruta'],
+                    directorio_parquet=options['parquet'],
+                    tamano_lote=options['lote'],
+                    completo=completo,
+                )
+            except Exception as e:
+                if options['intervalo'] <= 0:
+                    raise
+                # A run can fail (e.g. an analyst holds the DuckDB file); the next one catches up
+                self.stderr.write(f'Snapshot analítico no actualizado: {e}')
+            else:
+                for tabla, cuentas in resultado.items():
+                    self.stdout.write(
+                        f'{tabla}: {cuentas["copiadas"]} copiadas, {cuentas["borradas"]} borradas, '
+                        f'{cuentas["total"]} en total'
+                    )
+                self.stdout.write(
+                    self.style.SUCCESS(f'Snapshot analítico actualizado ({time.monotonic() - inicio:.2f}s)')
+                )
+                completo = False
+            if options['intervalo'] <= 0:
+                break
+            time.sleep(options['intervalo'])
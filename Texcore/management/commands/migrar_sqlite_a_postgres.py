@@ -0,0 +1,130 @@
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+ALIAS_ORIGEN = 'sqlite_origen'
+
+
+class Command(BaseCommand):
+    help = 'Copiar en bloque un db.sqlite3 existente a la base PostgreSQL configurada'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--origen',
+            type=str,
+            default=str(settings.BASE_DIR / 'db.sqlite3'),
+            help='Ruta del archivo SQLite de origen'
+        )
+        parser.add_argument(
+            '--database',
+            type=str,
+            default=DEFAULT_DB_ALIAS,
+            help='Alias de la base PostgreSQL de destino (ya migrada)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=2000,
+            help='Filas por INSERT'
+        )
+
+    def handle(self, *args, **options):
+        destino = connections[options['database']]
+        if destino.vendor != 'postgresql':
+            raise CommandError(f'El destino "{options["database"]}" no es PostgreSQL (DATABASE_ENGINE=postgresql).')
+
+        self.registrar_origen(options['origen'])
+        modelos = self.modelos_a_copiar()
+
+        ocupados = [m._meta.label for m in modelos if m._base_manager.using(options['database']).exists()]
+        if ocupados:
+            raise CommandError(f'La base de destino ya tiene datos en: {", ".join(ocupados)}')
+
+        inicio = time.monotonic()
+        with transaction.atomic(using=options['database']):
+            for modelo in modelos:
+                total = self.copiar_modelo(modelo, destino, options['lote'])
+                self.stdout.write(f'  {modelo._meta.label}: {total} filas')
+
+            # Continue the id sequences after the copied primary keys
+            with destino.cursor() as cursor:
+                for sql in destino.ops.sequence_reset_sql(no_style(), modelos):
+                    cursor.execute(sql)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Migración completada en {time.monotonic() - inicio:.1f}s.')
+        )
+        self.stdout.write(
+            'Nota: permisos individuales y sesiones no se copian; los usuarios deben volver a iniciar sesión.'
+        )
+
+    def registrar_origen(self, ruta: str) -> None:
+        """Register the SQLite file as a read-only database alias."""
+        connections.settings[ALIAS_ORIGEN] = connections.configure_settings({
+            DEFAULT_DB_ALIAS: connections.settings[DEFAULT_DB_ALIAS],
+            ALIAS_ORIGEN: {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': f'file:{ruta}?mode=ro',
+            }
+        })[ALIAS_ORIGEN]
+
+    def modelos_a_copiar(self) -> list:
+        """
+        Return the models to copy, parents before the models that reference them.
+        """
+        modelos = [Group, User, User.groups.through]
+        modelos += list(apps.get_app_config('Texcore').get_models(include_auto_created=True))
+
+        ordenados = []
+        pendientes = list(modelos)
+        while pendientes:
+            for modelo in pendientes:
+                dependencias = {
+                    campo.related_model
+                    for campo in modelo._meta.concrete_fields
+                    if campo.is_relation and campo.related_model is not modelo
+                }
+                if not (dependencias & set(pendientes)):
+                    ordenados.append(modelo)
+                    pendientes.remove(modelo)
+                    break
+            else:
+                raise CommandError('Dependencia circular entre modelos: ' + ', '.join(m._meta.label for m in pendientes))
+        return ordenados
+
+    def copiar_modelo(self, modelo, destino, lote: int) -> int:
+        """
+        Copy all rows of a model with multi-row INSERTs.
+
+        Values are read through the ORM (so SQLite types are converted) and
+        inserted raw, which keeps auto_now_add dates and primary keys as they were.
+        """
+        campos = modelo._meta.concrete_fields
+        columnas = ', '.join(destino.ops.quote_name(c.column) for c in campos)
+        fila_sql = '(' + ', '.join(['%s'] * len(campos)) + ')'
+        tabla = destino.ops.quote_name(modelo._meta.db_table)
+        # PostgreSQL accepts at most 65535 bind parameters per statement
+        lote = max(1, min(lote, 65535 // len(campos)))
+
+        total = 0
+        filas = []
+        with destino.cursor() as cursor:
+            for obj in modelo._base_manager.using(ALIAS_ORIGEN).order_by('pk').iterator(chunk_size=lote):
+                filas.append([c.get_db_prep_save(getattr(obj, c.attname), destino) for c in campos])
+                if len(filas) >= lote:
+                    total += self.insertar(cursor, tabla, columnas, fila_sql, filas)
+                    filas = []
+            if filas:
+                total += self.insertar(cursor, tabla, columnas, fila_sql, filas)
+        return total
+
+    def insertar(self, cursor, tabla, columnas, fila_sql, filas) -> int:
+        sql = f'INSERT INTO {tabla} ({columnas}) VALUES ' + ', '.join([fila_sql] * len(filas))
+        cursor.execute(sql, [valor for fila in filas for valor in fila])
+        return len(filas)
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Texcore.plantillas import precompilar_plantillas
+
+
+class Command(BaseCommand):
+    help = 'Compilar todas las plantillas de Texcore y fallar si alguna tiene errores'
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        compiladas, errores = precompilar_plantillas()
+        for nombre, error in errores:
+            self.stderr.write(f'{nombre}: {error}')
+        if errores:
+            raise CommandError(f'{len(errores)} plantilla(s) con errores.')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(compiladas)} plantillas compiladas en {(time.perf_counter() - inicio) * 1000:.0f} ms'
+        ))
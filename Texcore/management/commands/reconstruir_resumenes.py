@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from Texcore.services import resumen_service
+
+
+class Command(BaseCommand):
+    help = 'Reconstruir (o cargar por primera vez) los resúmenes diarios de producción'
+
+    def handle(self, *args, **options):
+        filas = resumen_service.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f'Resúmenes reconstruidos: {filas} filas.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from Texcore.services import contador_service
+
+
+class Command(BaseCommand):
+    help = 'Reconstruir desde cero los contadores de estado de preparaciones e hilaturas'
+
+    def handle(self, *args, **options):
+        filas = contador_service.recontar()
+        self.stdout.write(self.style.SUCCESS(f'Contadores reconstruidos: {filas} filas.'))
@@ -0,0 +1,61 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = 'Copiar la base SQLite principal al snapshot de solo lectura usado por los reportes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=0,
+            help='Segundos entre refrescos; 0 refresca una vez y termina'
+        )
+
+    def handle(self, *args, **options):
+        origen = settings.DATABASES[DEFAULT_DB_ALIAS]
+        destino = getattr(settings, 'REPORTING_SNAPSHOT_PATH', None)
+
+        if origen['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('El snapshot de reportes solo aplica a la base SQLite.')
+        if not destino:
+            raise CommandError('REPORTING_SNAPSHOT_PATH no está configurado (REPORTING_DB=snapshot).')
+
+        while True:
+            inicio = time.monotonic()
+            self.refrescar(str(origen['NAME']), destino)
+            self.stdout.write(
+                self.style.SUCCESS(f'Snapshot actualizado en {destino} ({time.monotonic() - inicio:.2f}s)')
+            )
+            if options['intervalo'] <= 0:
+                break
+            time.sleep(options['intervalo'])
+
+    def refrescar(self, origen: str, destino: str) -> None:
+        """
+        Copy the database with the online backup API and swap the file atomically.
+
+        Readers that already opened the old snapshot keep their file handle, new
+        connections see the new copy.
+        """
+        temporal = f'{destino}.tmp'
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+        conexion_origen = sqlite3.connect(origen)
+        conexion_destino = sqlite3.connect(temporal)
+        try:
+            conexion_origen.backup(conexion_destino)
+            # The snapshot is opened with immutable=1, which ignores -wal files
+            conexion_destino.execute('PRAGMA journal_mode = DELETE')
+        finally:
+            conexion_destino.close()
+            conexion_origen.close()
+
+        os.replace(temporal, destino)
@@ -0,0 +1,64 @@
+"""
+Middleware for the Texcore app.
+"""
+from django.conf import settings
+from django.db import connection
+
+
+class StatementTimeoutMiddleware:
+    """
+    Give report and export views the longer statement_timeout on PostgreSQL.
+
+    Every connection starts with DB_STATEMENT_TIMEOUT_MS (the `options` of
+    the database settings), so a runaway query is cancelled by the server
+    instead of holding a pooled connection and a gunicorn worker, at no cost
+    per request. Views whose url name starts with 'reporte' or 'exportar'
+    raise it to DB_REPORT_STATEMENT_TIMEOUT_MS and reset it once the response
+    has been sent, streamed rows included, before the connection goes back
+    to the pool.
+    Does nothing on SQLite.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if getattr(request, '_statement_timeout_ampliado', False):
+            if response.streaming:
+                response.streaming_content = self._restaurar_al_terminar(response.streaming_content)
+            else:
+                self._restaurar()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if connection.vendor != 'postgresql':
+            return None
+
+        url_name = getattr(request.resolver_match, 'url_name', '') or ''
+        if not url_name.startswith(('reporte', 'exportar')):
+            return None
+
+        with connection.cursor() as cursor:
+            # SET does not accept bind parameters; the value is an int from settings
+            cursor.execute(f'SET statement_timeout = {int(settings.DB_REPORT_STATEMENT_TIMEOUT_MS)}')
+        request._statement_timeout_ampliado = True
+        return None
+
+    @staticmethod
+    def _restaurar():
+        with connection.cursor() as cursor:
+            # Back to the connection's default from `options`
+            cursor.execute('RESET statement_timeout')
+
+    def _restaurar_al_terminar(self, contenido):
+        def enviar():
+            try:
+                yield None  # started: close() also runs the finally below
+                yield from contenido
+            finally:
+                self._restaurar()
+
+        envio = enviar()
+        next(envio)
+        return envio
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Texcore', '0006_procesohilatura_detallehilatura'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='materia',
+            index=models.Index(fields=['cantidad'], name='materia_cantidad_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='materia',
+            index=models.Index(fields=['fecha_ingreso'], name='materia_fecha_ingreso_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='preparacionmateria',
+            index=models.Index(fields=['fecha_inicio'], name='prep_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='preparacionmateria',
+            index=models.Index(fields=['estado', 'fecha_inicio'], name='prep_estado_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='preparacionmateria',
+            index=models.Index(fields=['tipo_proceso', 'fecha_inicio'], name='prep_tipo_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='preparacionmateria',
+            index=models.Index(fields=['estado', 'fecha_completado'], name='prep_estado_completado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='preparacionmateria',
+            index=models.Index(fields=['usuario_preparador', 'estado'], name='prep_usuario_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='preparacionmateria',
+            index=models.Index(fields=['usuario_preparador', 'fecha_completado'], name='prep_usuario_completado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='preparacionmateria',
+            index=models.Index(condition=models.Q(('estado__in', ['pendiente', 'en_proceso'])), fields=['estado', 'fecha_inicio'], name='prep_abiertas_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='procesohilatura',
+            index=models.Index(fields=['fecha_inicio'], name='hila_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='procesohilatura',
+            index=models.Index(fields=['estado', 'fecha_inicio'], name='hila_estado_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='procesohilatura',
+            index=models.Index(fields=['etapa', 'fecha_inicio'], name='hila_etapa_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='procesohilatura',
+            index=models.Index(fields=['estado', 'fecha_completado'], name='hila_estado_completado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='procesohilatura',
+            index=models.Index(condition=models.Q(('estado__in', ['pendiente', 'en_proceso'])), fields=['estado', 'fecha_inicio'], name='hila_abiertas_idx'),
+        ),
+    ]
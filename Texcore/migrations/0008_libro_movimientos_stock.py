@@ -0,0 +1,59 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def crear_saldos_iniciales(apps, schema_editor):
+    """Open the ledger with the current stock of every existing Materia."""
+    Materia = apps.get_model('Texcore', 'Materia')
+    MovimientoStock = apps.get_model('Texcore', 'MovimientoStock')
+    MovimientoStock.objects.bulk_create([
+        MovimientoStock(
+            materia_id=materia.id,
+            tipo='entrada',
+            cantidad=materia.cantidad,
+            saldo_resultante=materia.cantidad,
+            usuario_id=materia.usuario_registro_id,
+            observaciones='Saldo inicial',
+        )
+        for materia in Materia.objects.exclude(cantidad=0).iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Texcore', '0007_indices_filtros_servicios'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='materia',
+            name='cantidad',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('entrada', 'Entrada'), ('consumo', 'Consumo'), ('ajuste', 'Ajuste')], max_length=20)),
+                ('cantidad', models.DecimalField(decimal_places=2, help_text='Cantidad con signo: positiva entra, negativa sale', max_digits=12)),
+                ('saldo_resultante', models.DecimalField(decimal_places=2, help_text='Saldo de la materia después del movimiento', max_digits=12)),
+                ('observaciones', models.CharField(blank=True, max_length=255)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('materia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos', to='Texcore.materia')),
+                ('preparacion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_stock', to='Texcore.preparacionmateria')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Stock',
+                'verbose_name_plural': 'Movimientos de Stock',
+                'ordering': ['-fecha', '-id'],
+                'indexes': [models.Index(fields=['materia', 'fecha'], name='mov_materia_fecha_idx'), models.Index(fields=['tipo', 'fecha'], name='mov_tipo_fecha_idx')],
+            },
+        ),
+        migrations.RunPython(crear_saldos_iniciales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:35
+
+import django.db.models.expressions
+from django.conf import settings
+from django.db import migrations, models
+
+
+def reservar_preparaciones_abiertas(apps, schema_editor):
+    """Reserve the stock of preparations that are already pending or in process."""
+    Materia = apps.get_model('Texcore', 'Materia')
+    PreparacionMateria = apps.get_model('Texcore', 'PreparacionMateria')
+    reservas = PreparacionMateria.objects.filter(
+        estado__in=['pendiente', 'en_proceso'],
+        materia_prima__isnull=False
+    ).values('materia_prima').annotate(total=models.Sum('cantidad_procesada'))
+    for reserva in reservas:
+        Materia.objects.filter(pk=reserva['materia_prima']).update(cantidad_reservada=reserva['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Texcore', '0008_libro_movimientos_stock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='materia',
+            name='materia_cantidad_idx',
+        ),
+        migrations.AddField(
+            model_name='materia',
+            name='cantidad_reservada',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='materia',
+            name='cantidad_disponible',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('cantidad'), '-', models.F('cantidad_reservada')), output_field=models.DecimalField(decimal_places=2, max_digits=12)),
+        ),
+        migrations.AddIndex(
+            model_name='materia',
+            index=models.Index(fields=['cantidad_disponible'], name='materia_disponible_idx'),
+        ),
+        migrations.RunPython(reservar_preparaciones_abiertas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:38
+
+from django.db import migrations, models
+
+
+def contar_existentes(apps, schema_editor):
+    """Seed the counters from the rows that already exist."""
+    ContadorEstado = apps.get_model('Texcore', 'ContadorEstado')
+    dimensiones = {
+        'preparacionmateria': ('estado', 'tipo_proceso'),
+        'procesohilatura': ('estado', 'etapa'),
+    }
+    filas = []
+    for nombre, campos in dimensiones.items():
+        modelo = apps.get_model('Texcore', nombre)
+        filas.append(ContadorEstado(modelo=nombre, dimension='total', valor='total',
+                                    total=modelo.objects.count()))
+        for campo in campos:
+            totales = {valor: 0 for valor, _ in modelo._meta.get_field(campo).choices}
+            for fila in modelo.objects.order_by().values(campo).annotate(n=models.Count('pk')):
+                totales[fila[campo] or ''] = fila['n']
+            filas.extend(ContadorEstado(modelo=nombre, dimension=campo, valor=valor, total=total)
+                         for valor, total in totales.items())
+    ContadorEstado.objects.bulk_create(filas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Texcore', '0009_reservas_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorEstado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=50)),
+                ('dimension', models.CharField(max_length=50)),
+                ('valor', models.CharField(max_length=50)),
+                ('total', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Contador de Estado',
+                'verbose_name_plural': 'Contadores de Estado',
+                'constraints': [models.UniqueConstraint(fields=('modelo', 'dimension', 'valor'), name='contador_unico')],
+            },
+        ),
+        migrations.RunPython(contar_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Texcore', '0010_contadores_estado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenProduccionDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('proceso', models.CharField(choices=[('ingreso', 'Ingreso de Materia'), ('preparacion', 'Preparación'), ('hilatura', 'Hilatura')], max_length=20)),
+                ('materia_tipo', models.CharField(blank=True, max_length=100)),
+                ('tipo', models.CharField(blank=True, help_text='Tipo de proceso de preparación o etapa de hilatura', max_length=50)),
+                ('creados', models.IntegerField(default=0)),
+                ('kg_creados', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('completados', models.IntegerField(default=0)),
+                ('kg_entrada', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('kg_salida', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('calidad_excelente', models.IntegerField(default=0)),
+                ('calidad_buena', models.IntegerField(default=0)),
+                ('calidad_regular', models.IntegerField(default=0)),
+                ('calidad_deficiente', models.IntegerField(default=0)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Resumen de Producción Diaria',
+                'verbose_name_plural': 'Resúmenes de Producción Diaria',
+                'indexes': [models.Index(fields=['proceso', 'fecha'], name='resumen_proceso_fecha_idx')],
+            },
+        ),
+    ]
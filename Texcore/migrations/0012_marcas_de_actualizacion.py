@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Texcore', '0011_resumenes_produccion_diaria'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detallehilatura',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='detallepreparacion',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='materia',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='preparacionmateria',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='procesohilatura',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='preparacionmateria',
+            index=models.Index(fields=['updated_at'], name='prep_actualizado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='procesohilatura',
+            index=models.Index(fields=['updated_at'], name='hila_actualizado_idx'),
+        ),
+    ]
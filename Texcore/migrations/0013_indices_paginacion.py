@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Texcore', '0012_marcas_de_actualizacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='preparacionmateria',
+            index=models.Index(fields=['-fecha_inicio', 'id'], name='prep_pagina_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='procesohilatura',
+            index=models.Index(fields=['-fecha_inicio', 'id'], name='hila_pagina_idx'),
+        ),
+    ]
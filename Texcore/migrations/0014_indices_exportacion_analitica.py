@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Texcore', '0013_indices_paginacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='detallehilatura',
+            index=models.Index(fields=['updated_at'], name='dethila_actualizado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detallepreparacion',
+            index=models.Index(fields=['updated_at'], name='detprep_actualizado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='materia',
+            index=models.Index(fields=['updated_at'], name='materia_actualizado_idx'),
+        ),
+    ]
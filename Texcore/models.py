@@ -48,12 +48,32 @@ def save_user_profile(sender, instance, **kwargs):
 
 class Materia(models.Model):
     tipo = models.CharField(max_length=100, blank=True)
-    cantidad = models.IntegerField(default=0)
+    # Saldo materializado del libro de stock (MovimientoStock); solo se
+    # modifica con UPDATE atómicos desde services/stock_service.py
+    cantidad = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Reservado por preparaciones pendientes/en proceso
+    cantidad_reservada = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cantidad_disponible = models.GeneratedField(
+        expression=models.F('cantidad') - models.F('cantidad_reservada'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        db_persist=True,
+    )
     unidad_medida = models.CharField(max_length=50, blank=True)
     lote = models.CharField(max_length=100, blank=True)
     fecha_ingreso = models.DateField(null=True, blank=True)
     usuario_registro = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, 
                                         help_text="Usuario que registró esta materia prima")
+    # Última modificación; los UPDATE de stock_service la fijan explícitamente
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Materias con stock disponible (preparador) y entradas del día (operario)
+            models.Index(fields=['cantidad_disponible'], name='materia_disponible_idx'),
+            models.Index(fields=['fecha_ingreso'], name='materia_fecha_ingreso_idx'),
+            # Filas cambiadas desde la última exportación analítica
+            models.Index(fields=['updated_at'], name='materia_actualizado_idx'),
+        ]
 
     def __str__(self):
         """Return a more descriptive and robust string representation."""
@@ -66,6 +86,117 @@ class Materia(models.Model):
         return f"Materia ID: {self.id}"
 
 
+class MovimientoStock(models.Model):
+    """Movimiento del libro de stock de una materia prima (solo inserción)."""
+    
+    TIPO_CHOICES = [
+        ('entrada', 'Entrada'),
+        ('consumo', 'Consumo'),
+        ('ajuste', 'Ajuste'),
+    ]
+    
+    materia = models.ForeignKey(Materia, on_delete=models.CASCADE, related_name='movimientos')
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    cantidad = models.DecimalField(max_digits=12, decimal_places=2,
+                                   help_text="Cantidad con signo: positiva entra, negativa sale")
+    saldo_resultante = models.DecimalField(max_digits=12, decimal_places=2,
+                                           help_text="Saldo de la materia después del movimiento")
+    preparacion = models.ForeignKey('PreparacionMateria', on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='movimientos_stock')
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    observaciones = models.CharField(max_length=255, blank=True)
+    fecha = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-fecha', '-id']
+        verbose_name = 'Movimiento de Stock'
+        verbose_name_plural = 'Movimientos de Stock'
+        indexes = [
+            models.Index(fields=['materia', 'fecha'], name='mov_materia_fecha_idx'),
+            models.Index(fields=['tipo', 'fecha'], name='mov_tipo_fecha_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.cantidad} de {self.materia}"
+    
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError('Los movimientos de stock no se modifican; registra un ajuste.')
+        super().save(*args, **kwargs)
+
+
+@receiver(post_save, sender=Materia)
+def registrar_entrada_inicial(sender, instance, created, **kwargs):
+    """Record the initial stock of a new Materia as an 'entrada' movement."""
+    if created and instance.cantidad:
+        MovimientoStock.objects.create(
+            materia=instance,
+            tipo='entrada',
+            cantidad=instance.cantidad,
+            saldo_resultante=instance.cantidad,
+            usuario=instance.usuario_registro,
+            observaciones='Ingreso de materia prima',
+        )
+
+
+class ContadorEstado(models.Model):
+    """Contador materializado de filas por (modelo, dimensión, valor)."""
+    
+    modelo = models.CharField(max_length=50)
+    dimension = models.CharField(max_length=50)
+    valor = models.CharField(max_length=50)
+    total = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Contador de Estado'
+        verbose_name_plural = 'Contadores de Estado'
+        constraints = [
+            models.UniqueConstraint(fields=['modelo', 'dimension', 'valor'], name='contador_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.modelo}.{self.dimension}={self.valor}: {self.total}"
+
+
+class ResumenProduccionDiaria(models.Model):
+    """Acumulado diario de producción por (día, proceso, tipo de materia, tipo/etapa, usuario)."""
+    
+    PROCESO_CHOICES = [
+        ('ingreso', 'Ingreso de Materia'),
+        ('preparacion', 'Preparación'),
+        ('hilatura', 'Hilatura'),
+    ]
+    
+    fecha = models.DateField()
+    proceso = models.CharField(max_length=20, choices=PROCESO_CHOICES)
+    materia_tipo = models.CharField(max_length=100, blank=True)
+    tipo = models.CharField(max_length=50, blank=True,
+                            help_text="Tipo de proceso de preparación o etapa de hilatura")
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    
+    # Registros creados ese día (fecha de ingreso / fecha de inicio)
+    creados = models.IntegerField(default=0)
+    kg_creados = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Registros completados ese día (fecha de completado)
+    completados = models.IntegerField(default=0)
+    kg_entrada = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    kg_salida = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    calidad_excelente = models.IntegerField(default=0)
+    calidad_buena = models.IntegerField(default=0)
+    calidad_regular = models.IntegerField(default=0)
+    calidad_deficiente = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Resumen de Producción Diaria'
+        verbose_name_plural = 'Resúmenes de Producción Diaria'
+        indexes = [
+            models.Index(fields=['proceso', 'fecha'], name='resumen_proceso_fecha_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_proceso_display()} {self.fecha} {self.materia_tipo} {self.tipo}"
+
+
 class PreparacionMateria(models.Model):
     """Modelo para el proceso de preparación de materias primas."""
     
@@ -113,11 +244,29 @@ class PreparacionMateria(models.Model):
     fecha_completado = models.DateTimeField(null=True, blank=True)
     usuario_preparador = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
                                          help_text="Usuario preparador que realizó el proceso")
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-fecha_inicio']
         verbose_name = 'Preparación de Materia'
         verbose_name_plural = 'Preparaciones de Materias'
+        indexes = [
+            # Listados y reportes ordenados por fecha, con y sin filtro
+            models.Index(fields=['fecha_inicio'], name='prep_inicio_idx'),
+            models.Index(fields=['estado', 'fecha_inicio'], name='prep_estado_inicio_idx'),
+            models.Index(fields=['tipo_proceso', 'fecha_inicio'], name='prep_tipo_inicio_idx'),
+            models.Index(fields=['estado', 'fecha_completado'], name='prep_estado_completado_idx'),
+            # Dashboard del preparador
+            models.Index(fields=['usuario_preparador', 'estado'], name='prep_usuario_estado_idx'),
+            models.Index(fields=['usuario_preparador', 'fecha_completado'], name='prep_usuario_completado_idx'),
+            # Trabajo abierto (pendiente / en proceso) - parcial, pequeño
+            models.Index(fields=['estado', 'fecha_inicio'], name='prep_abiertas_idx',
+                         condition=models.Q(estado__in=['pendiente', 'en_proceso'])),
+            # Validador de respuestas condicionales del listado
+            models.Index(fields=['updated_at'], name='prep_actualizado_idx'),
+            # Paginación por cursor del listado, en su mismo orden
+            models.Index(fields=['-fecha_inicio', 'id'], name='prep_pagina_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_tipo_proceso_display()} de {self.materia_prima} ({self.get_estado_display()})"
@@ -167,11 +316,16 @@ class DetallePreparacion(models.Model):
                                     help_text="Notas técnicas del proceso")
     
     fecha_registro = models.DateTimeField(auto_now_add=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-fecha_registro']
         verbose_name = 'Detalle de Preparación'
         verbose_name_plural = 'Detalles de Preparación'
+        indexes = [
+            # Filas cambiadas desde la última exportación analítica
+            models.Index(fields=['updated_at'], name='detprep_actualizado_idx'),
+        ]
     
     def __str__(self):
         return f"Detalle de {self.preparacion}"
@@ -232,11 +386,25 @@ class ProcesoHilatura(models.Model):
     fecha_completado = models.DateTimeField(null=True, blank=True)
     usuario_operador = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
                                         help_text="Usuario operario que realizó el proceso")
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-fecha_inicio']
         verbose_name = 'Proceso de Hilatura'
         verbose_name_plural = 'Procesos de Hilatura'
+        indexes = [
+            models.Index(fields=['fecha_inicio'], name='hila_inicio_idx'),
+            models.Index(fields=['estado', 'fecha_inicio'], name='hila_estado_inicio_idx'),
+            models.Index(fields=['etapa', 'fecha_inicio'], name='hila_etapa_inicio_idx'),
+            models.Index(fields=['estado', 'fecha_completado'], name='hila_estado_completado_idx'),
+            # Trabajo abierto (pendiente / en proceso) - parcial, pequeño
+            models.Index(fields=['estado', 'fecha_inicio'], name='hila_abiertas_idx',
+                         condition=models.Q(estado__in=['pendiente', 'en_proceso'])),
+            # Validador de respuestas condicionales del listado
+            models.Index(fields=['updated_at'], name='hila_actualizado_idx'),
+            # Paginación por cursor del listado, en su mismo orden
+            models.Index(fields=['-fecha_inicio', 'id'], name='hila_pagina_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_etapa_display()} - {self.get_estado_display()} ({self.fecha_inicio.strftime('%d/%m/%Y')})"
@@ -325,11 +493,16 @@ class DetalleHilatura(models.Model):
                                      help_text="Notas técnicas del proceso")
     
     fecha_registro = models.DateTimeField(auto_now_add=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-fecha_registro']
         verbose_name = 'Detalle de Hilatura'
         verbose_name_plural = 'Detalles de Hilatura'
+        indexes = [
+            # Filas cambiadas desde la última exportación analítica
+            models.Index(fields=['updated_at'], name='dethila_actualizado_idx'),
+        ]
     
     def __str__(self):
         return f"Detalle de {self.hilatura}"
@@ -0,0 +1,154 @@
+"""
+Keyset pagination - list pages that cost O(page size) at any depth.
+
+A page is read with WHERE <ordering columns> past the cursor row, LIMIT n + 1
+and no OFFSET, so the last page costs the same as the first and rows created
+meanwhile do not shift the following pages. The cursor holds the ordering
+values of the last (or first) row shown and travels in the URL as ?despues=
+or ?antes=, next to the list filters. The extra row tells whether there is
+another page, so no COUNT(*) is needed to draw the links.
+
+The queryset ordering must use non-null model fields and end with a unique
+one, e.g. ('-fecha_inicio', 'id'), so every row has its own position.
+"""
+import base64
+import binascii
+import json
+from typing import Any, List, Optional, Sequence, Tuple
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Field, Q, QuerySet
+
+
+class Pagina:
+    """
+    One page of rows, iterable like the list it replaces in the templates.
+
+    url_anterior and url_siguiente are None at either end of the list;
+    url_primera is None on the first page.
+    """
+
+    def __init__(self, objetos: List[Any], url_anterior: Optional[str],
+                 url_siguiente: Optional[str], url_primera: Optional[str]):
+        self.objetos = objetos
+        self.url_anterior = url_anterior
+        self.url_siguiente = url_siguiente
+        self.url_primera = url_primera
+
+    def __iter__(self):
+        return iter(self.objetos)
+
+    def __len__(self):
+        return len(self.objetos)
+
+
+def _campos_orden(queryset: QuerySet) -> List[Tuple[Field, bool]]:
+    """(field, descending) for each ordering term of the queryset."""
+    orden = queryset.query.order_by or queryset.model._meta.ordering
+    opciones = queryset.model._meta
+    campos = []
+    for termino in orden:
+        if not isinstance(termino, str):
+            raise ValueError(f'Keyset pagination needs field names in the ordering, got {termino!r}')
+        nombre = termino.lstrip('-')
+        try:
+            campo = opciones.pk if nombre == 'pk' else opciones.get_field(nombre)
+        except FieldDoesNotExist:
+            raise ValueError(f'Keyset pagination cannot order by {termino!r}') from None
+        campos.append((campo, termino.startswith('-')))
+    if not campos or not campos[-1][0].unique:
+        raise ValueError(f'The ordering {list(orden)} must end with a unique field')
+    return campos
+
+
+def _codificar_cursor(campos: Sequence[Tuple[Field, bool]], objeto) -> str:
+    valores = [getattr(objeto, campo.attname) for campo, _ in campos]
+    # str() keeps every microsecond of a datetime; to_python() parses it back
+    texto = json.dumps([v if isinstance(v, (int, str)) else str(v) for v in valores])
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def _leer_cursor(texto: Optional[str], campos: Sequence[Tuple[Field, bool]]) -> Optional[list]:
+    """Ordering values in the cursor, or None when missing or malformed."""
+    if not texto:
+        return None
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(texto + '=' * (-len(texto) % 4)))
+        if not isinstance(valores, list) or len(valores) != len(campos):
+            return None
+        return [campo.to_python(valor) for (campo, _), valor in zip(campos, valores)]
+    except (ValueError, TypeError, binascii.Error, ValidationError):
+        return None
+
+
+def _despues_de(campos: Sequence[Tuple[Field, bool]], valores: list, hacia_atras: bool = False) -> Q:
+    """
+    Rows past the cursor in the ordering (before it when hacia_atras).
+
+    Expands to (a past x) OR (a = x AND b past y) ..., which handles mixed
+    directions like ('-fecha_inicio', 'id'). The leading range is repeated as
+    a plain bound so the index on the first field is scanned from the cursor.
+    """
+    condicion = Q()
+    iguales = {}
+    for (campo, descendente), valor in zip(campos, valores):
+        menor = descendente != hacia_atras
+        condicion |= Q(**iguales, **{f'{campo.name}__{"lt" if menor else "gt"}': valor})
+        iguales[campo.name] = valor
+    campo, descendente = campos[0]
+    return Q(**{f'{campo.name}__{"lte" if descendente != hacia_atras else "gte"}': valores[0]}) & condicion
+
+
+def _url(request, ruta: str, **cursor) -> str:
+    """`ruta` with the current filters and the given cursor (none for the first page)."""
+    parametros = request.GET.copy()
+    parametros.pop('antes', None)
+    parametros.pop('despues', None)
+    parametros.update(cursor)
+    consulta = parametros.urlencode()
+    return f'{ruta}?{consulta}' if consulta else ruta
+
+
+def paginar(request, queryset: QuerySet, tamano: Optional[int] = None, ruta: Optional[str] = None) -> Pagina:
+    """
+    Read the page of `queryset` selected by the request's cursor.
+
+    Args:
+        request: Current request; ?despues= / ?antes= select the page and
+            the other parameters (the list filters) are kept in the links
+        queryset: Filtered and ordered queryset (see the module docstring)
+        tamano: Rows per page, settings.PAGINACION_TAMANO by default
+        ruta: Path of the links, request.path by default; a table fragment
+            passes the path of its page
+
+    Returns:
+        Pagina with at most `tamano` rows, in the queryset ordering
+    """
+    tamano = tamano or settings.PAGINACION_TAMANO
+    ruta = ruta or request.path
+    campos = _campos_orden(queryset)
+    despues = _leer_cursor(request.GET.get('despues'), campos)
+    antes = None if despues else _leer_cursor(request.GET.get('antes'), campos)
+
+    if antes:
+        filas = list(queryset.filter(_despues_de(campos, antes, hacia_atras=True)).reverse()[:tamano + 1])
+        if len(filas) <= tamano:
+            # Going back reached the start: show the full first page instead of a short one
+            antes = None
+        else:
+            objetos = filas[:tamano][::-1]
+            hay_anterior = hay_siguiente = True  # the cursor row follows this page
+    if not antes:
+        if despues:
+            queryset = queryset.filter(_despues_de(campos, despues))
+        filas = list(queryset[:tamano + 1])
+        objetos = filas[:tamano]
+        hay_anterior = bool(despues and objetos)
+        hay_siguiente = len(filas) > tamano
+
+    return Pagina(
+        objetos,
+        url_anterior=_url(request, ruta, antes=_codificar_cursor(campos, objetos[0])) if hay_anterior else None,
+        url_siguiente=_url(request, ruta, despues=_codificar_cursor(campos, objetos[-1])) if hay_siguiente else None,
+        url_primera=_url(request, ruta) if despues or antes else None,
+    )
@@ -0,0 +1,47 @@
+"""
+Template precompilation - parses every Texcore template into the cached loader.
+
+With the cached loader each worker keeps compiled templates in memory, but
+only after the first request that uses them. Calling precompilar_plantillas()
+while the worker boots moves that parse cost out of the first requests.
+"""
+from pathlib import Path
+from typing import List, Tuple
+from django.apps import apps
+from django.template import engines
+from django.template.exceptions import TemplateDoesNotExist, TemplateSyntaxError
+
+
+def nombres_plantillas() -> List[str]:
+    """Names (relative to Texcore/templates) of every template in the app."""
+    directorio = Path(apps.get_app_config('Texcore').path) / 'templates'
+    return sorted(
+        ruta.relative_to(directorio).as_posix()
+        for ruta in directorio.rglob('*.html')
+    )
+
+
+def precompilar_plantillas(alias: str = 'django') -> Tuple[List[str], List[Tuple[str, str]]]:
+    """
+    Load every Texcore template through the engine, so the cached loader keeps it.
+
+    Parents and includes are compiled as templates of their own, and since
+    the cached loader keys {% extends %} lookups by name, rendering does not
+    parse them again.
+
+    Args:
+        alias: Template engine alias from settings.TEMPLATES
+
+    Returns:
+        (compiled template names, [(template name, error)] for the ones that failed)
+    """
+    motor = engines[alias]
+    compiladas, errores = [], []
+    for nombre in nombres_plantillas():
+        try:
+            motor.get_template(nombre)
+        except (TemplateSyntaxError, TemplateDoesNotExist) as error:
+            errores.append((nombre, str(error)))
+        else:
+            compiladas.append(nombre)
+    return compiladas, errores
@@ -0,0 +1,123 @@
+"""
+Database routers - send dashboard and report reads to the reporting alias.
+
+Writes always go to ``default``. Reads are routed to ``settings.REPORTING_DB_ALIAS``
+only inside ``lectura_de_reportes()``, so regular shop-floor pages keep reading
+their own writes. When the alias is not configured (development, tests) or the
+snapshot file does not exist yet, everything falls back to ``default``.
+
+Rows sent while a response streams are read with ``leer_de_reportes()``
+instead: the queryset is pinned to the alias with ``.using()``, so no routing
+or transaction is left active in the thread once the view returns.
+"""
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
+from typing import Iterator, List, Optional
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import QuerySet
+
+
+_alias_reportes: ContextVar[Optional[str]] = ContextVar('alias_reportes', default=None)
+
+
+def alias_reportes_disponible() -> Optional[str]:
+    """
+    Return the reporting alias if it is configured and usable.
+
+    Returns:
+        Alias name, or None to read from the default database
+    """
+    alias = getattr(settings, 'REPORTING_DB_ALIAS', None)
+    if not alias or alias not in settings.DATABASES:
+        return None
+
+    snapshot = getattr(settings, 'REPORTING_SNAPSHOT_PATH', None)
+    if snapshot and not os.path.exists(snapshot):
+        return None
+    return alias
+
+
+@contextmanager
+def lectura_de_reportes():
+    """
+    Route reads to the reporting alias inside one read transaction.
+
+    Every query of the block sees the same snapshot, so the totals of a report
+    add up. Can be used as a decorator (``@lectura_de_reportes()``) and nested;
+    only the outermost block opens the transaction.
+    """
+    if _alias_reportes.get() is not None:
+        yield _alias_reportes.get()
+        return
+
+    alias = alias_reportes_disponible() or DEFAULT_DB_ALIAS
+    token = _alias_reportes.set(alias)
+    try:
+        with transaction.atomic(using=alias):
+            yield alias
+    finally:
+        _alias_reportes.reset(token)
+
+
+def alias_de_lectura() -> str:
+    """
+    Alias report reads go to: the one of the enclosing lectura_de_reportes()
+    block, else the reporting alias if usable, else ``default``.
+    """
+    return _alias_reportes.get() or alias_reportes_disponible() or DEFAULT_DB_ALIAS
+
+
+def leer_de_reportes(queryset: QuerySet, tamano_bloque: int) -> Iterator[List]:
+    """
+    Read `queryset` in blocks from the alias of alias_de_lectura(), pinned
+    with .using(), for responses that keep reading after the view returns.
+
+    The query runs before returning, so a database error is raised in the
+    view. Each row is read once, a chunk at a time; closing the blocks
+    (e.g. when the client disconnects) closes the cursor.
+
+    Args:
+        queryset: Filtered and ordered queryset (or values_list())
+        tamano_bloque: Rows per block and per database fetch
+
+    Returns:
+        Generator of lists of up to tamano_bloque rows
+    """
+    filas = queryset.using(alias_de_lectura()).iterator(chunk_size=tamano_bloque)
+
+    def bloques():
+        try:
+            bloque = list(islice(filas, tamano_bloque))
+            yield None  # the query has run; next() below stops here
+            while bloque:
+                yield bloque
+                bloque = list(islice(filas, tamano_bloque))
+        finally:
+            filas.close()
+
+    lectura = bloques()
+    # Run the query now; a started generator also closes the cursor on close()
+    next(lectura)
+    return lectura
+
+
+class ReportingRouter:
+    """Route reads made inside lectura_de_reportes() to the reporting database."""
+
+    def db_for_read(self, model, **hints):
+        return _alias_reportes.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The reporting alias holds a copy of default, so rows are interchangeable
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == getattr(settings, 'REPORTING_DB_ALIAS', None):
+            return False
+        return None
@@ -13,12 +13,24 @@ from .preparacion_service import (
     crear_preparacion,
     iniciar_preparacion_proceso,
     completar_preparacion_proceso,
+    actualizar_preparacion,
+    eliminar_preparacion,
     validar_stock_disponible,
 )
+from .stock_service import (
+    registrar_entrada,
+    consumir_stock,
+    reservar_stock,
+    liberar_reserva,
+    consumir_reserva,
+    ajustar_stock,
+    get_movimientos_materia,
+)
 from .dashboard_service import (
     get_admin_dashboard_stats,
     get_operario_dashboard_stats,
     get_preparador_dashboard_stats,
+    get_resumen_del_dia,
 )
 from .hilatura_service import (
     get_all_hilaturas,
@@ -28,6 +40,8 @@ from .hilatura_service import (
     agregar_detalle_hilatura,
     filtrar_hilaturas,
     obtener_estadisticas_hilatura,
+    obtener_reporte_hilaturas,
+    iterar_reporte_hilaturas,
 )
 
 __all__ = [
@@ -40,10 +54,20 @@ __all__ = [
     'crear_preparacion',
     'iniciar_preparacion_proceso',
     'completar_preparacion_proceso',
+    'actualizar_preparacion',
+    'eliminar_preparacion',
     'validar_stock_disponible',
+    'registrar_entrada',
+    'consumir_stock',
+    'reservar_stock',
+    'liberar_reserva',
+    'consumir_reserva',
+    'ajustar_stock',
+    'get_movimientos_materia',
     'get_admin_dashboard_stats',
     'get_operario_dashboard_stats',
     'get_preparador_dashboard_stats',
+    'get_resumen_del_dia',
     'get_all_hilaturas',
     'crear_proceso_hilatura',
     'iniciar_proceso_hilatura',
@@ -51,4 +75,6 @@ __all__ = [
     'agregar_detalle_hilatura',
     'filtrar_hilaturas',
     'obtener_estadisticas_hilatura',
+    'obtener_reporte_hilaturas',
+    'iterar_reporte_hilaturas',
 ]
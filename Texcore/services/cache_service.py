@@ -0,0 +1,429 @@
+"""
+Cache service - versioned caching of assembled dashboard statistics.
+
+Each cached dashboard has a version number stored in the cache. Values are
+stored under (name, version); a write to any model the dashboard depends on
+bumps the version after the transaction commits, so the next request misses
+and recomputes from committed data. Stale entries are never deleted, they just
+stop being read and expire with DASHBOARD_CACHE_TIMEOUT.
+
+Per-user dashboards keep one version per user, bumped only by writes to that
+user's own rows, and include the day in the key so "today" numbers roll over.
+
+Writes through the ORM are caught by post_save/post_delete (connected in
+TexcoreConfig.ready); the counter and rollup services, which write with
+UPDATE, bump explicitly.
+
+Template fragments ({% fragmento %}, Texcore/templatetags/texcore_cache.py)
+are keyed by the versions of the models they render, also bumped on commit, so
+a section whose models did not change keeps its HTML when the rest of the page
+is recomputed.
+
+Versions start from the current time in milliseconds, so a version evicted
+from the cache never comes back with a value it had before.
+
+Report summaries (the statistics above a report's table; the rows are
+streamed fresh) are not invalidated on write: they are cached per normalized
+filter set with a staleness budget (REPORT_CACHE_MAX_AGE). Past the budget one worker
+recomputes under a lock taken with cache.add() while the others keep serving
+the previous value; requests with nothing to serve wait for that worker.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+# Dashboards and the models they are computed from (model labels)
+DEPENDENCIAS: Dict[str, tuple] = {
+    'admin_dashboard': (
+        'Texcore.Materia', 'Texcore.MovimientoStock', 'Texcore.PreparacionMateria',
+        'Texcore.ContadorEstado', 'Texcore.ResumenProduccionDiaria',
+    ),
+    'resumen_del_dia': (
+        'Texcore.Materia', 'Texcore.MovimientoStock', 'Texcore.PreparacionMateria',
+    ),
+    # Form dropdowns (opciones_service)
+    'opciones_materias': (
+        'Texcore.Materia', 'Texcore.MovimientoStock', 'Texcore.PreparacionMateria',
+    ),
+    'opciones_preparaciones': ('Texcore.PreparacionMateria', 'Texcore.Materia'),
+}
+
+# Template fragments and the models their HTML is built from. User names are
+# not tracked (every login saves the user). Report summaries depend on no
+# model version: they vary on the time their cached statistics were computed
+# (obtener_reporte()), which changes whenever the statistics do.
+FRAGMENTOS: Dict[str, tuple] = {
+    'admin_materias_por_tipo': ('Texcore.Materia', 'Texcore.MovimientoStock'),
+    'admin_materiales_procesados': ('Texcore.ResumenProduccionDiaria',),
+    'admin_preparadores_activos': ('Texcore.ResumenProduccionDiaria',),
+    'admin_preparaciones_recientes': ('Texcore.PreparacionMateria', 'Texcore.Materia'),
+    'admin_entradas_por_mes': ('Texcore.ResumenProduccionDiaria',),
+    'admin_entradas_recientes': ('Texcore.Materia', 'Texcore.MovimientoStock'),
+    'reporte_preparaciones_resumen': (),
+    'reporte_hilaturas_resumen': (),
+}
+
+# Per-user dashboards: {name: {model label: field holding the owner's id}}
+DEPENDENCIAS_POR_USUARIO: Dict[str, Dict[str, str]] = {
+    'operario_dashboard': {'Texcore.Materia': 'usuario_registro_id'},
+    'preparador_dashboard': {'Texcore.PreparacionMateria': 'usuario_preparador_id'},
+}
+
+# Hit/miss counts of this process not yet added to the shared counters
+_estadisticas_pendientes: Counter = Counter()
+_bloqueo_estadisticas = threading.Lock()
+_ultimo_volcado = time.monotonic()
+
+
+def _clave_version(nombre: str, usuario_id: Optional[int] = None) -> str:
+    if usuario_id is None:
+        return f'cache_version:{nombre}'
+    return f'cache_version:{nombre}:{usuario_id}'
+
+
+def _clave_version_modelo(etiqueta: str) -> str:
+    return f'cache_version:modelo:{etiqueta}'
+
+
+def _clave_datos(nombre: str, usuario_id: Optional[int], dia: Optional[date]) -> str:
+    partes = [nombre]
+    if usuario_id is not None:
+        partes.append(str(usuario_id))
+    if dia is not None:
+        partes.append(dia.isoformat())
+    return ':'.join(partes)
+
+
+def _clave_estadistica(nombre: str, resultado: str) -> str:
+    return f'cache_stats:{nombre}:{resultado}'
+
+
+def _version_inicial() -> int:
+    return int(time.time() * 1000)
+
+
+def version(nombre: str, usuario_id: Optional[int] = None) -> int:
+    """Current version of a cached dashboard (of one user, for per-user ones)."""
+    return cache.get_or_set(_clave_version(nombre, usuario_id), _version_inicial, timeout=None)
+
+
+def versiones_modelos(etiquetas: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """
+    Current data version of each model, in one cache round trip.
+
+    Views take this snapshot before reading their data and pass it to the
+    template as `versiones_cache`, so a write committed while the page is
+    built cannot have its fragments cached under the new versions.
+
+    Args:
+        etiquetas: Model labels (defaults to every model a fragment renders)
+
+    Returns:
+        Dictionary {model label: version}
+    """
+    if etiquetas is None:
+        etiquetas = {etiqueta for modelos in FRAGMENTOS.values() for etiqueta in modelos}
+    claves = {_clave_version_modelo(etiqueta): etiqueta for etiqueta in etiquetas}
+    encontradas = cache.get_many(list(claves))
+    versiones = {}
+    for clave, etiqueta in claves.items():
+        if clave not in encontradas:
+            cache.add(clave, _version_inicial(), timeout=None)
+            encontradas[clave] = cache.get(clave)
+        versiones[etiqueta] = encontradas[clave]
+    return versiones
+
+
+def _incrementar(clave: str, inicial: int = 0, delta: int = 1) -> None:
+    cache.add(clave, inicial, timeout=None)
+    try:
+        cache.incr(clave, delta)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(clave, inicial + delta, timeout=None)
+
+
+def _contar(nombre: str, resultado: str) -> None:
+    """
+    Count a hit or miss in this process. The counts are added to the shared
+    counters at most every DASHBOARD_CACHE_STATS_INTERVAL seconds, so cache
+    hits do not write to the cache.
+    """
+    global _ultimo_volcado
+    with _bloqueo_estadisticas:
+        _estadisticas_pendientes[_clave_estadistica(nombre, resultado)] += 1
+        if time.monotonic() - _ultimo_volcado < settings.DASHBOARD_CACHE_STATS_INTERVAL:
+            return
+    volcar_estadisticas()
+
+
+def volcar_estadisticas() -> None:
+    """Add the hit/miss counts of this process to the shared counters."""
+    global _ultimo_volcado
+    with _bloqueo_estadisticas:
+        pendientes = dict(_estadisticas_pendientes)
+        _estadisticas_pendientes.clear()
+        _ultimo_volcado = time.monotonic()
+    for clave, cantidad in pendientes.items():
+        _incrementar(clave, delta=cantidad)
+
+
+def invalidar(*nombres: str) -> None:
+    """
+    Bump the version of the given dashboards once the current transaction commits.
+
+    Args:
+        *nombres: Dashboard names (keys of DEPENDENCIAS)
+    """
+    def bump():
+        for nombre in nombres:
+            _incrementar(_clave_version(nombre), _version_inicial())
+    transaction.on_commit(bump)
+
+
+def invalidar_usuario(nombre: str, usuario_id: int) -> None:
+    """
+    Bump the version of one user's per-user dashboard once the transaction commits.
+
+    Args:
+        nombre: Dashboard name (key of DEPENDENCIAS_POR_USUARIO)
+        usuario_id: Owner of the rows that changed
+    """
+    transaction.on_commit(lambda: _incrementar(_clave_version(nombre, usuario_id), _version_inicial()))
+
+
+def invalidar_modelos(*etiquetas: str) -> None:
+    """
+    Bump the data version of the given models and of every dashboard that
+    depends on one of them.
+
+    Args:
+        *etiquetas: Model labels (app_label.ModelName)
+    """
+    nombres = [
+        nombre for nombre, modelos in DEPENDENCIAS.items()
+        if any(etiqueta in modelos for etiqueta in etiquetas)
+    ]
+
+    def bump():
+        # Dashboards first: a request that reads the new model versions must
+        # not get the old dashboard data and cache fragments of it under them
+        for nombre in nombres:
+            _incrementar(_clave_version(nombre), _version_inicial())
+        for etiqueta in etiquetas:
+            _incrementar(_clave_version_modelo(etiqueta), _version_inicial())
+    transaction.on_commit(bump)
+
+
+def invalidar_por_senal(sender, instance, **kwargs) -> None:
+    """post_save / post_delete receiver."""
+    etiqueta = sender._meta.label
+    invalidar_modelos(etiqueta)
+    for nombre, modelos in DEPENDENCIAS_POR_USUARIO.items():
+        if etiqueta in modelos:
+            usuario_id = getattr(instance, modelos[etiqueta])
+            if usuario_id is not None:
+                invalidar_usuario(nombre, usuario_id)
+
+
+def modelos_observados() -> Iterable[str]:
+    """Labels of every model some cached dashboard depends on."""
+    return {
+        etiqueta
+        for dependencias in (DEPENDENCIAS, DEPENDENCIAS_POR_USUARIO, FRAGMENTOS)
+        for modelos in dependencias.values()
+        for etiqueta in modelos
+    }
+
+
+def obtener_o_calcular(
+    nombre: str,
+    calcular: Callable[[], Dict[str, Any]],
+    usuario_id: Optional[int] = None,
+    dia: Optional[date] = None
+) -> Dict[str, Any]:
+    """
+    Return the cached statistics of a dashboard, computing them on a miss.
+
+    Args:
+        nombre: Dashboard name (key of DEPENDENCIAS or DEPENDENCIAS_POR_USUARIO)
+        calcular: Function returning the statistics as plain, picklable data
+        usuario_id: Owner, for per-user dashboards
+        dia: Day the statistics refer to, for dashboards with "today" numbers
+
+    Returns:
+        Dashboard statistics
+    """
+    if not settings.DASHBOARD_CACHE:
+        return calcular()
+
+    clave = _clave_datos(nombre, usuario_id, dia)
+    version_actual = version(nombre, usuario_id)
+    datos = cache.get(clave, version=version_actual)
+    if datos is not None:
+        _contar(nombre, 'aciertos')
+        return datos
+
+    _contar(nombre, 'fallos')
+    datos = calcular()
+    cache.set(clave, datos, timeout=settings.DASHBOARD_CACHE_TIMEOUT, version=version_actual)
+    return datos
+
+
+def _clave_reporte(nombre: str, parametros: Mapping[str, Any]) -> str:
+    """Cache key of a report for a filter set; empty filters are dropped."""
+    normalizados = sorted(
+        (clave, str(valor).strip()) for clave, valor in parametros.items()
+        if valor is not None and str(valor).strip()
+    )
+    resumen = hashlib.md5(urlencode(normalizados).encode()).hexdigest()
+    return f'reporte:{nombre}:{resumen}'
+
+
+def _esperar_reporte(clave: str, clave_bloqueo: str) -> Optional[Dict[str, Any]]:
+    """Wait for the worker holding the lock to store the report."""
+    limite = time.monotonic() + settings.REPORT_CACHE_LOCK_TIMEOUT
+    while time.monotonic() < limite:
+        time.sleep(0.05)
+        entrada = cache.get(clave)
+        if entrada is not None:
+            return entrada['datos']
+        if cache.get(clave_bloqueo) is None:
+            # The other worker failed; compute here
+            return None
+    return None
+
+
+def obtener_reporte(
+    nombre: str,
+    parametros: Mapping[str, Any],
+    calcular: Callable[[], Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Return a cached report summary, serving the previous value while it is recomputed.
+
+    Args:
+        nombre: Report name (key of REPORT_CACHE_MAX_AGE)
+        parametros: Filters of the report, part of the key
+        calcular: Function returning the statistics as picklable data, without the rows
+
+    Returns:
+        Report data
+    """
+    if not settings.DASHBOARD_CACHE:
+        return calcular()
+
+    clave = _clave_reporte(nombre, parametros)
+    entrada = cache.get(clave)
+    if entrada is not None and time.time() - entrada['calculado'] < settings.REPORT_CACHE_MAX_AGE[nombre]:
+        _contar(nombre, 'aciertos')
+        return entrada['datos']
+
+    clave_bloqueo = f'{clave}:bloqueo'
+    propietario = uuid.uuid4().hex
+    if not cache.add(clave_bloqueo, propietario, timeout=settings.REPORT_CACHE_LOCK_TIMEOUT):
+        # Another worker is recomputing it
+        if entrada is not None:
+            _contar(nombre, 'aciertos')
+            return entrada['datos']
+        datos = _esperar_reporte(clave, clave_bloqueo)
+        if datos is not None:
+            _contar(nombre, 'aciertos')
+            return datos
+
+    _contar(nombre, 'fallos')
+    try:
+        datos = calcular()
+        cache.set(
+            clave, {'datos': datos, 'calculado': time.time()},
+            timeout=settings.REPORT_CACHE_TIMEOUT
+        )
+    finally:
+        if cache.get(clave_bloqueo) == propietario:
+            cache.delete(clave_bloqueo)
+    return datos
+
+
+def obtener_fragmento(
+    nombre: str,
+    renderizar: Callable[[], str],
+    variaciones: Iterable[Any] = (),
+    versiones: Optional[Mapping[str, int]] = None
+) -> str:
+    """
+    Return the cached HTML of a template fragment, rendering it on a miss.
+
+    Args:
+        nombre: Fragment name (key of FRAGMENTOS)
+        renderizar: Function rendering the fragment
+        variaciones: Extra values the HTML depends on
+        versiones: Snapshot from versiones_modelos(), if the view took one
+
+    Returns:
+        Fragment HTML
+    """
+    if not settings.DASHBOARD_CACHE:
+        return renderizar()
+
+    modelos = FRAGMENTOS[nombre]
+    if versiones is None or any(modelo not in versiones for modelo in modelos):
+        versiones = versiones_modelos(modelos)
+    partes = [f'{modelo}={versiones[modelo]}' for modelo in modelos]
+    partes += [str(valor) for valor in variaciones]
+    clave = f'fragmento:{nombre}:{hashlib.md5("|".join(partes).encode()).hexdigest()}'
+
+    html = cache.get(clave)
+    if html is not None:
+        _contar(nombre, 'aciertos')
+        return html
+
+    _contar(nombre, 'fallos')
+    html = renderizar()
+    cache.set(clave, html, timeout=settings.DASHBOARD_CACHE_TIMEOUT)
+    return html
+
+
+def _nombres_con_estadisticas() -> tuple:
+    return (*DEPENDENCIAS, *DEPENDENCIAS_POR_USUARIO, *settings.REPORT_CACHE_MAX_AGE, *FRAGMENTOS)
+
+
+def get_estadisticas() -> Dict[str, Dict[str, int]]:
+    """
+    Hit/miss counters of every cached dashboard, report and template fragment
+    (per cache backend). This process's counts are added first; other
+    processes add theirs every DASHBOARD_CACHE_STATS_INTERVAL seconds.
+
+    Returns:
+        Dictionary {nombre: {'aciertos', 'fallos', 'version'}}; per-user
+        dashboards have one version per user, reports and fragments have
+        none, all reported as None
+    """
+    volcar_estadisticas()
+    return {
+        nombre: {
+            'aciertos': cache.get(_clave_estadistica(nombre, 'aciertos'), 0),
+            'fallos': cache.get(_clave_estadistica(nombre, 'fallos'), 0),
+            'version': version(nombre) if nombre in DEPENDENCIAS else None,
+        }
+        for nombre in _nombres_con_estadisticas()
+    }
+
+
+def reiniciar_estadisticas() -> None:
+    """Reset the hit/miss counters."""
+    with _bloqueo_estadisticas:
+        _estadisticas_pendientes.clear()
+    cache.delete_many([
+        _clave_estadistica(nombre, resultado)
+        for nombre in _nombres_con_estadisticas()
+        for resultado in ('aciertos', 'fallos')
+    ])
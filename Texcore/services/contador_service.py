@@ -0,0 +1,150 @@
+"""
+Contador service - O(1) state counters for preparations and spinning processes.
+
+ContadorEstado keeps one row per (modelo, dimension, valor) plus a 'total' row
+per model. The service-layer create, transition and delete paths move the
+counters with UPDATE ... SET total = total + n inside their own transaction,
+so the dashboards read every count in a single query instead of one COUNT(*)
+per estado/etapa. `manage.py recount` rebuilds the table if it ever drifts.
+"""
+from typing import Any, Dict, Type
+from django.db import transaction
+from django.db.models import Count, F, Model, QuerySet
+from ..models import ContadorEstado, PreparacionMateria, ProcesoHilatura
+from . import cache_service
+
+
+# Counted dimensions per model
+DIMENSIONES: Dict[Type[Model], tuple] = {
+    PreparacionMateria: ('estado', 'tipo_proceso'),
+    ProcesoHilatura: ('estado', 'etapa'),
+}
+
+DIMENSION_TOTAL = 'total'
+
+
+def _incrementar(modelo: Type[Model], dimension: str, valor: str, delta: int) -> None:
+    """Add delta to one counter, creating its row the first time."""
+    if not delta:
+        return
+    filtro = {'modelo': modelo._meta.model_name, 'dimension': dimension, 'valor': valor or ''}
+    if not ContadorEstado.objects.filter(**filtro).update(total=F('total') + delta):
+        ContadorEstado.objects.get_or_create(**filtro)
+        ContadorEstado.objects.filter(**filtro).update(total=F('total') + delta)
+    # UPDATE sends no signals
+    cache_service.invalidar_modelos('Texcore.ContadorEstado')
+
+
+@transaction.atomic
+def registrar_alta(instancia: Model) -> None:
+    """
+    Count a newly created row.
+
+    Args:
+        instancia: Created PreparacionMateria or ProcesoHilatura
+    """
+    modelo = type(instancia)
+    _incrementar(modelo, DIMENSION_TOTAL, DIMENSION_TOTAL, 1)
+    for dimension in DIMENSIONES[modelo]:
+        _incrementar(modelo, dimension, getattr(instancia, dimension), 1)
+
+
+@transaction.atomic
+def registrar_baja(instancia: Model) -> None:
+    """
+    Uncount a row that is about to be deleted.
+
+    Args:
+        instancia: PreparacionMateria or ProcesoHilatura being deleted
+    """
+    modelo = type(instancia)
+    _incrementar(modelo, DIMENSION_TOTAL, DIMENSION_TOTAL, -1)
+    for dimension in DIMENSIONES[modelo]:
+        _incrementar(modelo, dimension, getattr(instancia, dimension), -1)
+
+
+@transaction.atomic
+def registrar_bajas(queryset: QuerySet) -> None:
+    """
+    Uncount every row of a queryset that is about to be deleted
+    (bulk deletes and cascades), with one grouped query per dimension.
+
+    Args:
+        queryset: QuerySet of PreparacionMateria or ProcesoHilatura
+    """
+    modelo = queryset.model
+    _incrementar(modelo, DIMENSION_TOTAL, DIMENSION_TOTAL, -queryset.count())
+    for dimension in DIMENSIONES[modelo]:
+        for fila in queryset.order_by().values(dimension).annotate(n=Count('pk')):
+            _incrementar(modelo, dimension, fila[dimension], -fila['n'])
+
+
+@transaction.atomic
+def registrar_cambio(instancia: Model, **anteriores) -> None:
+    """
+    Move a row between counters after some of its dimensions changed.
+
+    Args:
+        instancia: Saved PreparacionMateria or ProcesoHilatura
+        **anteriores: Previous value of each dimension that may have changed,
+            e.g. estado='pendiente'
+    """
+    modelo = type(instancia)
+    for dimension, anterior in anteriores.items():
+        actual = getattr(instancia, dimension)
+        if dimension in DIMENSIONES[modelo] and anterior != actual:
+            _incrementar(modelo, dimension, anterior, -1)
+            _incrementar(modelo, dimension, actual, 1)
+
+
+def obtener_contadores(modelo: Type[Model]) -> Dict[str, Any]:
+    """
+    Read all counters of a model in one query.
+
+    Args:
+        modelo: PreparacionMateria or ProcesoHilatura
+
+    Returns:
+        Dictionary with 'total' and one {valor: total} dictionary per dimension
+    """
+    contadores: Dict[str, Any] = {dimension: {} for dimension in DIMENSIONES[modelo]}
+    contadores[DIMENSION_TOTAL] = 0
+    filas = ContadorEstado.objects.filter(
+        modelo=modelo._meta.model_name
+    ).values_list('dimension', 'valor', 'total')
+    for dimension, valor, total in filas:
+        if dimension == DIMENSION_TOTAL:
+            contadores[DIMENSION_TOTAL] = total
+        elif dimension in contadores:
+            contadores[dimension][valor] = total
+    return contadores
+
+
+@transaction.atomic
+def recontar() -> int:
+    """
+    Rebuild the counters table from the source tables.
+
+    Returns:
+        Number of counter rows written
+    """
+    ContadorEstado.objects.all().delete()
+    filas = []
+    for modelo, dimensiones in DIMENSIONES.items():
+        nombre = modelo._meta.model_name
+        filas.append(ContadorEstado(
+            modelo=nombre, dimension=DIMENSION_TOTAL, valor=DIMENSION_TOTAL,
+            total=modelo.objects.count()
+        ))
+        for dimension in dimensiones:
+            # Zero rows for every choice so the hot path never has to insert
+            totales = {valor: 0 for valor, _ in modelo._meta.get_field(dimension).choices}
+            for fila in modelo.objects.order_by().values(dimension).annotate(n=Count('pk')):
+                totales[fila[dimension] or ''] = fila['n']
+            filas.extend(
+                ContadorEstado(modelo=nombre, dimension=dimension, valor=valor, total=total)
+                for valor, total in totales.items()
+            )
+    ContadorEstado.objects.bulk_create(filas)
+    cache_service.invalidar_modelos('Texcore.ContadorEstado')
+    return len(filas)
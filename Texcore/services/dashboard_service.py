@@ -2,80 +2,119 @@
 Dashboard service - handles business logic for dashboard statistics.
 """
 from datetime import date
-from typing import Dict, Any
-from django.db.models import Count, Sum, Q
-from django.db.models.functions import TruncMonth
+from typing import Dict, Any, Iterator, List
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, QuerySet, Sum, Q
 from django.contrib.auth.models import User
+from django.utils import timezone
 from ..models import Materia, PreparacionMateria
+from ..routers import lectura_de_reportes, leer_de_reportes
+from . import contador_service, resumen_service
+from .metricas_service import Metrica, calcular
+from .fecha_utils import inicio_del_dia, inicio_del_dia_siguiente
 
 
+# Metric declarations (see metricas_service)
+METRICAS_ADMIN = [
+    Metrica('total_materias', Materia, Count),
+    Metrica('total_cantidad', Materia, Sum, 'cantidad'),
+]
+
+METRICAS_REPORTE_PREPARACIONES = [
+    Metrica('total_preparaciones', PreparacionMateria, Count),
+    Metrica('preparaciones_completadas', PreparacionMateria, Count, filtro=Q(estado='completada')),
+    Metrica('preparaciones_en_proceso', PreparacionMateria, Count, filtro=Q(estado='en_proceso')),
+    Metrica('preparaciones_pendientes', PreparacionMateria, Count, filtro=Q(estado='pendiente')),
+    Metrica('total_cantidad_procesada', PreparacionMateria, Sum, 'cantidad_procesada',
+            filtro=Q(estado='completada')),
+]
+
+
+def metricas_del_dia(hoy: date) -> List[Metrica]:
+    """Plant-wide numbers shown on the operario and preparador dashboards."""
+    return [
+        Metrica('entradas_hoy', Materia, Count, filtro=Q(fecha_ingreso=hoy)),
+        Metrica('materias_disponibles', Materia, Count, filtro=Q(cantidad_disponible__gt=0)),
+    ]
+
+
+def metricas_preparador(hoy: date) -> List[Metrica]:
+    completadas_hoy = Q(
+        fecha_completado__gte=inicio_del_dia(hoy),
+        fecha_completado__lt=inicio_del_dia_siguiente(hoy)
+    )
+    return [
+        Metrica('total_preparaciones', PreparacionMateria, Count),
+        Metrica('en_proceso', PreparacionMateria, Count, filtro=Q(estado='en_proceso')),
+        Metrica('completadas_hoy', PreparacionMateria, Count, filtro=completadas_hoy),
+        Metrica('pendientes', PreparacionMateria, Count, filtro=Q(estado='pendiente')),
+    ]
+
+
+def _con_etiquetas(preparaciones: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Add the display labels of tipo_proceso and estado to preparation rows."""
+    tipos_proceso = dict(PreparacionMateria.TIPO_PROCESO_CHOICES)
+    estados = dict(PreparacionMateria.ESTADO_CHOICES)
+    for preparacion in preparaciones:
+        preparacion['tipo_proceso_display'] = tipos_proceso.get(preparacion['tipo_proceso'], preparacion['tipo_proceso'])
+        preparacion['estado_display'] = estados.get(preparacion['estado'], preparacion['estado'])
+    return preparaciones
+
+
+@transaction.atomic
 def get_admin_dashboard_stats() -> Dict[str, Any]:
     """
     Get comprehensive statistics for admin dashboard.
+    Reads from the default database in a single read transaction, not from
+    the reporting snapshot: the result is cached under the version the last
+    write bumped, so it must already include that write. The cache keeps the
+    recomputes to one per write, which is the load the snapshot would save.
+    Every value is plain data (lists of dicts), ready to be cached.
     
     Returns:
         Dictionary with all dashboard statistics
     """
-    # Materia Prima Statistics
-    total_materias = Materia.objects.count()
-    total_cantidad = Materia.objects.aggregate(total=Sum('cantidad'))['total'] or 0
+    # Materia Prima Statistics (one query)
+    metricas = calcular(METRICAS_ADMIN)
     
     # Materials by type
-    materias_por_tipo = Materia.objects.values('tipo').annotate(
+    materias_por_tipo = list(Materia.objects.values('tipo').annotate(
         total_cantidad=Sum('cantidad'),
         total_lotes=Count('id')
-    ).order_by('-total_cantidad')[:5]
-    
-    # Monthly entries (last 6 months)
-    materias_por_mes = list(
-        Materia.objects.filter(
-            fecha_ingreso__isnull=False
-        ).annotate(
-            month=TruncMonth('fecha_ingreso')
-        ).values('month').annotate(
-            total=Count('id'),
-            cantidad_total=Sum('cantidad')
-        ).order_by('-month')[:6]
-    )
+    ).order_by('-total_cantidad')[:5])
     
-    # Recent entries
-    entradas_recientes = Materia.objects.select_related(
-        'usuario_registro'
-    ).order_by('-id')[:10]
-    
-    # Preparation Statistics
-    total_preparaciones = PreparacionMateria.objects.count()
-    preparaciones_pendientes = PreparacionMateria.objects.filter(estado='pendiente').count()
-    preparaciones_en_proceso = PreparacionMateria.objects.filter(estado='en_proceso').count()
-    preparaciones_completadas = PreparacionMateria.objects.filter(estado='completada').count()
-    
-    # Processed materials by type
-    materiales_procesados = PreparacionMateria.objects.filter(
-        estado='completada'
-    ).values('materia_prima__tipo').annotate(
-        cantidad_procesada=Sum('cantidad_procesada'),
-        total_preparaciones=Count('id')
-    ).order_by('-cantidad_procesada')[:5]
+    # Monthly entries (last 6 months), from the daily rollups
+    materias_por_mes = resumen_service.get_entradas_por_mes(6)
     
-    # Recent preparations
-    preparaciones_recientes = PreparacionMateria.objects.select_related(
-        'materia_prima', 'usuario_preparador'
-    ).order_by('-fecha_inicio')[:8]
-    
-    # Most active preparadores
-    preparadores_activos = PreparacionMateria.objects.values(
-        'usuario_preparador__first_name',
-        'usuario_preparador__last_name'
-    ).annotate(
-        total_preparaciones=Count('id'),
-        completadas=Count('id', filter=Q(estado='completada')),
-        cantidad_total=Sum('cantidad_procesada', filter=Q(estado='completada'))
-    ).order_by('-total_preparaciones')[:5]
+    # Recent entries (plain rows, so the result can be cached)
+    entradas_recientes = list(Materia.objects.order_by('-id').values(
+        'id', 'tipo', 'cantidad', 'unidad_medida', 'lote', 'fecha_ingreso',
+        'usuario_registro__username'
+    )[:10])
+    
+    # Preparation Statistics (one query on the counters table)
+    contadores = contador_service.obtener_contadores(PreparacionMateria)
+    total_preparaciones = contadores['total']
+    preparaciones_pendientes = contadores['estado'].get('pendiente', 0)
+    preparaciones_en_proceso = contadores['estado'].get('en_proceso', 0)
+    preparaciones_completadas = contadores['estado'].get('completada', 0)
+    
+    # Processed materials by type, from the daily rollups
+    materiales_procesados = resumen_service.get_materiales_procesados(5)
+    
+    # Recent preparations (plain rows, so the result can be cached)
+    preparaciones_recientes = _con_etiquetas(list(PreparacionMateria.objects.order_by('-fecha_inicio').values(
+        'id', 'materia_prima__tipo', 'tipo_proceso', 'cantidad_procesada', 'estado', 'fecha_inicio',
+        'usuario_preparador__first_name', 'usuario_preparador__last_name'
+    )[:8]))
+    
+    # Most active preparadores, from the daily rollups
+    preparadores_activos = resumen_service.get_preparadores_activos(5)
     
     return {
         # Materia Prima stats
-        'total_materias': total_materias,
-        'total_cantidad': total_cantidad,
+        **metricas,
         'materias_por_tipo': materias_por_tipo,
         'materias_por_mes': materias_por_mes,
         'entradas_recientes': entradas_recientes,
@@ -91,9 +130,23 @@ def get_admin_dashboard_stats() -> Dict[str, Any]:
     }
 
 
+def get_resumen_del_dia(hoy: date = None) -> Dict[str, Any]:
+    """
+    Get the plant-wide numbers of the day shared by the shop-floor dashboards.
+    
+    Args:
+        hoy: Day to report on (defaults to today)
+        
+    Returns:
+        Dictionary with entradas_hoy and materias_disponibles
+    """
+    return calcular(metricas_del_dia(hoy or timezone.localdate()))
+
+
 def get_operario_dashboard_stats(usuario: User) -> Dict[str, Any]:
     """
     Get statistics for operario dashboard.
+    Only the user's own rows; plain data, ready to be cached per user.
     
     Args:
         usuario: Operario user
@@ -102,27 +155,25 @@ def get_operario_dashboard_stats(usuario: User) -> Dict[str, Any]:
         Dictionary with operario-specific statistics
     """
     # Get operario's recent entries
-    mis_entradas = Materia.objects.filter(
+    mis_entradas = list(Materia.objects.filter(
         usuario_registro=usuario
-    ).order_by('-id')[:5]
-    
-    # Get today's entries
-    entradas_hoy = Materia.objects.filter(
-        fecha_ingreso=date.today()
-    ).count()
+    ).order_by('-id').values(
+        'id', 'tipo', 'lote', 'cantidad', 'unidad_medida', 'fecha_ingreso'
+    )[:5])
     
     return {
         'mis_entradas': mis_entradas,
-        'entradas_hoy': entradas_hoy,
     }
 
 
-def get_preparador_dashboard_stats(usuario: User) -> Dict[str, Any]:
+def get_preparador_dashboard_stats(usuario: User, hoy: date = None) -> Dict[str, Any]:
     """
     Get statistics for preparador dashboard.
+    Only the user's own rows; plain data, ready to be cached per user and day.
     
     Args:
         usuario: Preparador user
+        hoy: Day for completadas_hoy (defaults to today)
         
     Returns:
         Dictionary with preparador-specific statistics
@@ -132,41 +183,32 @@ def get_preparador_dashboard_stats(usuario: User) -> Dict[str, Any]:
         usuario_preparador=usuario
     )
     
-    total_preparaciones = preparaciones_usuario.count()
-    en_proceso = preparaciones_usuario.filter(estado='en_proceso').count()
-    completadas_hoy = preparaciones_usuario.filter(
-        fecha_completado__date=date.today()
-    ).count()
-    pendientes = preparaciones_usuario.filter(estado='pendiente').count()
+    # One query
+    metricas = calcular(
+        metricas_preparador(hoy or timezone.localdate()),
+        bases={PreparacionMateria: preparaciones_usuario}
+    )
     
     # Recent preparations
-    preparaciones_recientes = preparaciones_usuario.select_related(
-        'materia_prima'
-    ).order_by('-fecha_inicio')[:5]
-    
-    # Available materials for processing
-    materias_disponibles = Materia.objects.filter(
-        preparacionmateria__isnull=True,
-        cantidad__gt=0
-    ).count()
+    preparaciones_recientes = _con_etiquetas(list(preparaciones_usuario.order_by('-fecha_inicio').values(
+        'id', 'materia_prima__tipo', 'materia_prima__lote', 'tipo_proceso', 'estado',
+        'fecha_inicio', 'cantidad_procesada'
+    )[:5]))
     
     return {
-        'total_preparaciones': total_preparaciones,
-        'en_proceso': en_proceso,
-        'completadas_hoy': completadas_hoy,
-        'pendientes': pendientes,
+        **metricas,
         'preparaciones_recientes': preparaciones_recientes,
-        'materias_disponibles': materias_disponibles,
     }
 
 
-def get_reporte_preparaciones_stats(
+def filtrar_reporte_preparaciones(
     fecha_inicio: str = None,
     fecha_fin: str = None,
     estado_filtro: str = None
-) -> Dict[str, Any]:
+) -> QuerySet[PreparacionMateria]:
     """
-    Get statistics for preparation reports.
+    Rows of the preparation report, newest first.
+    Shared by the report page and its exports, so both apply the same filters.
     
     Args:
         fecha_inicio: Optional start date filter
@@ -174,43 +216,82 @@ def get_reporte_preparaciones_stats(
         estado_filtro: Optional state filter
         
     Returns:
-        Dictionary with report statistics
+        Filtered QuerySet of PreparacionMateria
     """
-    # Base queryset
     preparaciones = PreparacionMateria.objects.select_related(
         'materia_prima', 'usuario_preparador'
-    ).order_by('-fecha_inicio')
+    ).order_by('-fecha_inicio', 'id')
     
-    # Apply filters
     if fecha_inicio:
-        preparaciones = preparaciones.filter(fecha_inicio__date__gte=fecha_inicio)
+        preparaciones = preparaciones.filter(fecha_inicio__gte=inicio_del_dia(fecha_inicio))
     
     if fecha_fin:
-        preparaciones = preparaciones.filter(fecha_inicio__date__lte=fecha_fin)
+        preparaciones = preparaciones.filter(fecha_inicio__lt=inicio_del_dia_siguiente(fecha_fin))
     
     if estado_filtro:
         preparaciones = preparaciones.filter(estado=estado_filtro)
     
-    # General statistics
-    total_preparaciones = preparaciones.count()
-    preparaciones_completadas = preparaciones.filter(estado='completada').count()
-    preparaciones_en_proceso = preparaciones.filter(estado='en_proceso').count()
-    preparaciones_pendientes = preparaciones.filter(estado='pendiente').count()
+    return preparaciones
+
+
+@lectura_de_reportes()
+def get_reporte_preparaciones_stats(
+    fecha_inicio: str = None,
+    fecha_fin: str = None,
+    estado_filtro: str = None
+) -> Dict[str, Any]:
+    """
+    Get statistics for preparation reports, without the rows.
+    Reads from the reporting database in a single read transaction. The rows
+    are streamed separately by iterar_reporte_preparaciones(), so the cached
+    report stays small however many rows match.
+    
+    Args:
+        fecha_inicio: Optional start date filter
+        fecha_fin: Optional end date filter
+        estado_filtro: Optional state filter
+        
+    Returns:
+        Dictionary with report statistics
+    """
+    preparaciones = filtrar_reporte_preparaciones(fecha_inicio, fecha_fin, estado_filtro)
     
-    # Total processed quantity
-    total_cantidad_procesada = preparaciones.filter(
-        estado='completada'
-    ).aggregate(total=Sum('cantidad_procesada'))['total'] or 0
+    # General statistics and total processed quantity
+    if fecha_inicio or fecha_fin:
+        # One conditional-aggregation query over the date range
+        metricas = calcular(
+            METRICAS_REPORTE_PREPARACIONES,
+            bases={PreparacionMateria: preparaciones}
+        )
+    else:
+        # Without a date range the counters table and the rollups answer it
+        por_estado = contador_service.obtener_contadores(PreparacionMateria)['estado']
+        if estado_filtro:
+            por_estado = {estado_filtro: por_estado.get(estado_filtro, 0)}
+        metricas = {
+            'total_preparaciones': sum(por_estado.values()),
+            'preparaciones_completadas': por_estado.get('completada', 0),
+            'preparaciones_en_proceso': por_estado.get('en_proceso', 0),
+            'preparaciones_pendientes': por_estado.get('pendiente', 0),
+            'total_cantidad_procesada': (
+                resumen_service.get_total_procesado()
+                if estado_filtro in (None, '', 'completada') else 0
+            ),
+        }
     
     # Summary by material type
-    resumen_por_material = list(
-        preparaciones.values(
-            'materia_prima__tipo'
-        ).annotate(
-            total_preparaciones=Count('id'),
-            cantidad_total=Sum('cantidad_procesada')
-        ).order_by('-cantidad_total')
-    )
+    if estado_filtro:
+        resumen_por_material = list(
+            preparaciones.values(
+                'materia_prima__tipo'
+            ).annotate(
+                total_preparaciones=Count('id'),
+                cantidad_total=Sum('cantidad_procesada')
+            ).order_by('-cantidad_total')
+        )
+    else:
+        # All states: the daily rollups (by creation day) answer it
+        resumen_por_material = resumen_service.get_resumen_por_material(fecha_inicio, fecha_fin)
     
     # Calculate percentages for charts
     max_cantidad = resumen_por_material[0]['cantidad_total'] if resumen_por_material else 1
@@ -220,11 +301,33 @@ def get_reporte_preparaciones_stats(
         )
     
     return {
-        'preparaciones': preparaciones,
-        'total_preparaciones': total_preparaciones,
-        'preparaciones_completadas': preparaciones_completadas,
-        'preparaciones_en_proceso': preparaciones_en_proceso,
-        'preparaciones_pendientes': preparaciones_pendientes,
-        'total_cantidad_procesada': total_cantidad_procesada,
+        **metricas,
         'resumen_por_material': resumen_por_material,
+        'generado': timezone.now(),
     }
+
+
+def iterar_reporte_preparaciones(
+    fecha_inicio: str = None,
+    fecha_fin: str = None,
+    estado_filtro: str = None,
+    tamano_bloque: int = None
+) -> Iterator[List[PreparacionMateria]]:
+    """
+    Walk the rows of the preparation report in blocks.
+    Reads them from the reporting database with .iterator(), pinned to its
+    alias, so only one block is in memory. The query runs before returning.
+    
+    Args:
+        fecha_inicio: Optional start date filter
+        fecha_fin: Optional end date filter
+        estado_filtro: Optional state filter
+        tamano_bloque: Rows per block, settings.REPORTE_BLOQUE_FILAS by default
+        
+    Returns:
+        Generator of lists of up to tamano_bloque preparations, newest first
+    """
+    return leer_de_reportes(
+        filtrar_reporte_preparaciones(fecha_inicio, fecha_fin, estado_filtro),
+        tamano_bloque or settings.REPORTE_BLOQUE_FILAS
+    )
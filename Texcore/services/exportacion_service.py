@@ -0,0 +1,376 @@
+"""
+Exportacion service - list and report rows as plain tuples for file exports.
+
+Each export declares its columns once, as (header, values_list lookup). The
+rows are read with values_list().iterator() from the reporting database: no
+model instances are built and only one chunk of tuples is in memory, however
+many years the export covers. Choice codes are replaced by
+their labels, so the files read like the pages.
+
+The summary sheets of the Excel reports are built from the same statistics
+dicts the report pages show.
+"""
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Type
+from django.conf import settings
+from django.db.models import Model, QuerySet
+from django.utils import timezone
+from ..models import Materia, DetallePreparacion, DetalleHilatura
+from ..routers import leer_de_reportes
+from .dashboard_service import filtrar_reporte_preparaciones
+from .hilatura_service import filtrar_hilaturas
+
+
+# (header, lookup)
+Columna = Tuple[str, str]
+
+# (headers, rows)
+Exportacion = Tuple[List[str], Iterator[tuple]]
+
+COLUMNAS_MATERIAS: List[Columna] = [
+    ('ID', 'id'),
+    ('Tipo', 'tipo'),
+    ('Cantidad', 'cantidad'),
+    ('Reservada', 'cantidad_reservada'),
+    ('Disponible', 'cantidad_disponible'),
+    ('Unidad', 'unidad_medida'),
+    ('Lote', 'lote'),
+    ('Fecha ingreso', 'fecha_ingreso'),
+    ('Registrado por', 'usuario_registro__username'),
+]
+
+COLUMNAS_PREPARACIONES: List[Columna] = [
+    ('ID', 'id'),
+    ('Materia prima', 'materia_prima__tipo'),
+    ('Lote', 'materia_prima__lote'),
+    ('Proceso', 'tipo_proceso'),
+    ('Cantidad (kg)', 'cantidad_procesada'),
+    ('Mezcla (%)', 'porcentaje_mezcla'),
+    ('Preparador', 'usuario_preparador__username'),
+    ('Estado', 'estado'),
+    ('Calidad', 'calidad_resultado'),
+    ('Fecha inicio', 'fecha_inicio'),
+    ('Fecha completado', 'fecha_completado'),
+    ('Observaciones', 'observaciones'),
+]
+
+COLUMNAS_DETALLES_PREPARACION: List[Columna] = [
+    ('ID', 'id'),
+    ('Preparación', 'preparacion_id'),
+    ('Temperatura (°C)', 'temperatura'),
+    ('Humedad (%)', 'humedad'),
+    ('Tiempo (min)', 'tiempo_proceso'),
+    ('Equipo', 'equipo_utilizado'),
+    ('Rendimiento (%)', 'rendimiento'),
+    ('Merma (%)', 'merma'),
+    ('Notas técnicas', 'notas_tecnicas'),
+    ('Fecha registro', 'fecha_registro'),
+]
+
+COLUMNAS_HILATURAS: List[Columna] = [
+    ('ID', 'id'),
+    ('Preparación origen', 'preparacion_origen_id'),
+    ('Etapa', 'etapa'),
+    ('Estado', 'estado'),
+    ('Fibra entrada (kg)', 'cantidad_fibra_entrada'),
+    ('Hilo salida (kg)', 'cantidad_hilo_salida'),
+    ('Título', 'titulo_hilo'),
+    ('Torsión (TPM)', 'torsion'),
+    ('Resistencia (cN/tex)', 'resistencia'),
+    ('Calidad', 'calidad_resultado'),
+    ('Operador', 'usuario_operador__username'),
+    ('Fecha inicio', 'fecha_inicio'),
+    ('Fecha completado', 'fecha_completado'),
+    ('Observaciones', 'observaciones'),
+]
+
+COLUMNAS_DETALLES_HILATURA: List[Columna] = [
+    ('ID', 'id'),
+    ('Hilatura', 'hilatura_id'),
+    ('Velocidad máquina (m/min)', 'velocidad_maquina'),
+    ('Temperatura (°C)', 'temperatura'),
+    ('Humedad (%)', 'humedad'),
+    ('Máquina', 'maquina_hiladora'),
+    ('Husos', 'numero_husos'),
+    ('Velocidad cardado (m/min)', 'velocidad_cardado'),
+    ('Limpieza de fibras', 'limpieza_fibras'),
+    ('Fibra eliminada (mm)', 'longitud_fibra_eliminada'),
+    ('Impurezas removidas (%)', 'porcentaje_impurezas_removidas'),
+    ('Grado de torsión', 'grado_torsion'),
+    ('Uniformidad (%)', 'uniformidad'),
+    ('Tiempo (min)', 'tiempo_proceso'),
+    ('Defectos', 'defectos_encontrados'),
+    ('Notas técnicas', 'notas_tecnicas'),
+    ('Fecha registro', 'fecha_registro'),
+]
+
+# (label, key in the statistics dict)
+INDICADORES_HILATURA: List[Tuple[str, str]] = [
+    ('Total procesos', 'total_procesos'),
+    ('Completados', 'procesos_completados'),
+    ('En proceso', 'procesos_en_proceso'),
+    ('Pendientes', 'procesos_pendientes'),
+    ('Cardado', 'cardados'),
+    ('Peinado', 'peinados'),
+    ('Hilado', 'hilados'),
+    ('Producción total de hilo (kg)', 'produccion_total'),
+    ('Rendimiento promedio (%)', 'rendimiento_promedio'),
+]
+
+INDICADORES_PREPARACIONES: List[Tuple[str, str]] = [
+    ('Total preparaciones', 'total_preparaciones'),
+    ('Completadas', 'preparaciones_completadas'),
+    ('En proceso', 'preparaciones_en_proceso'),
+    ('Pendientes', 'preparaciones_pendientes'),
+    ('Kg procesados', 'total_cantidad_procesada'),
+]
+
+# Labels of the report filters in the summary sheets
+ETIQUETAS_FILTROS = {
+    'estado': 'Filtro: estado',
+    'estado_filtro': 'Filtro: estado',
+    'etapa': 'Filtro: etapa',
+    'fecha_inicio': 'Filtro: desde',
+    'fecha_desde': 'Filtro: desde',
+    'fecha_fin': 'Filtro: hasta',
+    'fecha_hasta': 'Filtro: hasta',
+}
+
+ENCABEZADOS_RESUMEN = ['Indicador', 'Valor']
+
+ENCABEZADOS_RESUMEN_MATERIAL = ['Tipo de material', 'Preparaciones', 'Kg procesados']
+
+
+def _etiquetas(modelo: Type[Model], ruta: str) -> Optional[dict]:
+    """{code: label} of the field at the end of `ruta`, or None if it has no choices."""
+    for parte in ruta.split('__'):
+        campo = modelo._meta.get_field(parte)
+        modelo = campo.related_model
+    return dict(campo.flatchoices) if campo.choices else None
+
+
+def iterar_filas(
+    queryset: QuerySet,
+    columnas: Sequence[Columna],
+    tamano_bloque: Optional[int] = None
+) -> Iterator[tuple]:
+    """
+    Read the columns of every row of `queryset`, one chunk at a time.
+
+    The rows come from the reporting database, pinned to its alias
+    (routers.leer_de_reportes()); the query runs before returning.
+
+    Args:
+        queryset: Filtered and ordered queryset
+        columnas: Columns to read
+        tamano_bloque: Rows per database fetch, settings.REPORTE_BLOQUE_FILAS by default
+
+    Returns:
+        Generator of one tuple per row, in column order
+    """
+    tamano_bloque = tamano_bloque or settings.REPORTE_BLOQUE_FILAS
+    rutas = [ruta for _, ruta in columnas]
+    etiquetas = [_etiquetas(queryset.model, ruta) for ruta in rutas]
+    con_etiquetas = [(i, mapa) for i, mapa in enumerate(etiquetas) if mapa]
+    return _filas(leer_de_reportes(queryset.values_list(*rutas), tamano_bloque), con_etiquetas)
+
+
+def _filas(bloques: Iterator[List[tuple]], con_etiquetas: List[Tuple[int, Dict]]) -> Iterator[tuple]:
+    try:
+        for bloque in bloques:
+            for fila in bloque:
+                if con_etiquetas:
+                    fila = list(fila)
+                    for i, mapa in con_etiquetas:
+                        fila[i] = mapa.get(fila[i], fila[i])
+                    fila = tuple(fila)
+                yield fila
+    finally:
+        bloques.close()
+
+
+def _exportar(queryset: QuerySet, columnas: Sequence[Columna]) -> Exportacion:
+    return [encabezado for encabezado, _ in columnas], iterar_filas(queryset, columnas)
+
+
+def rechazo_xlsx(filas: int, nombre_filas: str) -> Optional[str]:
+    """
+    Message refusing an Excel export of `filas` rows, or None if it fits.
+
+    The workbook is written within the request, so past
+    settings.EXPORTACION_XLSX_MAX_FILAS it would outlast the worker timeout.
+
+    Args:
+        filas: Rows the export would write
+        nombre_filas: What the rows are, plural (e.g. 'procesos')
+
+    Returns:
+        Error message for the user, or None
+    """
+    limite = settings.EXPORTACION_XLSX_MAX_FILAS
+    if filas <= limite:
+        return None
+    return (
+        f'El reporte tiene {filas:_} {nombre_filas} y a Excel se exportan como máximo {limite:_}. '
+        'Acota los filtros o usa Exportar CSV, que no tiene límite.'
+    ).replace('_', '.')
+
+
+def exportar_materias() -> Exportacion:
+    """
+    Every materia, newest first, as in the list.
+
+    Returns:
+        (headers, rows)
+    """
+    return _exportar(Materia.objects.order_by('-id'), COLUMNAS_MATERIAS)
+
+
+def exportar_preparaciones(
+    fecha_inicio: str = None,
+    fecha_fin: str = None,
+    estado_filtro: str = None
+) -> Exportacion:
+    """
+    Preparations with the filters of the preparation report.
+
+    Args:
+        fecha_inicio: Optional start date filter
+        fecha_fin: Optional end date filter
+        estado_filtro: Optional state filter
+
+    Returns:
+        (headers, rows)
+    """
+    return _exportar(
+        filtrar_reporte_preparaciones(fecha_inicio, fecha_fin, estado_filtro),
+        COLUMNAS_PREPARACIONES
+    )
+
+
+def exportar_detalles_preparacion(
+    fecha_inicio: str = None,
+    fecha_fin: str = None,
+    estado_filtro: str = None
+) -> Exportacion:
+    """
+    Process details of the preparations the report filters select.
+
+    Args:
+        fecha_inicio: Optional start date filter
+        fecha_fin: Optional end date filter
+        estado_filtro: Optional state filter
+
+    Returns:
+        (headers, rows)
+    """
+    preparaciones = filtrar_reporte_preparaciones(fecha_inicio, fecha_fin, estado_filtro)
+    return _exportar(
+        DetallePreparacion.objects.filter(preparacion__in=preparaciones.values('pk')).order_by('preparacion_id', 'id'),
+        COLUMNAS_DETALLES_PREPARACION
+    )
+
+
+def exportar_hilaturas(
+    estado: Optional[str] = None,
+    etapa: Optional[str] = None,
+    fecha_desde: Optional[str] = None,
+    fecha_hasta: Optional[str] = None
+) -> Exportacion:
+    """
+    Spinning processes with the filters of filtrar_hilaturas().
+
+    Args:
+        estado: Estado del proceso
+        etapa: Etapa del proceso
+        fecha_desde: Fecha inicial
+        fecha_hasta: Fecha final
+
+    Returns:
+        (headers, rows)
+    """
+    return _exportar(
+        filtrar_hilaturas(estado=estado, etapa=etapa, fecha_desde=fecha_desde, fecha_hasta=fecha_hasta),
+        COLUMNAS_HILATURAS
+    )
+
+
+def exportar_detalles_hilatura(
+    estado: Optional[str] = None,
+    etapa: Optional[str] = None,
+    fecha_desde: Optional[str] = None,
+    fecha_hasta: Optional[str] = None
+) -> Exportacion:
+    """
+    Process details of the spinning processes filtrar_hilaturas() selects.
+
+    Args:
+        estado: Estado del proceso
+        etapa: Etapa del proceso
+        fecha_desde: Fecha inicial
+        fecha_hasta: Fecha final
+
+    Returns:
+        (headers, rows)
+    """
+    hilaturas = filtrar_hilaturas(estado=estado, etapa=etapa, fecha_desde=fecha_desde, fecha_hasta=fecha_hasta)
+    return _exportar(
+        DetalleHilatura.objects.filter(hilatura__in=hilaturas.values('pk')).order_by('hilatura_id', 'id'),
+        COLUMNAS_DETALLES_HILATURA
+    )
+
+
+def _resumen(
+    estadisticas: Dict[str, Any],
+    indicadores: Sequence[Tuple[str, str]],
+    filtros: Dict[str, Any],
+    generado
+) -> Exportacion:
+    filas = [(etiqueta, estadisticas.get(clave)) for etiqueta, clave in indicadores]
+    filas += [(ETIQUETAS_FILTROS.get(nombre, nombre), valor) for nombre, valor in filtros.items() if valor]
+    filas.append(('Generado', generado or timezone.now()))
+    return ENCABEZADOS_RESUMEN, iter(filas)
+
+
+def resumen_hilaturas(reporte: Dict[str, Any], filtros: Dict[str, Any]) -> Exportacion:
+    """
+    Summary sheet of the spinning report.
+
+    Args:
+        reporte: Dict from obtener_reporte_hilaturas(), with the
+            obtener_estadisticas_hilatura() statistics
+        filtros: Filters of the report, listed when set
+
+    Returns:
+        (headers, rows) as (indicator, value)
+    """
+    return _resumen(reporte['estadisticas'], INDICADORES_HILATURA, filtros, reporte.get('generado'))
+
+
+def resumen_preparaciones(reporte: Dict[str, Any], filtros: Dict[str, Any]) -> Exportacion:
+    """
+    Summary sheet of the preparation report.
+
+    Args:
+        reporte: Dict from get_reporte_preparaciones_stats()
+        filtros: Filters of the report, listed when set
+
+    Returns:
+        (headers, rows) as (indicator, value)
+    """
+    return _resumen(reporte, INDICADORES_PREPARACIONES, filtros, reporte.get('generado'))
+
+
+def resumen_por_material(reporte: Dict[str, Any]) -> Exportacion:
+    """
+    Per-material sheet of the preparation report.
+
+    Args:
+        reporte: Dict from get_reporte_preparaciones_stats()
+
+    Returns:
+        (headers, rows) as (material type, preparations, kg)
+    """
+    return ENCABEZADOS_RESUMEN_MATERIAL, iter([
+        (material['materia_prima__tipo'], material['total_preparaciones'], material['cantidad_total'])
+        for material in reporte['resumen_por_material']
+    ])
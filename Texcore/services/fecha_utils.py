@@ -0,0 +1,55 @@
+"""
+Date helpers - turn day filters into index-friendly datetime ranges.
+
+Filtering with ``fecha__date=...`` wraps the column in a function call, so the
+database cannot use an index on it. Comparing against the bounds of the day
+keeps the column bare and the index usable.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Union
+from django.conf import settings
+from django.utils import timezone
+
+
+def a_fecha(valor: Union[date, str]) -> date:
+    """
+    Return the calendar day of a date, datetime or ISO formatted string.
+
+    Args:
+        valor: Date, datetime or ISO formatted string (YYYY-MM-DD)
+
+    Returns:
+        date
+    """
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor))
+
+
+def inicio_del_dia(valor: Union[date, str]) -> datetime:
+    """
+    Return the first instant of the given day in the current timezone.
+
+    Args:
+        valor: Date or ISO formatted string (YYYY-MM-DD)
+
+    Returns:
+        Timezone-aware datetime at 00:00
+    """
+    inicio = datetime.combine(a_fecha(valor), time.min)
+    return timezone.make_aware(inicio) if settings.USE_TZ else inicio
+
+
+def inicio_del_dia_siguiente(valor: Union[date, str]) -> datetime:
+    """
+    Return the first instant of the day after the given one.
+
+    Args:
+        valor: Date or ISO formatted string (YYYY-MM-DD)
+
+    Returns:
+        Timezone-aware datetime at 00:00 of the next day
+    """
+    return inicio_del_dia(a_fecha(valor) + timedelta(days=1))
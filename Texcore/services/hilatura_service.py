@@ -1,26 +1,50 @@
 """
 Hilatura service - handles business logic for spinning operations.
 """
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Iterator, List
 from decimal import Decimal
+from django.conf import settings
 from django.db import transaction
-from django.db.models import QuerySet, Q, Sum, Avg
+from django.db.models import QuerySet, Q
 from django.contrib.auth.models import User
 from django.utils import timezone
 from ..models import ProcesoHilatura, DetalleHilatura, PreparacionMateria
+from ..routers import lectura_de_reportes, leer_de_reportes
+from . import contador_service, resumen_service
+from .fecha_utils import inicio_del_dia, inicio_del_dia_siguiente
 
 
 def get_all_hilaturas() -> QuerySet[ProcesoHilatura]:
     """
     Get all procesos de hilatura with optimized queries.
     
+    Ordered newest first, with the id as tie-breaker so the list views can
+    paginate by keyset.
+
     Returns:
         QuerySet of ProcesoHilatura objects
     """
     return ProcesoHilatura.objects.select_related(
         'preparacion_origen',
         'usuario_operador'
-    ).order_by('-fecha_inicio')
+    ).order_by('-fecha_inicio', 'id')
+
+
+def get_hilaturas_con_origen() -> QuerySet[ProcesoHilatura]:
+    """
+    Procesos de hilatura with their origin preparation and its materia joined.
+    Load the instances passed to the write services with this queryset: the
+    daily rollups read preparacion_origen.materia_prima.tipo.
+    
+    Returns:
+        QuerySet of ProcesoHilatura objects
+    """
+    return ProcesoHilatura.objects.select_related('preparacion_origen__materia_prima')
+
+
+def _cargar_hilatura(hilatura_id: int) -> Optional[ProcesoHilatura]:
+    """Load a proceso for a write service, without the detalles."""
+    return get_hilaturas_con_origen().filter(pk=hilatura_id).first()
 
 
 def get_hilatura_by_id(hilatura_id: int) -> Optional[ProcesoHilatura]:
@@ -104,6 +128,8 @@ def crear_proceso_hilatura(
             usuario_operador=usuario_operador,
             estado='pendiente'
         )
+        contador_service.registrar_alta(hilatura)
+        resumen_service.registrar_alta(hilatura)
         
         return hilatura, "Proceso de hilatura creado exitosamente"
         
@@ -123,7 +149,7 @@ def iniciar_proceso_hilatura(hilatura_id: int) -> tuple[bool, str]:
         Tuple of (success, message)
     """
     try:
-        hilatura = get_hilatura_by_id(hilatura_id)
+        hilatura = _cargar_hilatura(hilatura_id)
         if not hilatura:
             return False, "Proceso de hilatura no encontrado"
         
@@ -132,6 +158,7 @@ def iniciar_proceso_hilatura(hilatura_id: int) -> tuple[bool, str]:
         
         hilatura.estado = 'en_proceso'
         hilatura.save()
+        contador_service.registrar_cambio(hilatura, estado='pendiente')
         
         return True, "Proceso de hilatura iniciado"
         
@@ -161,13 +188,15 @@ def completar_proceso_hilatura(
         Tuple of (success, message)
     """
     try:
-        hilatura = get_hilatura_by_id(hilatura_id)
+        hilatura = _cargar_hilatura(hilatura_id)
         if not hilatura:
             return False, "Proceso de hilatura no encontrado"
         
         if hilatura.estado == 'completada':
             return False, "El proceso ya está completado"
         
+        estado_anterior = hilatura.estado
+        aportes_previos = resumen_service.aportes(hilatura)
         hilatura.cantidad_hilo_salida = cantidad_hilo_salida
         hilatura.calidad_resultado = calidad_resultado
         if torsion is not None:
@@ -177,6 +206,8 @@ def completar_proceso_hilatura(
         hilatura.estado = 'completada'
         hilatura.fecha_completado = timezone.now()
         hilatura.save()
+        contador_service.registrar_cambio(hilatura, estado=estado_anterior)
+        resumen_service.registrar_cambio(aportes_previos, hilatura)
         
         return True, "Proceso de hilatura completado exitosamente"
         
@@ -186,24 +217,20 @@ def completar_proceso_hilatura(
 
 @transaction.atomic
 def agregar_detalle_hilatura(
-    hilatura_id: int,
+    hilatura: ProcesoHilatura,
     detalle_data: Dict[str, Any]
 ) -> tuple[Optional[DetalleHilatura], str]:
     """
     Agregar detalle a un proceso de hilatura.
     
     Args:
-        hilatura_id: ID del proceso de hilatura
+        hilatura: Proceso de hilatura, already loaded by the caller
         detalle_data: Datos del detalle
         
     Returns:
         Tuple of (DetalleHilatura, error_message)
     """
     try:
-        hilatura = get_hilatura_by_id(hilatura_id)
-        if not hilatura:
-            return None, "Proceso de hilatura no encontrado"
-        
         detalle = DetalleHilatura.objects.create(
             hilatura=hilatura,
             **detalle_data
@@ -241,11 +268,12 @@ def filtrar_hilaturas(
     if etapa:
         queryset = queryset.filter(etapa=etapa)
     
+    # Whole days: fecha_hasta includes the processes started that day
     if fecha_desde:
-        queryset = queryset.filter(fecha_inicio__gte=fecha_desde)
+        queryset = queryset.filter(fecha_inicio__gte=inicio_del_dia(fecha_desde))
     
     if fecha_hasta:
-        queryset = queryset.filter(fecha_inicio__lte=fecha_hasta)
+        queryset = queryset.filter(fecha_inicio__lt=inicio_del_dia_siguiente(fecha_hasta))
     
     return queryset
 
@@ -257,30 +285,23 @@ def obtener_estadisticas_hilatura() -> Dict[str, Any]:
     Returns:
         Diccionario con estadísticas
     """
-    total_procesos = ProcesoHilatura.objects.count()
-    procesos_completados = ProcesoHilatura.objects.filter(estado='completada').count()
-    procesos_en_proceso = ProcesoHilatura.objects.filter(estado='en_proceso').count()
-    procesos_pendientes = ProcesoHilatura.objects.filter(estado='pendiente').count()
+    # Conteos por estado y etapa desde la tabla de contadores (una sola consulta)
+    contadores = contador_service.obtener_contadores(ProcesoHilatura)
+    por_estado = contadores['estado']
+    por_etapa = contadores['etapa']
     
-    # Estadísticas por etapa
-    cardados = ProcesoHilatura.objects.filter(etapa='cardado').count()
-    peinados = ProcesoHilatura.objects.filter(etapa='peinado').count()
-    hilados = ProcesoHilatura.objects.filter(etapa='hilado').count()
+    total_procesos = contadores['total']
+    procesos_completados = por_estado.get('completada', 0)
+    procesos_en_proceso = por_estado.get('en_proceso', 0)
+    procesos_pendientes = por_estado.get('pendiente', 0)
     
-    # Producción total
-    produccion_total = ProcesoHilatura.objects.filter(
-        estado='completada'
-    ).aggregate(
-        total=Sum('cantidad_hilo_salida')
-    )['total'] or 0
+    # Estadísticas por etapa
+    cardados = por_etapa.get('cardado', 0)
+    peinados = por_etapa.get('peinado', 0)
+    hilados = por_etapa.get('hilado', 0)
     
-    # Rendimiento promedio
-    rendimiento_avg = ProcesoHilatura.objects.filter(
-        estado='completada',
-        cantidad_fibra_entrada__gt=0
-    ).aggregate(
-        avg_rendimiento=Avg('cantidad_hilo_salida') / Avg('cantidad_fibra_entrada') * 100
-    )
+    # Producción total y rendimiento desde los resúmenes diarios
+    produccion = resumen_service.get_produccion_hilatura()
     
     return {
         'total_procesos': total_procesos,
@@ -290,11 +311,72 @@ def obtener_estadisticas_hilatura() -> Dict[str, Any]:
         'cardados': cardados,
         'peinados': peinados,
         'hilados': hilados,
-        'produccion_total': produccion_total,
-        'rendimiento_promedio': rendimiento_avg.get('avg_rendimiento', 0) if rendimiento_avg else 0,
+        'produccion_total': produccion['produccion_total'],
+        'rendimiento_promedio': produccion['rendimiento_promedio'],
+    }
+
+
+@lectura_de_reportes()
+def obtener_reporte_hilaturas(
+    estado: Optional[str] = None,
+    etapa: Optional[str] = None,
+    fecha_desde: Optional[str] = None,
+    fecha_hasta: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Obtener las estadísticas del reporte de hilatura, sin las filas.
+    Lee de la base de reportes en una sola transacción de lectura. Las filas
+    se envían aparte con iterar_reporte_hilaturas(), así el valor que guarda
+    la caché de reportes no crece con la tabla.
+    
+    Args:
+        estado: Estado del proceso
+        etapa: Etapa del proceso
+        fecha_desde: Fecha inicial
+        fecha_hasta: Fecha final
+        
+    Returns:
+        Diccionario con las estadísticas y la hora de cálculo
+    """
+    return {
+        'estadisticas': obtener_estadisticas_hilatura(),
+        'generado': timezone.now(),
     }
 
 
+def iterar_reporte_hilaturas(
+    estado: Optional[str] = None,
+    etapa: Optional[str] = None,
+    fecha_desde: Optional[str] = None,
+    fecha_hasta: Optional[str] = None,
+    tamano_bloque: Optional[int] = None
+) -> Iterator[List[ProcesoHilatura]]:
+    """
+    Recorrer las filas del reporte de hilatura en bloques.
+    Las lee de la base de reportes con .iterator(), fijadas a su alias, así
+    solo hay un bloque en memoria. La consulta se ejecuta antes de volver.
+    
+    Args:
+        estado: Estado del proceso
+        etapa: Etapa del proceso
+        fecha_desde: Fecha inicial
+        fecha_hasta: Fecha final
+        tamano_bloque: Filas por bloque, settings.REPORTE_BLOQUE_FILAS por defecto
+        
+    Returns:
+        Generador de listas de hasta tamano_bloque procesos, en el orden del listado
+    """
+    return leer_de_reportes(
+        filtrar_hilaturas(
+            estado=estado,
+            etapa=etapa,
+            fecha_desde=fecha_desde,
+            fecha_hasta=fecha_hasta
+        ),
+        tamano_bloque or settings.REPORTE_BLOQUE_FILAS
+    )
+
+
 def get_preparaciones_disponibles() -> QuerySet[PreparacionMateria]:
     """
     Get preparaciones that are completed and available for hilatura.
@@ -309,33 +391,33 @@ def get_preparaciones_disponibles() -> QuerySet[PreparacionMateria]:
 
 @transaction.atomic
 def actualizar_proceso_hilatura(
-    hilatura_id: int,
+    hilatura: ProcesoHilatura,
     datos_actualizados: Dict[str, Any]
 ) -> tuple[bool, str]:
     """
     Actualizar un proceso de hilatura.
     
     Args:
-        hilatura_id: ID del proceso
+        hilatura: Proceso, already loaded by the caller (see get_hilaturas_con_origen)
         datos_actualizados: Datos a actualizar
         
     Returns:
         Tuple of (success, message)
     """
     try:
-        hilatura = get_hilatura_by_id(hilatura_id)
-        if not hilatura:
-            return False, "Proceso de hilatura no encontrado"
-        
         # No permitir editar procesos completados
         if hilatura.estado == 'completada' and 'estado' not in datos_actualizados:
             return False, "No se pueden editar procesos completados"
         
+        anteriores = {'estado': hilatura.estado, 'etapa': hilatura.etapa}
+        aportes_previos = resumen_service.aportes(hilatura)
         for key, value in datos_actualizados.items():
             if hasattr(hilatura, key):
                 setattr(hilatura, key, value)
         
         hilatura.save()
+        contador_service.registrar_cambio(hilatura, **anteriores)
+        resumen_service.registrar_cambio(aportes_previos, hilatura)
         return True, "Proceso actualizado exitosamente"
         
     except Exception as e:
@@ -354,7 +436,7 @@ def eliminar_proceso_hilatura(hilatura_id: int) -> tuple[bool, str]:
         Tuple of (success, message)
     """
     try:
-        hilatura = get_hilatura_by_id(hilatura_id)
+        hilatura = _cargar_hilatura(hilatura_id)
         if not hilatura:
             return False, "Proceso de hilatura no encontrado"
         
@@ -362,6 +444,8 @@ def eliminar_proceso_hilatura(hilatura_id: int) -> tuple[bool, str]:
         if hilatura.estado not in ['pendiente', 'rechazada']:
             return False, "Solo se pueden eliminar procesos pendientes o rechazados"
         
+        contador_service.registrar_baja(hilatura)
+        resumen_service.registrar_baja(hilatura)
         hilatura.delete()
         return True, "Proceso eliminado exitosamente"
         
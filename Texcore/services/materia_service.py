@@ -1,10 +1,13 @@
 """
 Materia service - handles business logic for Materia Prima operations.
 """
+from decimal import Decimal
 from typing import Optional
+from django.db import transaction
 from django.db.models import QuerySet
 from django.contrib.auth.models import User
-from ..models import Materia
+from ..models import Materia, ProcesoHilatura
+from . import contador_service, resumen_service, stock_service
 
 
 def get_all_materias() -> QuerySet[Materia]:
@@ -34,6 +37,7 @@ def get_materia_by_id(materia_id: int) -> Optional[Materia]:
         return None
 
 
+@transaction.atomic
 def crear_materia(form_data: dict, usuario: User) -> Materia:
     """
     Create a new Materia with the given data.
@@ -48,51 +52,82 @@ def crear_materia(form_data: dict, usuario: User) -> Materia:
     materia = Materia(**form_data)
     materia.usuario_registro = usuario
     materia.save()
+    resumen_service.registrar_alta(materia)
     return materia
 
 
-def actualizar_materia(materia: Materia, form_data: dict) -> Materia:
+@transaction.atomic
+def actualizar_materia(materia: Materia, form_data: dict, usuario: Optional[User] = None) -> Materia:
     """
     Update an existing Materia with new data.
+    A change of cantidad is recorded as a stock adjustment in the ledger
+    instead of overwriting the balance in place.
     
     Args:
         materia: Materia object to update
         form_data: Dictionary with updated data
+        usuario: User making the change
         
     Returns:
         Updated Materia object
     """
-    for field, value in form_data.items():
+    datos = dict(form_data)
+    nuevo_saldo = datos.pop('cantidad', None)
+    
+    aportes_previos = resumen_service.aportes(materia)
+    tipo_anterior = materia.tipo
+    for field, value in datos.items():
         setattr(materia, field, value)
-    materia.save()
+    if datos:
+        # auto_now is only written when updated_at is among update_fields
+        materia.save(update_fields=list(datos) + ['updated_at'])
+        resumen_service.registrar_cambio(aportes_previos, materia)
+        if materia.tipo != tipo_anterior:
+            resumen_service.registrar_cambio_tipo_materia(materia, tipo_anterior)
+    
+    if nuevo_saldo is not None:
+        stock_service.ajustar_stock(materia, nuevo_saldo, usuario=usuario)
     return materia
 
 
+@transaction.atomic
 def eliminar_materia(materia: Materia) -> None:
     """
-    Delete a Materia.
+    Delete a Materia and the preparations that cascade with it.
     
     Args:
         materia: Materia object to delete
     """
+    preparaciones = materia.preparacionmateria_set.all()
+    contador_service.registrar_bajas(preparaciones)
+    for preparacion in preparaciones.select_related('materia_prima'):
+        resumen_service.registrar_baja(preparacion)
+    
+    # Spinning processes keep existing but lose their origin (SET_NULL)
+    hilaturas = list(ProcesoHilatura.objects.filter(
+        preparacion_origen__materia_prima=materia
+    ).select_related('preparacion_origen__materia_prima'))
+    aportes_previos = [resumen_service.aportes(hilatura) for hilatura in hilaturas]
+    
+    resumen_service.registrar_baja(materia)
     materia.delete()
+    
+    for hilatura, previos in zip(hilaturas, aportes_previos):
+        hilatura.preparacion_origen = None
+        resumen_service.registrar_cambio(previos, hilatura)
 
 
 def get_materias_disponibles_para_preparacion() -> QuerySet[Materia]:
     """
-    Get Materias available for preparation (with positive stock).
+    Get Materias available for preparation (with unreserved stock).
+    Served by the cantidad_disponible index.
     
     Returns:
         QuerySet of available Materias
     """
-    from django.db.models import Q
-    
     return Materia.objects.filter(
-        cantidad__gt=0
-    ).filter(
-        Q(preparacionmateria__isnull=True) |
-        Q(preparacionmateria__estado__in=['completada', 'rechazada'])
-    ).distinct().order_by('tipo', '-cantidad')
+        cantidad_disponible__gt=0
+    ).order_by('tipo', '-cantidad')
 
 
 def validar_stock_suficiente(materia: Materia, cantidad_requerida: float) -> tuple[bool, str]:
@@ -125,8 +160,8 @@ def calcular_stock_restante(materia: Materia, cantidad_procesada: float) -> dict
     Returns:
         Dictionary with stock info and warnings
     """
-    stock_restante = materia.cantidad - cantidad_procesada
-    stock_bajo = stock_restante < (materia.cantidad * 0.2)  # Less than 20%
+    stock_restante = materia.cantidad - Decimal(str(cantidad_procesada))
+    stock_bajo = stock_restante < (materia.cantidad * Decimal('0.2'))  # Less than 20%
     
     return {
         'stock_restante': stock_restante,
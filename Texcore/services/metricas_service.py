@@ -0,0 +1,85 @@
+"""
+Metricas service - declarative dashboard metrics.
+
+Each metric is declared once as (name, source model, aggregate, field, filter).
+`calcular` groups the metrics that share a source model and base queryset and
+evaluates each group as a single conditional-aggregation query:
+
+    SELECT COUNT(id) FILTER (WHERE estado = 'pendiente'),
+           SUM(cantidad_procesada) FILTER (WHERE estado = 'completada'), ...
+    FROM texcore_preparacionmateria WHERE ...
+
+so a dashboard costs one round trip per source model instead of one per number.
+When every metric of a group is filtered, the OR of the filters also goes to
+the WHERE clause so an index can narrow the rows before aggregating.
+"""
+import operator
+from dataclasses import dataclass
+from functools import reduce
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+from django.db.models import Aggregate, Model, Q, QuerySet
+
+
+@dataclass(frozen=True)
+class Metrica:
+    """A single dashboard number."""
+
+    nombre: str
+    modelo: Type[Model]
+    agregado: Type[Aggregate]
+    campo: str = 'pk'
+    filtro: Optional[Q] = None
+    por_defecto: Any = 0
+
+    def expresion(self) -> Aggregate:
+        return self.agregado(self.campo, filter=self.filtro)
+
+
+def agrupar(
+    metricas: Iterable[Metrica],
+    bases: Optional[Dict[Type[Model], QuerySet]] = None
+) -> List[Tuple[QuerySet, List[Metrica]]]:
+    """
+    Group metrics by source model, one group per query.
+
+    Args:
+        metricas: Metrics to compute
+        bases: Optional base queryset per model (e.g. already filtered by user
+            or date range); models without one use all rows
+
+    Returns:
+        List of (base queryset, metrics) pairs
+    """
+    bases = bases or {}
+    grupos: Dict[Type[Model], List[Metrica]] = {}
+    for metrica in metricas:
+        grupos.setdefault(metrica.modelo, []).append(metrica)
+    return [
+        (bases.get(modelo, modelo._default_manager.all()), grupo)
+        for modelo, grupo in grupos.items()
+    ]
+
+
+def calcular(
+    metricas: Iterable[Metrica],
+    bases: Optional[Dict[Type[Model], QuerySet]] = None
+) -> Dict[str, Any]:
+    """
+    Compute metrics with one conditional-aggregation query per source model.
+
+    Args:
+        metricas: Metrics to compute
+        bases: Optional base queryset per model
+
+    Returns:
+        Dictionary {metric name: value}
+    """
+    resultado: Dict[str, Any] = {}
+    for base, grupo in agrupar(metricas, bases):
+        if all(m.filtro is not None for m in grupo):
+            base = base.filter(reduce(operator.or_, (m.filtro for m in grupo)))
+        valores = base.order_by().aggregate(**{m.nombre: m.expresion() for m in grupo})
+        for metrica in grupo:
+            valor = valores[metrica.nombre]
+            resultado[metrica.nombre] = metrica.por_defecto if valor is None else valor
+    return resultado
@@ -0,0 +1,78 @@
+"""
+Opciones service - cached choices for the create/edit form dropdowns.
+
+The rows are plain data cached through cache_service, so every write to stock
+or preparations invalidates them. Forms render the <select> from the cache and
+validate the submitted id with a single primary-key lookup.
+"""
+from typing import Any, Dict, List, Optional
+from ..models import Materia, PreparacionMateria
+from . import cache_service
+
+
+def _calcular_materias_disponibles() -> List[Dict[str, Any]]:
+    materias = Materia.objects.filter(
+        cantidad_disponible__gt=0
+    ).only('id', 'tipo', 'lote', 'cantidad_disponible').order_by('tipo', '-cantidad')
+    return [
+        {
+            'id': materia.id,
+            'tipo': materia.tipo,
+            'lote': materia.lote,
+            'cantidad_disponible': materia.cantidad_disponible,
+            'etiqueta': str(materia),
+        }
+        for materia in materias
+    ]
+
+
+def get_materias_disponibles() -> List[Dict[str, Any]]:
+    """
+    Get Materias with unreserved stock, for the preparation form.
+    
+    Returns:
+        List of dicts with id, tipo, lote, cantidad_disponible and etiqueta
+    """
+    return cache_service.obtener_o_calcular('opciones_materias', _calcular_materias_disponibles)
+
+
+def _calcular_preparaciones_completadas() -> List[Dict[str, Any]]:
+    tipos_proceso = dict(PreparacionMateria.TIPO_PROCESO_CHOICES)
+    preparaciones = list(PreparacionMateria.objects.filter(
+        estado='completada'
+    ).order_by('-fecha_completado').values(
+        'id', 'materia_prima__tipo', 'tipo_proceso', 'cantidad_procesada'
+    ))
+    for preparacion in preparaciones:
+        preparacion['tipo_proceso_display'] = tipos_proceso.get(preparacion['tipo_proceso'], preparacion['tipo_proceso'])
+        preparacion['etiqueta'] = (
+            f"{preparacion['materia_prima__tipo']} - {preparacion['tipo_proceso_display']} "
+            f"({preparacion['cantidad_procesada']:.2f} kg)"
+        )
+    return preparaciones
+
+
+def get_preparaciones_completadas() -> List[Dict[str, Any]]:
+    """
+    Get completed preparations, the possible origins of a spinning process.
+    
+    Returns:
+        List of dicts with id, materia_prima__tipo, tipo_proceso_display,
+        cantidad_procesada and etiqueta
+    """
+    return cache_service.obtener_o_calcular('opciones_preparaciones', _calcular_preparaciones_completadas)
+
+
+def como_choices(filas: List[Dict[str, Any]], vacio: Optional[str] = None) -> List[tuple]:
+    """
+    Turn cached rows into form field choices.
+    
+    Args:
+        filas: Rows with id and etiqueta
+        vacio: Label of the empty choice, if any
+        
+    Returns:
+        List of (id, etiqueta) tuples
+    """
+    choices = [('', vacio)] if vacio is not None else []
+    return choices + [(fila['id'], fila['etiqueta']) for fila in filas]
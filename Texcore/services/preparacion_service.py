@@ -8,19 +8,27 @@ from django.db.models import QuerySet, Q
 from django.contrib.auth.models import User
 from django.utils import timezone
 from ..models import PreparacionMateria, Materia, DetallePreparacion
+from . import contador_service, resumen_service, stock_service
+from .fecha_utils import inicio_del_dia, inicio_del_dia_siguiente
+
+# States whose quantity is reserved in Materia.cantidad_reservada
+ESTADOS_CON_RESERVA = ('pendiente', 'en_proceso')
 
 
 def get_all_preparaciones() -> QuerySet[PreparacionMateria]:
     """
     Get all preparaciones with optimized queries.
     
+    Newest first; the id breaks ties on fecha_inicio, which keyset
+    pagination needs.
+
     Returns:
         QuerySet of PreparacionMateria objects
     """
     return PreparacionMateria.objects.select_related(
         'materia_prima',
         'usuario_preparador'
-    ).order_by('-fecha_inicio')
+    ).order_by('-fecha_inicio', 'id')
 
 
 def get_preparacion_by_id(preparacion_id: int) -> Optional[PreparacionMateria]:
@@ -53,9 +61,9 @@ def validar_stock_disponible(materia: Materia, cantidad_requerida: Decimal) -> t
     Returns:
         Tuple of (is_valid, error_message)
     """
-    if materia.cantidad < cantidad_requerida:
+    if materia.cantidad_disponible < cantidad_requerida:
         return False, (
-            f'Stock insuficiente. Disponible: {materia.cantidad}kg, '
+            f'Stock insuficiente. Disponible: {materia.cantidad_disponible}kg, '
             f'Requerido: {cantidad_requerida}kg para {materia.tipo}.'
         )
     return True, ""
@@ -72,7 +80,7 @@ def verificar_stock_bajo(materia: Materia, cantidad_requerida: Decimal) -> tuple
     Returns:
         Tuple of (is_low, warning_message)
     """
-    stock_restante = materia.cantidad - cantidad_requerida
+    stock_restante = materia.cantidad_disponible - cantidad_requerida
     if stock_restante < (materia.cantidad * Decimal('0.2')):  # Less than 20%
         return True, (
             f'¡Advertencia! Después de procesar quedarán solo {stock_restante}kg '
@@ -81,6 +89,22 @@ def verificar_stock_bajo(materia: Materia, cantidad_requerida: Decimal) -> tuple
     return False, ""
 
 
+def _bloquear(preparacion: PreparacionMateria) -> None:
+    """
+    Lock the preparation's row and reload its state and quantities.
+    
+    Must run inside the caller's transaction: a concurrent request that
+    changed the state after the caller loaded the row is seen here, and one
+    that comes later waits until this transaction ends.
+    """
+    actual = PreparacionMateria.objects.select_for_update().values(
+        'estado', 'materia_prima_id', 'cantidad_procesada', 'usuario_preparador_id', 'fecha_completado'
+    ).get(pk=preparacion.pk)
+    # Setting an _id keeps the related object the caller loaded unless it changed
+    for campo, valor in actual.items():
+        setattr(preparacion, campo, valor)
+
+
 @transaction.atomic
 def crear_preparacion(
     materia_prima: Materia,
@@ -92,7 +116,7 @@ def crear_preparacion(
     calidad_resultado: Optional[str] = None
 ) -> PreparacionMateria:
     """
-    Create a new preparation with stock validation.
+    Create a new preparation and reserve its stock.
     Uses atomic transaction to ensure data consistency.
     
     Args:
@@ -110,9 +134,9 @@ def crear_preparacion(
     Raises:
         ValueError: If stock is insufficient
     """
-    # Validate stock
-    is_valid, error_msg = validar_stock_disponible(materia_prima, cantidad_procesada)
-    if not is_valid:
+    # Check and reserve stock in a single conditional UPDATE
+    if not stock_service.reservar_stock(materia_prima, cantidad_procesada):
+        _, error_msg = validar_stock_disponible(materia_prima, cantidad_procesada)
         raise ValueError(error_msg)
     
     preparacion = PreparacionMateria.objects.create(
@@ -125,6 +149,8 @@ def crear_preparacion(
         calidad_resultado=calidad_resultado,
         estado='pendiente'
     )
+    contador_service.registrar_alta(preparacion)
+    resumen_service.registrar_alta(preparacion)
     
     return preparacion
 
@@ -141,8 +167,10 @@ def iniciar_preparacion_proceso(preparacion: PreparacionMateria, usuario: User)
     Returns:
         Tuple of (success, message)
     """
+    _bloquear(preparacion)
+    
     # Validate user permission
-    if preparacion.usuario_preparador != usuario:
+    if preparacion.usuario_preparador_id != usuario.pk:
         return False, 'Solo puedes iniciar tus propias preparaciones.'
     
     # Validate state
@@ -151,6 +179,7 @@ def iniciar_preparacion_proceso(preparacion: PreparacionMateria, usuario: User)
     
     preparacion.estado = 'en_proceso'
     preparacion.save()
+    contador_service.registrar_cambio(preparacion, estado='pendiente')
     
     return True, 'Preparación iniciada exitosamente.'
 
@@ -168,32 +197,36 @@ def completar_preparacion_proceso(preparacion: PreparacionMateria, usuario: User
     Returns:
         Tuple of (success, message)
     """
+    _bloquear(preparacion)
+    
     # Validate user permission
-    if preparacion.usuario_preparador != usuario:
+    if preparacion.usuario_preparador_id != usuario.pk:
         return False, 'Solo puedes completar tus propias preparaciones.'
     
     # Validate state
     if preparacion.estado != 'en_proceso':
         return False, 'Solo se pueden completar preparaciones en proceso.'
     
-    # Get materia and validate stock
+    # Consume the reserved stock in a single conditional UPDATE
     materia = preparacion.materia_prima
     cantidad_procesada = preparacion.cantidad_procesada
     
-    if materia.cantidad < cantidad_procesada:
+    movimiento = stock_service.consumir_reserva(
+        materia, cantidad_procesada, usuario=usuario, preparacion=preparacion
+    )
+    if movimiento is None:
         return False, (
             f'No hay suficiente stock. Disponible: {materia.cantidad}kg, '
             f'Requerido: {cantidad_procesada}kg'
         )
     
-    # Update stock
-    materia.cantidad -= cantidad_procesada
-    materia.save()
-    
     # Complete preparation
+    aportes_previos = resumen_service.aportes(preparacion)
     preparacion.estado = 'completada'
     preparacion.fecha_completado = timezone.now()
     preparacion.save()
+    contador_service.registrar_cambio(preparacion, estado='en_proceso')
+    resumen_service.registrar_cambio(aportes_previos, preparacion)
     
     success_msg = (
         f'Preparación completada exitosamente. Se procesaron {cantidad_procesada}kg de {materia.tipo}. '
@@ -203,6 +236,80 @@ def completar_preparacion_proceso(preparacion: PreparacionMateria, usuario: User
     return True, success_msg
 
 
+@transaction.atomic
+def actualizar_preparacion(preparacion: PreparacionMateria, usuario: Optional[User] = None) -> PreparacionMateria:
+    """
+    Save an edited preparation, moving its reservation.
+    The previous materia, quantity and state are read from the database, so
+    the old reservation is released even if the form changed all of them.
+    Open preparations (ESTADOS_CON_RESERVA) hold a reservation; one moved to
+    'completada' consumes its quantity. A completed preparation already
+    consumed its stock, so its materia, quantity and state cannot change.
+    
+    Args:
+        preparacion: PreparacionMateria with the edited values
+        usuario: User recorded on the stock movement if it gets completed
+        
+    Returns:
+        Saved PreparacionMateria object
+        
+    Raises:
+        ValueError: If the new quantity cannot be reserved or consumed, or a
+            completed preparation's stock fields were changed
+    """
+    anterior = PreparacionMateria.objects.select_for_update().get(pk=preparacion.pk)
+    if anterior.materia_prima_id == preparacion.materia_prima_id:
+        # Same materia: reuse the instance the caller loaded
+        anterior.materia_prima = preparacion.materia_prima
+    if anterior.estado == 'completada':
+        if (anterior.estado, anterior.materia_prima_id, anterior.cantidad_procesada) != (
+            preparacion.estado, preparacion.materia_prima_id, preparacion.cantidad_procesada
+        ):
+            raise ValueError(
+                'Una preparación completada ya consumió su stock: no se puede cambiar '
+                'su materia, cantidad ni estado.'
+            )
+    elif anterior.estado in ESTADOS_CON_RESERVA and anterior.materia_prima_id:
+        stock_service.liberar_reserva(anterior.materia_prima, anterior.cantidad_procesada)
+    
+    materia = preparacion.materia_prima
+    if preparacion.estado in ESTADOS_CON_RESERVA:
+        if not stock_service.reservar_stock(materia, preparacion.cantidad_procesada):
+            _, error_msg = validar_stock_disponible(materia, preparacion.cantidad_procesada)
+            raise ValueError(error_msg)
+    elif preparacion.estado == 'completada' and anterior.estado != 'completada':
+        # The reservation was released above, so this is the same conditional UPDATE
+        if stock_service.consumir_stock(
+            materia, preparacion.cantidad_procesada, usuario=usuario, preparacion=preparacion
+        ) is None:
+            _, error_msg = validar_stock_disponible(materia, preparacion.cantidad_procesada)
+            raise ValueError(error_msg)
+        preparacion.fecha_completado = preparacion.fecha_completado or timezone.now()
+    
+    preparacion.save()
+    contador_service.registrar_cambio(
+        preparacion, estado=anterior.estado, tipo_proceso=anterior.tipo_proceso
+    )
+    resumen_service.registrar_cambio(resumen_service.aportes(anterior), preparacion)
+    return preparacion
+
+
+@transaction.atomic
+def eliminar_preparacion(preparacion: PreparacionMateria) -> None:
+    """
+    Delete a preparation, releasing its reservation if it was still open.
+    
+    Args:
+        preparacion: PreparacionMateria to delete
+    """
+    _bloquear(preparacion)
+    if preparacion.estado in ESTADOS_CON_RESERVA and preparacion.materia_prima_id:
+        stock_service.liberar_reserva(preparacion.materia_prima, preparacion.cantidad_procesada)
+    contador_service.registrar_baja(preparacion)
+    resumen_service.registrar_baja(preparacion)
+    preparacion.delete()
+
+
 def agregar_detalle_preparacion(
     preparacion: PreparacionMateria,
     temperatura: Optional[Decimal] = None,
@@ -269,11 +376,12 @@ def filtrar_preparaciones(
     if tipo_proceso:
         preparaciones = preparaciones.filter(tipo_proceso=tipo_proceso)
     
+    # Day bounds instead of __date lookups so the fecha_inicio indexes apply
     if fecha_desde:
-        preparaciones = preparaciones.filter(fecha_inicio__date__gte=fecha_desde)
+        preparaciones = preparaciones.filter(fecha_inicio__gte=inicio_del_dia(fecha_desde))
     
     if fecha_hasta:
-        preparaciones = preparaciones.filter(fecha_inicio__date__lte=fecha_hasta)
+        preparaciones = preparaciones.filter(fecha_inicio__lt=inicio_del_dia_siguiente(fecha_hasta))
     
     return preparaciones
 
@@ -0,0 +1,385 @@
+"""
+Resumen service - daily production rollups.
+
+ResumenProduccionDiaria holds counts and kg per (day, proceso, materia tipo,
+tipo_proceso/etapa, user). Each record contributes a 'created' part on its
+creation day and, once completed, a 'completed' part on its completion day.
+State changes subtract the record's previous contribution and add the new
+one in the same transaction, so dashboards and reports read a few rollup rows
+instead of scanning the whole history. `manage.py reconstruir_resumenes`
+rebuilds the table from the source tables.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+from django.db import transaction
+from django.db.models import Count, F, Model, OuterRef, Q, QuerySet, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
+from django.utils import timezone
+from ..models import (
+    Materia, MovimientoStock, PreparacionMateria, ProcesoHilatura, ResumenProduccionDiaria
+)
+from . import cache_service
+from .fecha_utils import a_fecha
+
+
+# (fecha, proceso, materia_tipo, tipo, usuario_id)
+Clave = Tuple[date, str, str, str, Optional[int]]
+
+CALIDADES = ('excelente', 'buena', 'regular', 'deficiente')
+
+
+def _dia(valor) -> date:
+    """Local calendar day of a datetime (same rule as TruncDate)."""
+    return timezone.localdate(valor) if timezone.is_aware(valor) else valor.date()
+
+
+def _kg_ingreso(materia: Materia) -> Decimal:
+    """Initial stock of a Materia, from its opening ledger entry."""
+    if materia.pk is None:
+        return materia.cantidad or Decimal('0')
+    inicial = MovimientoStock.objects.filter(
+        materia_id=materia.pk, tipo='entrada'
+    ).order_by('id').values_list('cantidad', flat=True).first()
+    return inicial if inicial is not None else Decimal('0')
+
+
+def _materia_tipo_hilatura(hilatura: ProcesoHilatura) -> str:
+    preparacion = hilatura.preparacion_origen
+    if preparacion is None or preparacion.materia_prima is None:
+        return ''
+    return preparacion.materia_prima.tipo
+
+
+def aportes(instancia: Model) -> Dict[Clave, Dict[str, Any]]:
+    """
+    Compute what a record currently contributes to the rollups.
+
+    Args:
+        instancia: Materia, PreparacionMateria or ProcesoHilatura
+
+    Returns:
+        Dictionary {clave: {medida: valor}}
+    """
+    resultado: Dict[Clave, Dict[str, Any]] = {}
+
+    if isinstance(instancia, Materia):
+        if instancia.fecha_ingreso:
+            clave = (instancia.fecha_ingreso, 'ingreso', instancia.tipo, '', instancia.usuario_registro_id)
+            resultado[clave] = {'creados': 1, 'kg_creados': _kg_ingreso(instancia)}
+        return resultado
+
+    if isinstance(instancia, PreparacionMateria):
+        proceso, tipo, usuario_id = 'preparacion', instancia.tipo_proceso, instancia.usuario_preparador_id
+        materia_tipo = instancia.materia_prima.tipo if instancia.materia_prima_id else ''
+        kg_creados = kg_entrada = instancia.cantidad_procesada
+        kg_salida = Decimal('0')
+    else:
+        proceso, tipo, usuario_id = 'hilatura', instancia.etapa, instancia.usuario_operador_id
+        materia_tipo = _materia_tipo_hilatura(instancia)
+        kg_creados = kg_entrada = instancia.cantidad_fibra_entrada
+        kg_salida = instancia.cantidad_hilo_salida
+
+    if instancia.fecha_inicio:
+        clave = (_dia(instancia.fecha_inicio), proceso, materia_tipo, tipo, usuario_id)
+        resultado[clave] = {'creados': 1, 'kg_creados': kg_creados}
+
+    if instancia.estado == 'completada' and instancia.fecha_completado:
+        clave = (_dia(instancia.fecha_completado), proceso, materia_tipo, tipo, usuario_id)
+        completado = resultado.setdefault(clave, {})
+        completado.update(completados=1, kg_entrada=kg_entrada, kg_salida=kg_salida)
+        if instancia.calidad_resultado in CALIDADES:
+            completado[f'calidad_{instancia.calidad_resultado}'] = 1
+
+    return resultado
+
+
+def _incrementar(clave: Clave, deltas: Dict[str, Any]) -> None:
+    """Add deltas to the rollup row of a key, creating it the first time."""
+    fecha, proceso, materia_tipo, tipo, usuario_id = clave
+    filtro = {
+        'fecha': fecha, 'proceso': proceso, 'materia_tipo': materia_tipo or '',
+        'tipo': tipo or '', 'usuario_id': usuario_id,
+    }
+    # No unique constraint (usuario is nullable); a duplicate row created by a
+    # concurrent first write is harmless because readers always Sum().
+    pk = ResumenProduccionDiaria.objects.filter(**filtro).values_list('pk', flat=True).first()
+    if pk is None:
+        pk = ResumenProduccionDiaria.objects.create(**filtro).pk
+    ResumenProduccionDiaria.objects.filter(pk=pk).update(
+        **{medida: F(medida) + valor for medida, valor in deltas.items()}
+    )
+    # UPDATE sends no signals
+    cache_service.invalidar_modelos('Texcore.ResumenProduccionDiaria')
+
+
+@transaction.atomic
+def aplicar(anteriores: Dict[Clave, Dict[str, Any]], actuales: Dict[Clave, Dict[str, Any]]) -> None:
+    """
+    Replace a record's previous contribution with its current one.
+
+    Args:
+        anteriores: aportes() before the change ({} for a new record)
+        actuales: aportes() after the change ({} for a deleted record)
+    """
+    for clave in anteriores.keys() | actuales.keys():
+        antes = anteriores.get(clave, {})
+        despues = actuales.get(clave, {})
+        deltas = {
+            medida: despues.get(medida, 0) - antes.get(medida, 0)
+            for medida in antes.keys() | despues.keys()
+        }
+        deltas = {medida: valor for medida, valor in deltas.items() if valor}
+        if deltas:
+            _incrementar(clave, deltas)
+
+
+def registrar_alta(instancia: Model) -> None:
+    """Add a new record to the rollups."""
+    aplicar({}, aportes(instancia))
+
+
+def registrar_baja(instancia: Model) -> None:
+    """Remove a record that is about to be deleted from the rollups."""
+    aplicar(aportes(instancia), {})
+
+
+def registrar_cambio(anteriores: Dict[Clave, Dict[str, Any]], instancia: Model) -> None:
+    """Move a changed record; anteriores is aportes() taken before the change."""
+    aplicar(anteriores, aportes(instancia))
+
+
+def _nuevo_acumulado() -> Dict[Clave, Dict[str, Any]]:
+    return defaultdict(lambda: defaultdict(int))
+
+
+def _acumular(acumulado: Dict[Clave, Dict[str, Any]], filas, proceso: str) -> None:
+    for fila in filas:
+        clave = (fila.pop('fecha'), proceso, fila.pop('materia_tipo') or '',
+                 fila.pop('subtipo') or '', fila.pop('usuario'))
+        for medida, valor in fila.items():
+            acumulado[clave][medida] += valor or 0
+
+
+def _acumular_procesos(acumulado: Dict[Clave, Dict[str, Any]], filtros: Optional[Dict[str, Q]] = None) -> None:
+    """Add the grouped contributions of preparations and spinning processes, optionally filtered per proceso."""
+    fuentes = [
+        ('preparacion', PreparacionMateria, 'materia_prima__tipo', 'tipo_proceso',
+         'usuario_preparador', 'cantidad_procesada', None),
+        ('hilatura', ProcesoHilatura, 'preparacion_origen__materia_prima__tipo', 'etapa',
+         'usuario_operador', 'cantidad_fibra_entrada', 'cantidad_hilo_salida'),
+    ]
+    for proceso, modelo, materia_tipo, tipo, usuario, entrada, salida in fuentes:
+        registros = modelo.objects.order_by()
+        if filtros:
+            registros = registros.filter(filtros[proceso])
+        dimensiones = {'materia_tipo': F(materia_tipo), 'subtipo': F(tipo), 'usuario': F(usuario)}
+        _acumular(
+            acumulado,
+            registros.values(fecha=TruncDate('fecha_inicio'), **dimensiones).annotate(
+                creados=Count('id'), kg_creados=Sum(entrada)
+            ),
+            proceso
+        )
+        completadas = {
+            'completados': Count('id'),
+            'kg_entrada': Sum(entrada),
+            **{f'calidad_{c}': Count('id', filter=Q(calidad_resultado=c)) for c in CALIDADES},
+        }
+        if salida:
+            completadas['kg_salida'] = Sum(salida)
+        _acumular(
+            acumulado,
+            registros.filter(estado='completada', fecha_completado__isnull=False).values(
+                fecha=TruncDate('fecha_completado'), **dimensiones
+            ).annotate(**completadas),
+            proceso
+        )
+
+
+@transaction.atomic
+def registrar_cambio_tipo_materia(materia: Materia, tipo_anterior: str) -> None:
+    """
+    Move the rollups of a materia's preparations and spinning processes to its new tipo.
+
+    Their rows are keyed by the materia tipo, so editing it must move them
+    too; registrar_cambio() on the materia only moves its 'ingreso' part.
+    Reads their contributions with the grouped queries of reconstruir().
+
+    Args:
+        materia: Materia with the new tipo
+        tipo_anterior: Its tipo before the change
+    """
+    acumulado = _nuevo_acumulado()
+    _acumular_procesos(acumulado, {
+        'preparacion': Q(materia_prima=materia),
+        'hilatura': Q(preparacion_origen__materia_prima=materia),
+    })
+    # Every row is this materia's, so rekeying cannot merge two of them
+    aplicar(
+        {(fecha, proceso, tipo_anterior or '', tipo, usuario_id): medidas
+         for (fecha, proceso, _, tipo, usuario_id), medidas in acumulado.items()},
+        {(fecha, proceso, materia.tipo or '', tipo, usuario_id): medidas
+         for (fecha, proceso, _, tipo, usuario_id), medidas in acumulado.items()},
+    )
+
+
+@transaction.atomic
+def reconstruir() -> int:
+    """
+    Rebuild the rollups from the source tables with grouped queries.
+
+    Returns:
+        Number of rollup rows written
+    """
+    acumulado = _nuevo_acumulado()
+
+    kg_inicial = Subquery(
+        MovimientoStock.objects.filter(
+            materia=OuterRef('pk'), tipo='entrada'
+        ).order_by('id').values('cantidad')[:1]
+    )
+    _acumular(
+        acumulado,
+        Materia.objects.filter(fecha_ingreso__isnull=False).order_by().values(
+            fecha=F('fecha_ingreso'), materia_tipo=F('tipo'), subtipo=Value(''),
+            usuario=F('usuario_registro'),
+        ).annotate(creados=Count('id'), kg_creados=Sum(Coalesce(kg_inicial, Value(Decimal('0'))))),
+        'ingreso'
+    )
+    _acumular_procesos(acumulado)
+
+    ResumenProduccionDiaria.objects.all().delete()
+    ResumenProduccionDiaria.objects.bulk_create([
+        ResumenProduccionDiaria(
+            fecha=fecha, proceso=proceso, materia_tipo=materia_tipo, tipo=tipo,
+            usuario_id=usuario_id, **medidas
+        )
+        for (fecha, proceso, materia_tipo, tipo, usuario_id), medidas in acumulado.items()
+    ], batch_size=500)
+    cache_service.invalidar_modelos('Texcore.ResumenProduccionDiaria')
+    return len(acumulado)
+
+
+# --- Reads ---------------------------------------------------------------
+
+def _resumenes(proceso: str) -> QuerySet[ResumenProduccionDiaria]:
+    return ResumenProduccionDiaria.objects.filter(proceso=proceso)
+
+
+def get_entradas_por_mes(meses: int = 6) -> List[Dict[str, Any]]:
+    """
+    Materia entries per month (fecha_ingreso), newest first.
+
+    cantidad_total is the kg received (each materia's opening ledger entry),
+    not the current stock of those materias: consumption would otherwise
+    have to rewrite past months.
+
+    Args:
+        meses: Number of months to return
+
+    Returns:
+        List of {'month', 'total', 'cantidad_total'}
+    """
+    return list(
+        _resumenes('ingreso').values(month=TruncMonth('fecha')).annotate(
+            total=Sum('creados'),
+            cantidad_total=Sum('kg_creados')
+        ).order_by('-month')[:meses]
+    )
+
+
+def get_materiales_procesados(limite: int = 5) -> List[Dict[str, Any]]:
+    """
+    Completed preparations per materia tipo, by processed kg.
+
+    Args:
+        limite: Number of materia tipos to return
+
+    Returns:
+        List of {'materia_tipo', 'cantidad_procesada', 'total_preparaciones'}
+    """
+    return list(
+        _resumenes('preparacion').values('materia_tipo').annotate(
+            cantidad_procesada=Sum('kg_entrada'),
+            total_preparaciones=Sum('completados')
+        ).filter(total_preparaciones__gt=0).order_by('-cantidad_procesada')[:limite]
+    )
+
+
+def get_preparadores_activos(limite: int = 5) -> List[Dict[str, Any]]:
+    """
+    Preparadores with the most preparations.
+
+    Args:
+        limite: Number of preparadores to return
+
+    Returns:
+        List of {'usuario__first_name', 'usuario__last_name', 'total_preparaciones',
+        'completadas', 'cantidad_total'}
+    """
+    return list(
+        _resumenes('preparacion').values('usuario__first_name', 'usuario__last_name').annotate(
+            total_preparaciones=Sum('creados'),
+            completadas=Sum('completados'),
+            cantidad_total=Sum('kg_entrada')
+        ).order_by('-total_preparaciones')[:limite]
+    )
+
+
+def get_total_procesado() -> Decimal:
+    """
+    Total kg processed by completed preparations.
+
+    Returns:
+        Decimal kg
+    """
+    total = _resumenes('preparacion').aggregate(total=Sum('kg_entrada'))['total']
+    return total or Decimal('0')
+
+
+def get_resumen_por_material(
+    fecha_desde: Optional[str] = None,
+    fecha_hasta: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Preparations created per materia tipo in a date range.
+
+    Args:
+        fecha_desde: Optional first day (inclusive)
+        fecha_hasta: Optional last day (inclusive)
+
+    Returns:
+        List of {'materia_prima__tipo', 'total_preparaciones', 'cantidad_total'}
+    """
+    resumenes = _resumenes('preparacion')
+    if fecha_desde:
+        resumenes = resumenes.filter(fecha__gte=a_fecha(fecha_desde))
+    if fecha_hasta:
+        resumenes = resumenes.filter(fecha__lte=a_fecha(fecha_hasta))
+    return list(
+        resumenes.values(materia_prima__tipo=F('materia_tipo')).annotate(
+            total_preparaciones=Sum('creados'),
+            cantidad_total=Sum('kg_creados')
+        ).filter(total_preparaciones__gt=0).order_by('-cantidad_total')
+    )
+
+
+def get_produccion_hilatura() -> Dict[str, Any]:
+    """
+    Total yarn produced and average yield of completed spinning processes.
+
+    Returns:
+        Dictionary with 'produccion_total' (kg) and 'rendimiento_promedio' (%)
+    """
+    totales = _resumenes('hilatura').aggregate(
+        salida=Sum('kg_salida'),
+        entrada=Sum('kg_entrada')
+    )
+    salida = totales['salida'] or 0
+    entrada = totales['entrada'] or 0
+    return {
+        'produccion_total': salida,
+        'rendimiento_promedio': (salida / entrada * 100) if entrada else 0,
+    }
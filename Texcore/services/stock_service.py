@@ -0,0 +1,245 @@
+"""
+Stock service - append-only stock ledger with a materialized balance per Materia.
+
+Every change of Materia.cantidad is a single conditional UPDATE on the balance
+column plus one MovimientoStock row, in the same transaction. The balance is
+never read, modified in Python and written back, so concurrent workers cannot
+lose updates.
+
+Pending and in-process preparations reserve their quantity in
+Materia.cantidad_reservada; cantidad_disponible (cantidad - cantidad_reservada)
+is a stored generated column, so available stock is a single indexed read.
+
+UPDATE bypasses auto_now, so every balance UPDATE sets updated_at itself.
+It sends no post_save either: _registrar_movimiento() invalidates the cached
+dashboards that show the balance.
+"""
+from decimal import Decimal
+from typing import Optional
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import F, QuerySet
+from django.contrib.auth.models import User
+from ..models import Materia, MovimientoStock, PreparacionMateria
+from . import cache_service
+
+
+def _registrar_movimiento(
+    materia: Materia,
+    tipo: str,
+    cantidad: Decimal,
+    usuario: Optional[User],
+    preparacion: Optional[PreparacionMateria] = None,
+    observaciones: str = ""
+) -> MovimientoStock:
+    """Refresh the in-memory balance, append the ledger row and invalidate the owner's dashboard."""
+    materia.refresh_from_db(fields=['cantidad', 'cantidad_reservada', 'cantidad_disponible'])
+    # mis_entradas shows the balance; the ledger row's post_save covers the other dashboards
+    if materia.usuario_registro_id is not None:
+        cache_service.invalidar_usuario('operario_dashboard', materia.usuario_registro_id)
+    return MovimientoStock.objects.create(
+        materia=materia,
+        tipo=tipo,
+        cantidad=cantidad,
+        saldo_resultante=materia.cantidad,
+        preparacion=preparacion,
+        usuario=usuario,
+        observaciones=observaciones,
+    )
+
+
+@transaction.atomic
+def registrar_entrada(
+    materia: Materia,
+    cantidad: Decimal,
+    usuario: Optional[User] = None,
+    observaciones: str = ""
+) -> MovimientoStock:
+    """
+    Add stock to a Materia.
+
+    Args:
+        materia: Materia receiving the stock
+        cantidad: Positive amount to add
+        usuario: User registering the entry
+        observaciones: Optional notes
+
+    Returns:
+        Created MovimientoStock
+
+    Raises:
+        ValueError: If the amount is not positive
+    """
+    if cantidad <= 0:
+        raise ValueError('La cantidad de entrada debe ser mayor a 0.')
+
+    Materia.objects.filter(pk=materia.pk).update(cantidad=F('cantidad') + cantidad, updated_at=timezone.now())
+    return _registrar_movimiento(materia, 'entrada', cantidad, usuario, observaciones=observaciones)
+
+
+@transaction.atomic
+def consumir_stock(
+    materia: Materia,
+    cantidad: Decimal,
+    usuario: Optional[User] = None,
+    preparacion: Optional[PreparacionMateria] = None
+) -> Optional[MovimientoStock]:
+    """
+    Consume stock if there is enough of it.
+
+    The availability check and the decrement are one statement:
+    UPDATE ... SET cantidad = cantidad - x WHERE id = ? AND cantidad >= x
+
+    Args:
+        materia: Materia to consume from
+        cantidad: Positive amount to consume
+        usuario: User consuming the stock
+        preparacion: Preparation that consumes it
+
+    Returns:
+        Created MovimientoStock, or None if the stock was insufficient
+    """
+    actualizadas = Materia.objects.filter(
+        pk=materia.pk,
+        cantidad_disponible__gte=cantidad
+    ).update(cantidad=F('cantidad') - cantidad, updated_at=timezone.now())
+
+    if not actualizadas:
+        materia.refresh_from_db(fields=['cantidad', 'cantidad_reservada', 'cantidad_disponible'])
+        return None
+
+    return _registrar_movimiento(materia, 'consumo', -cantidad, usuario, preparacion=preparacion)
+
+
+def reservar_stock(materia: Materia, cantidad: Decimal) -> bool:
+    """
+    Reserve stock for a preparation that has not been completed yet.
+
+    UPDATE ... SET cantidad_reservada = cantidad_reservada + x
+    WHERE id = ? AND cantidad_disponible >= x
+
+    Args:
+        materia: Materia to reserve from
+        cantidad: Positive amount to reserve
+
+    Returns:
+        True if the stock was reserved, False if not enough was available
+    """
+    reservadas = Materia.objects.filter(
+        pk=materia.pk,
+        cantidad_disponible__gte=cantidad
+    ).update(
+        cantidad_reservada=F('cantidad_reservada') + cantidad, updated_at=timezone.now()
+    )
+    materia.refresh_from_db(fields=['cantidad', 'cantidad_reservada', 'cantidad_disponible'])
+    return bool(reservadas)
+
+
+def liberar_reserva(materia: Materia, cantidad: Decimal) -> None:
+    """
+    Release a reservation (preparation deleted or edited).
+
+    Args:
+        materia: Materia holding the reservation
+        cantidad: Reserved amount to release
+    """
+    Materia.objects.filter(pk=materia.pk).update(
+        cantidad_reservada=F('cantidad_reservada') - cantidad, updated_at=timezone.now()
+    )
+    materia.refresh_from_db(fields=['cantidad', 'cantidad_reservada', 'cantidad_disponible'])
+
+
+@transaction.atomic
+def consumir_reserva(
+    materia: Materia,
+    cantidad: Decimal,
+    usuario: Optional[User] = None,
+    preparacion: Optional[PreparacionMateria] = None
+) -> Optional[MovimientoStock]:
+    """
+    Consume stock that was reserved by a preparation.
+
+    Balance and reservation are decremented in the same UPDATE, so the
+    available stock seen by other preparations does not change.
+
+    Args:
+        materia: Materia to consume from
+        cantidad: Reserved amount to consume
+        usuario: User consuming the stock
+        preparacion: Preparation that holds the reservation
+
+    Returns:
+        Created MovimientoStock, or None if the reservation was not found
+    """
+    actualizadas = Materia.objects.filter(
+        pk=materia.pk,
+        cantidad_reservada__gte=cantidad,
+        cantidad__gte=cantidad
+    ).update(
+        cantidad=F('cantidad') - cantidad,
+        cantidad_reservada=F('cantidad_reservada') - cantidad,
+        updated_at=timezone.now()
+    )
+
+    if not actualizadas:
+        materia.refresh_from_db(fields=['cantidad', 'cantidad_reservada', 'cantidad_disponible'])
+        return None
+
+    return _registrar_movimiento(materia, 'consumo', -cantidad, usuario, preparacion=preparacion)
+
+
+@transaction.atomic
+def ajustar_stock(
+    materia: Materia,
+    nuevo_saldo: Decimal,
+    usuario: Optional[User] = None,
+    observaciones: str = "Ajuste manual"
+) -> Optional[MovimientoStock]:
+    """
+    Set the balance of a Materia to a counted value, recording the difference.
+
+    Args:
+        materia: Materia to adjust
+        nuevo_saldo: New balance (must not be negative)
+        usuario: User making the adjustment
+        observaciones: Reason for the adjustment
+
+    Returns:
+        Created MovimientoStock, or None if the balance did not change
+
+    Raises:
+        ValueError: If the new balance is negative or below the reserved stock
+    """
+    if nuevo_saldo < 0:
+        raise ValueError('El stock no puede ser negativo.')
+
+    actual, reservada = Materia.objects.select_for_update().values_list(
+        'cantidad', 'cantidad_reservada'
+    ).get(pk=materia.pk)
+    if nuevo_saldo < reservada:
+        raise ValueError(
+            f'El stock no puede ser menor a lo reservado por preparaciones abiertas ({reservada}kg).'
+        )
+    diferencia = Decimal(nuevo_saldo) - actual
+    if not diferencia:
+        materia.cantidad = actual
+        return None
+
+    Materia.objects.filter(pk=materia.pk).update(cantidad=F('cantidad') + diferencia, updated_at=timezone.now())
+    return _registrar_movimiento(materia, 'ajuste', diferencia, usuario, observaciones=observaciones)
+
+
+def get_movimientos_materia(materia: Materia) -> QuerySet[MovimientoStock]:
+    """
+    Get the stock history of a Materia, newest first.
+    Served by the (materia, fecha) index.
+
+    Args:
+        materia: Materia to get the history for
+
+    Returns:
+        QuerySet of MovimientoStock
+    """
+    return MovimientoStock.objects.filter(
+        materia=materia
+    ).select_related('usuario', 'preparacion').order_by('-fecha', '-id')
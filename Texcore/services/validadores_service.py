@@ -0,0 +1,96 @@
+"""
+Validators service - cheap freshness checks for conditional GET responses.
+
+Each function runs one small query over the updated_at columns and returns a
+tuple that changes whenever the rendered page would change, or None when the
+row does not exist (the view then answers as usual, e.g. with a 404).
+"""
+from typing import Optional, Tuple
+from django.db.models import Count, Max
+from ..models import PreparacionMateria, ProcesoHilatura
+
+
+def validador_lista_preparaciones() -> Tuple:
+    """
+    Validator for the preparation list.
+    The count catches deletes, which do not move the max.
+
+    Returns:
+        (max updated_at, count, max updated_at of the materias shown)
+    """
+    datos = PreparacionMateria.objects.aggregate(
+        ultima=Max('updated_at'),
+        total=Count('id'),
+        ultima_materia=Max('materia_prima__updated_at'),
+    )
+    return (datos['ultima'], datos['total'], datos['ultima_materia'])
+
+
+def validador_lista_hilaturas() -> Tuple:
+    """
+    Validator for the spinning process list (and its statistics).
+
+    Returns:
+        (max updated_at, count)
+    """
+    datos = ProcesoHilatura.objects.aggregate(
+        ultima=Max('updated_at'),
+        total=Count('id'),
+    )
+    return (datos['ultima'], datos['total'])
+
+
+def validador_detalle_preparacion(preparacion_id: int) -> Optional[Tuple]:
+    """
+    Validator for a preparation detail page.
+
+    Args:
+        preparacion_id: Preparation ID
+
+    Returns:
+        (updated_at, materia updated_at, max detalle updated_at, detalles) or None
+    """
+    fila = PreparacionMateria.objects.filter(pk=preparacion_id).values(
+        'updated_at', 'materia_prima__updated_at'
+    ).annotate(
+        ultimo_detalle=Max('detalles__updated_at'),
+        detalles_total=Count('detalles'),
+    ).order_by('pk').first()
+    if fila is None:
+        return None
+    return (fila['updated_at'], fila['materia_prima__updated_at'],
+            fila['ultimo_detalle'], fila['detalles_total'])
+
+
+def validador_detalle_hilatura(hilatura_id: int) -> Optional[Tuple]:
+    """
+    Validator for a spinning process detail page.
+
+    Args:
+        hilatura_id: Spinning process ID
+
+    Returns:
+        (updated_at, origin updated_at, origin materia updated_at,
+         max detalle updated_at, detalles) or None
+    """
+    fila = ProcesoHilatura.objects.filter(pk=hilatura_id).values(
+        'updated_at',
+        'preparacion_origen__updated_at',
+        'preparacion_origen__materia_prima__updated_at',
+    ).annotate(
+        ultimo_detalle=Max('detalles__updated_at'),
+        detalles_total=Count('detalles'),
+    ).order_by('pk').first()
+    if fila is None:
+        return None
+    return (fila['updated_at'], fila['preparacion_origen__updated_at'],
+            fila['preparacion_origen__materia_prima__updated_at'],
+            fila['ultimo_detalle'], fila['detalles_total'])
+
+
+def ultima_modificacion(validador: Optional[Tuple]):
+    """Latest timestamp in a detail validator, for the Last-Modified header."""
+    if validador is None:
+        return None
+    fechas = [valor for valor in validador if hasattr(valor, 'tzinfo')]
+    return max(fechas) if fechas else None
@@ -0,0 +1,84 @@
+"""
+SQLite tuning - applies the PRAGMAs from settings.SQLITE_TUNING on every new connection.
+"""
+from typing import List
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+# Allowed values for the textual PRAGMAs (anything else comes from the environment
+# by mistake and must not reach the SQL string).
+PRAGMAS_TEXTO = {
+    'journal_mode': {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'},
+    'synchronous': {'OFF', 'NORMAL', 'FULL', 'EXTRA'},
+    'temp_store': {'DEFAULT', 'FILE', 'MEMORY'},
+}
+
+PRAGMAS_ENTEROS = {'busy_timeout', 'mmap_size', 'cache_size'}
+
+# journal_mode goes first: it is the only one that may need a write lock.
+ORDEN_PRAGMAS = ['journal_mode', 'busy_timeout', 'synchronous', 'mmap_size', 'cache_size', 'temp_store']
+
+# PRAGMAs that change the database file; skipped on read-only connections.
+PRAGMAS_ESCRITURA = {'journal_mode', 'synchronous'}
+
+
+def construir_pragmas(config: dict, solo_lectura: bool = False) -> List[str]:
+    """
+    Build the PRAGMA statements for a tuning config.
+
+    Args:
+        config: Mapping of pragma name to value (see settings.SQLITE_TUNING)
+        solo_lectura: Skip the PRAGMAs that need write access
+
+    Returns:
+        List of PRAGMA statements in a safe execution order
+
+    Raises:
+        ImproperlyConfigured: If a pragma or value is not supported
+    """
+    desconocidos = set(config) - set(PRAGMAS_TEXTO) - PRAGMAS_ENTEROS
+    if desconocidos:
+        raise ImproperlyConfigured(
+            f'SQLITE_TUNING contiene PRAGMAs no soportados: {", ".join(sorted(desconocidos))}'
+        )
+
+    sentencias = []
+    for nombre in ORDEN_PRAGMAS:
+        if nombre not in config or config[nombre] is None:
+            continue
+        if solo_lectura and nombre in PRAGMAS_ESCRITURA:
+            continue
+        valor = config[nombre]
+        if nombre in PRAGMAS_TEXTO:
+            valor = str(valor).upper()
+            if valor not in PRAGMAS_TEXTO[nombre]:
+                raise ImproperlyConfigured(f'Valor inválido para PRAGMA {nombre}: {config[nombre]!r}')
+        else:
+            try:
+                valor = int(valor)
+            except (TypeError, ValueError):
+                raise ImproperlyConfigured(f'Valor inválido para PRAGMA {nombre}: {config[nombre]!r}')
+        sentencias.append(f'PRAGMA {nombre} = {valor}')
+    return sentencias
+
+
+def configurar_conexion_sqlite(sender, connection, **kwargs) -> None:
+    """
+    connection_created receiver - tune each new SQLite connection.
+
+    Does nothing for other database vendors or when SQLITE_TUNING is empty.
+    """
+    if connection.vendor != 'sqlite':
+        return
+
+    config = getattr(settings, 'SQLITE_TUNING', None)
+    if not config:
+        return
+
+    # e.g. the reporting snapshot, opened with file:...?mode=ro
+    solo_lectura = 'mode=ro' in str(connection.settings_dict['NAME'])
+
+    with connection.cursor() as cursor:
+        for sentencia in construir_pragmas(config, solo_lectura=solo_lectura):
+            cursor.execute(sentencia)
@@ -0,0 +1,247 @@
+"""
+Streaming responses - pages and files sent while their rows are being read.
+
+respuesta_tabla_en_streaming(): the page template is rendered once, with a
+marker where the table rows go, and split there. The head (filters, totals)
+goes out before the first row is read; then each block of rows is rendered by
+a template for the rows alone and sent; then the tail. A worker holds one
+block of rows and its HTML at a time, so memory and time to first byte do not
+grow with the report.
+
+    {# page template #}
+    <tbody>{{ filas_tabla }}</tbody>
+
+    {# rows template #}
+    {% for fila in filas %}<tr>...</tr>{% empty %}<tr>...</tr>{% endfor %}
+
+respuesta_csv(): rows go through csv.writer into a pseudo-buffer whose
+write() hands the line back, and are sent a block of lines at a time.
+
+respuesta_xlsx(): rows go into an openpyxl write-only workbook, which
+serialises each row to the sheet's temporary XML as it is appended instead of
+keeping a cell object per value. The zip container can only be closed once
+every sheet is complete, so the file is written to a temporary file and sent
+from there; memory still does not grow with the rows.
+"""
+import csv
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+
+MARCA_FILAS = '<!-- texcore:filas -->'
+
+# Spreadsheets run cells starting with these as formulas (CSV injection)
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+CONTENT_TYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# (title, headers, rows)
+Hoja = Tuple[str, Sequence[str], Iterable[Sequence[Any]]]
+
+
+def _cerrar(iterable) -> None:
+    """Close a generator left half-read, e.g. when the client disconnects."""
+    if hasattr(iterable, 'close'):
+        iterable.close()
+
+
+def respuesta_tabla_en_streaming(
+    request,
+    plantilla: str,
+    contexto: Dict[str, Any],
+    plantilla_filas: str,
+    nombre_filas: str,
+    bloques: Iterable[List[Any]],
+) -> StreamingHttpResponse:
+    """
+    Send `plantilla` with its table body rendered block by block.
+
+    The page itself is rendered before returning, so a template error is
+    still a 500 and not a truncated page.
+
+    Args:
+        request: Current request
+        plantilla: Page template; prints {{ filas_tabla }} where the rows go
+        contexto: Page context
+        plantilla_filas: Template for a list of rows, with an {% empty %} row
+        nombre_filas: Name of that list in the rows template
+        bloques: Lists of rows, read lazily (e.g. a generator over .iterator())
+
+    Returns:
+        StreamingHttpResponse with the page
+    """
+    try:
+        pagina = render_to_string(plantilla, {**contexto, 'filas_tabla': mark_safe(MARCA_FILAS)}, request)
+    except BaseException:
+        # The query of the rows is already running
+        _cerrar(bloques)
+        raise
+    cabeza, cola = pagina.split(MARCA_FILAS)
+    filas = get_template(plantilla_filas)
+
+    def contenido() -> Iterator[str]:
+        yield cabeza
+        vacia = True
+        try:
+            for bloque in bloques:
+                vacia = False
+                yield filas.render({nombre_filas: bloque})
+        finally:
+            # A client that disconnects closes the response; end the read there too
+            _cerrar(bloques)
+        if vacia:
+            yield filas.render({nombre_filas: []})
+        yield cola
+
+    return StreamingHttpResponse(contenido(), content_type='text/html; charset=utf-8')
+
+
+class _Eco:
+    """File-like object for csv.writer: write() returns the line instead of storing it."""
+
+    def write(self, linea: str) -> str:
+        return linea
+
+
+def _celda(valor: Any) -> Any:
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).strftime('%Y-%m-%d %H:%M:%S') if timezone.is_aware(valor) else valor
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def respuesta_csv(
+    nombre: str,
+    encabezados: Sequence[str],
+    filas: Iterable[Sequence[Any]],
+    tamano_bloque: Optional[int] = None
+) -> StreamingHttpResponse:
+    """
+    Send rows as a CSV attachment while they are being read.
+
+    Starts with a UTF-8 BOM so spreadsheets detect the encoding; datetimes
+    are written in local time and text that a spreadsheet would evaluate as
+    a formula is prefixed with a quote.
+
+    Args:
+        nombre: File name without extension; the local date is appended
+        encabezados: Header row
+        filas: Rows, read lazily (e.g. a generator over values_list().iterator())
+        tamano_bloque: Lines per chunk sent, settings.REPORTE_BLOQUE_FILAS by default
+
+    Returns:
+        StreamingHttpResponse with the file
+    """
+    tamano_bloque = tamano_bloque or settings.REPORTE_BLOQUE_FILAS
+    escritor = csv.writer(_Eco())
+
+    def contenido() -> Iterator[str]:
+        yield '\ufeff' + escritor.writerow(encabezados)
+        lineas = []
+        try:
+            for fila in filas:
+                lineas.append(escritor.writerow([_celda(valor) for valor in fila]))
+                if len(lineas) >= tamano_bloque:
+                    yield ''.join(lineas)
+                    lineas = []
+        finally:
+            _cerrar(filas)
+        if lineas:
+            yield ''.join(lineas)
+
+    respuesta = StreamingHttpResponse(contenido(), content_type='text/csv; charset=utf-8')
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}_{timezone.localdate():%Y-%m-%d}.csv"'
+    return respuesta
+
+
+def _celda_xlsx(hoja, valor: Any) -> Any:
+    if isinstance(valor, datetime) and timezone.is_aware(valor):
+        # Excel has no time zones
+        return timezone.make_naive(valor)
+    if isinstance(valor, str):
+        valor = ILLEGAL_CHARACTERS_RE.sub('', valor)
+        if valor.startswith('='):
+            # openpyxl would store it as a formula
+            celda = WriteOnlyCell(hoja, valor)
+            celda.data_type = 's'
+            return celda
+    return valor
+
+
+def escribir_xlsx(archivo, hojas: Sequence[Hoja]) -> None:
+    """
+    Write a workbook with one sheet per (title, headers, rows) to `archivo`.
+
+    Each row is serialised as it is read, so only the current row is in
+    memory. The headers are bold and stay in view when scrolling; aware
+    datetimes are written in local time.
+
+    Args:
+        archivo: Path or binary file object
+        hojas: Sheets in order; rows are read lazily
+    """
+    libro = Workbook(write_only=True)
+    for titulo, encabezados, filas in hojas:
+        hoja = libro.create_sheet(titulo)
+        # Column settings must come before the first row in write-only mode
+        for columna, encabezado in enumerate(encabezados, 1):
+            hoja.column_dimensions[get_column_letter(columna)].width = max(12, len(encabezado) + 2)
+        hoja.freeze_panes = 'A2'
+        negrita = Font(bold=True)
+        fila_encabezados = []
+        for encabezado in encabezados:
+            celda = WriteOnlyCell(hoja, encabezado)
+            celda.font = negrita
+            fila_encabezados.append(celda)
+        hoja.append(fila_encabezados)
+        try:
+            for fila in filas:
+                hoja.append([_celda_xlsx(hoja, valor) for valor in fila])
+        finally:
+            _cerrar(filas)
+    libro.save(archivo)
+
+
+def respuesta_xlsx(nombre: str, hojas: Sequence[Hoja]) -> FileResponse:
+    """
+    Send sheets as an XLSX attachment.
+
+    The workbook is built in a temporary file before returning, so an error
+    while reading the rows is still a 500 and not a corrupt file; the file
+    is then sent in chunks and deleted when the response is closed. The time
+    to write it grows with the rows, so views refuse exports larger than
+    settings.EXPORTACION_XLSX_MAX_FILAS (see exportacion_service.rechazo_xlsx).
+
+    Args:
+        nombre: File name without extension; the local date is appended
+        hojas: Sheets in order, as (title, headers, rows)
+
+    Returns:
+        FileResponse with the file
+    """
+    archivo = tempfile.TemporaryFile()
+    try:
+        escribir_xlsx(archivo, hojas)
+    except BaseException:
+        archivo.close()
+        raise
+    archivo.seek(0)
+    return FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=f'{nombre}_{timezone.localdate():%Y-%m-%d}.xlsx',
+        content_type=CONTENT_TYPE_XLSX,
+    )
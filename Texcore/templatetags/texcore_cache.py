@@ -0,0 +1,47 @@
+"""
+Template fragment caching keyed by model data versions.
+
+    {% load texcore_cache %}
+    {% fragmento 'admin_entradas_recientes' %} ... {% endfragmento %}
+    {% fragmento 'reporte_preparaciones_resumen' generado %} ... {% endfragmento %}
+
+The models of each fragment are declared in cache_service.FRAGMENTOS; extra
+arguments are values the HTML also depends on.
+"""
+from django import template
+from ..services import cache_service
+
+register = template.Library()
+
+
+class FragmentoNode(template.Node):
+    def __init__(self, nodelist, nombre, variaciones):
+        self.nodelist = nodelist
+        self.nombre = nombre
+        self.variaciones = variaciones
+
+    def render(self, context):
+        return cache_service.obtener_fragmento(
+            self.nombre,
+            lambda: self.nodelist.render(context),
+            [variacion.resolve(context) for variacion in self.variaciones],
+            context.get('versiones_cache'),
+        )
+
+
+@register.tag('fragmento')
+def do_fragmento(parser, token):
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' requiere el nombre del fragmento.")
+    nombre = bits[1]
+    if not (nombre[0] == nombre[-1] and nombre[0] in ('"', "'")):
+        raise template.TemplateSyntaxError(f"'{bits[0]}': el nombre del fragmento debe ir entre comillas.")
+    nombre = nombre[1:-1]
+    if nombre not in cache_service.FRAGMENTOS:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}': fragmento desconocido '{nombre}' (declararlo en cache_service.FRAGMENTOS)."
+        )
+    nodelist = parser.parse(('endfragmento',))
+    parser.delete_first_token()
+    return FragmentoNode(nodelist, nombre, [parser.compile_filter(bit) for bit in bits[2:]])
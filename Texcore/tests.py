@@ -18,3 +18,1402 @@ class MateriaViewsTest(TestCase):
         response = self.client.get(url)
         self.assertIn(response.status_code, (301, 302))
 
+
+class SqliteTuningTest(TestCase):
+    def test_construir_pragmas_ordena_y_normaliza(self):
+        from .sqlite_tuning import construir_pragmas
+        pragmas = construir_pragmas({'synchronous': 'normal', 'journal_mode': 'wal', 'cache_size': '-2000'})
+        self.assertEqual(pragmas, [
+            'PRAGMA journal_mode = WAL',
+            'PRAGMA synchronous = NORMAL',
+            'PRAGMA cache_size = -2000',
+        ])
+
+    def test_construir_pragmas_rechaza_valores_invalidos(self):
+        from django.core.exceptions import ImproperlyConfigured
+        from .sqlite_tuning import construir_pragmas
+        with self.assertRaises(ImproperlyConfigured):
+            construir_pragmas({'journal_mode': 'WAL; DROP TABLE x'})
+        with self.assertRaises(ImproperlyConfigured):
+            construir_pragmas({'locking_mode': 'EXCLUSIVE'})
+
+
+class ServiceQueryPlanTest(TestCase):
+    """Every query issued by the filtering/stats services must be able to use an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        from decimal import Decimal
+        from django.contrib.auth.models import User
+        from .models import PreparacionMateria, ProcesoHilatura
+        cls.preparador = User.objects.create_user('plan_preparador', password='x')
+        materia = Materia.objects.create(tipo='Algodón', cantidad=100, lote='P-1')
+        PreparacionMateria.objects.create(
+            materia_prima=materia, tipo_proceso='limpieza',
+            cantidad_procesada=Decimal('5'), usuario_preparador=cls.preparador,
+        )
+        ProcesoHilatura.objects.create(etapa='cardado', cantidad_fibra_entrada=Decimal('5'))
+
+    def _assert_sin_full_scan(self, funcion, *args, **kwargs):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as capturadas:
+            resultado = funcion(*args, **kwargs)
+            if hasattr(resultado, '_fetch_all'):
+                list(resultado)
+        self.assertTrue(capturadas.captured_queries)
+
+        for query in capturadas.captured_queries:
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plan = [fila[-1] for fila in cursor.fetchall()]
+            for paso in plan:
+                if paso.startswith('SCAN ') and 'INDEX' not in paso:
+                    self.fail(
+                        f'{funcion.__name__} hace un full table scan ({paso}):\n'
+                        f'{query["sql"]}\n' + '\n'.join(plan)
+                    )
+
+    def test_filtrar_preparaciones(self):
+        from .services import preparacion_service
+        self._assert_sin_full_scan(preparacion_service.filtrar_preparaciones, estado='pendiente')
+        self._assert_sin_full_scan(preparacion_service.filtrar_preparaciones, tipo_proceso='limpieza')
+        self._assert_sin_full_scan(
+            preparacion_service.filtrar_preparaciones,
+            fecha_desde='2025-01-01', fecha_hasta='2025-12-31',
+        )
+
+    def test_filtrar_hilaturas(self):
+        from .services import hilatura_service
+        self._assert_sin_full_scan(hilatura_service.filtrar_hilaturas, estado='en_proceso')
+        self._assert_sin_full_scan(hilatura_service.filtrar_hilaturas, etapa='hilado')
+        self._assert_sin_full_scan(
+            hilatura_service.filtrar_hilaturas,
+            fecha_desde='2025-01-01', fecha_hasta='2025-12-31',
+        )
+
+    def test_filtrar_hilaturas_incluye_el_dia_hasta(self):
+        from django.utils import timezone
+        from .services import hilatura_service
+        hoy = timezone.localdate().isoformat()
+        self.assertEqual(
+            hilatura_service.filtrar_hilaturas(fecha_desde=hoy, fecha_hasta=hoy).count(), 1
+        )
+
+    def test_get_preparador_dashboard_stats(self):
+        from .services import dashboard_service
+        self._assert_sin_full_scan(dashboard_service.get_preparador_dashboard_stats, self.preparador)
+
+    def test_obtener_estadisticas_hilatura(self):
+        from .services import hilatura_service
+        self._assert_sin_full_scan(hilatura_service.obtener_estadisticas_hilatura)
+
+
+class StatementTimeoutTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.admin = User.objects.create_user('admin_timeout', password='x')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.client.force_login(self.admin)
+
+    def test_solo_los_reportes_amplian_el_timeout_hasta_terminar_de_enviar(self):
+        from unittest import mock
+        from django.test import override_settings
+        conexion = mock.MagicMock(vendor='postgresql')
+        ejecutadas = conexion.cursor.return_value.__enter__.return_value.execute
+        with mock.patch('Texcore.middleware.connection', conexion), \
+                override_settings(DB_REPORT_STATEMENT_TIMEOUT_MS=30000):
+            # The default comes with the connection: no statement per request
+            self.client.get(reverse('listar_preparaciones'))
+            self.assertFalse(ejecutadas.called)
+
+            respuesta = self.client.get(reverse('reporte_preparaciones'))
+            self.assertEqual([c.args[0] for c in ejecutadas.call_args_list], ['SET statement_timeout = 30000'])
+            b''.join(respuesta.streaming_content)
+        self.assertEqual(ejecutadas.call_args_list[-1].args[0], 'RESET statement_timeout')
+
+
+class ReportingRouterTest(TestCase):
+    def test_sin_alias_de_reportes_lee_de_default(self):
+        from django.db import router
+        from .routers import lectura_de_reportes
+        self.assertEqual(router.db_for_read(Materia), 'default')
+        with lectura_de_reportes() as alias:
+            self.assertEqual(alias, 'default')
+            self.assertEqual(router.db_for_read(Materia), 'default')
+            self.assertEqual(router.db_for_write(Materia), 'default')
+
+    def test_alias_de_reportes_no_se_migra(self):
+        from .routers import ReportingRouter
+        self.assertFalse(ReportingRouter().allow_migrate('reporting', 'Texcore'))
+        self.assertIsNone(ReportingRouter().allow_migrate('default', 'Texcore'))
+
+
+class StockLedgerTest(TestCase):
+    def setUp(self):
+        from decimal import Decimal
+        self.materia = Materia.objects.create(tipo='Lana', cantidad=Decimal('10'), lote='S-1')
+
+    def test_creacion_registra_entrada_inicial(self):
+        from .services import stock_service
+        movimientos = list(stock_service.get_movimientos_materia(self.materia))
+        self.assertEqual([m.tipo for m in movimientos], ['entrada'])
+        self.assertEqual(movimientos[0].saldo_resultante, 10)
+
+    def test_consumir_stock_es_condicional(self):
+        from decimal import Decimal
+        from .services import stock_service
+        self.assertIsNotNone(stock_service.consumir_stock(self.materia, Decimal('7.5')))
+        self.assertEqual(self.materia.cantidad, Decimal('2.5'))
+        self.assertIsNone(stock_service.consumir_stock(self.materia, Decimal('3')))
+        self.materia.refresh_from_db()
+        self.assertEqual(self.materia.cantidad, Decimal('2.5'))
+        self.assertEqual(self.materia.movimientos.count(), 2)
+
+    def test_ajuste_registra_la_diferencia(self):
+        from decimal import Decimal
+        from .services import stock_service
+        movimiento = stock_service.ajustar_stock(self.materia, Decimal('4'))
+        self.assertEqual(movimiento.cantidad, Decimal('-6'))
+        self.assertEqual(movimiento.saldo_resultante, Decimal('4'))
+
+
+class ReservaStockTest(TestCase):
+    def setUp(self):
+        from decimal import Decimal
+        from django.contrib.auth.models import User
+        self.usuario = User.objects.create_user('prep_reserva', password='x')
+        self.materia = Materia.objects.create(tipo='Algodon', cantidad=Decimal('10'), lote='R-1')
+
+    def crear(self, cantidad):
+        from decimal import Decimal
+        from .services import preparacion_service
+        return preparacion_service.crear_preparacion(
+            materia_prima=self.materia,
+            tipo_proceso='limpieza',
+            cantidad_procesada=Decimal(cantidad),
+            usuario_preparador=self.usuario,
+        )
+
+    def test_crear_reserva_y_rechaza_sobre_reserva(self):
+        from decimal import Decimal
+        self.crear('6')
+        self.assertEqual(self.materia.cantidad_disponible, Decimal('4'))
+        with self.assertRaises(ValueError):
+            self.crear('5')
+        self.materia.refresh_from_db()
+        self.assertEqual(self.materia.cantidad_reservada, Decimal('6'))
+
+    def test_completar_consume_la_reserva(self):
+        from decimal import Decimal
+        from .services import preparacion_service
+        preparacion = self.crear('6')
+        preparacion_service.iniciar_preparacion_proceso(preparacion, self.usuario)
+        ok, _ = preparacion_service.completar_preparacion_proceso(preparacion, self.usuario)
+        self.assertTrue(ok)
+        self.materia.refresh_from_db()
+        self.assertEqual(
+            (self.materia.cantidad, self.materia.cantidad_reservada, self.materia.cantidad_disponible),
+            (Decimal('4'), Decimal('0'), Decimal('4'))
+        )
+
+    def test_completar_con_una_copia_vieja_no_consume_dos_veces(self):
+        from decimal import Decimal
+        from .models import PreparacionMateria
+        from .services import preparacion_service
+        preparacion = self.crear('6')
+        preparacion_service.iniciar_preparacion_proceso(preparacion, self.usuario)
+        # Loaded by a second request before the first one completes it
+        vieja = PreparacionMateria.objects.get(pk=preparacion.pk)
+        preparacion_service.completar_preparacion_proceso(preparacion, self.usuario)
+        ok, _ = preparacion_service.completar_preparacion_proceso(vieja, self.usuario)
+        self.assertFalse(ok)
+        self.materia.refresh_from_db()
+        self.assertEqual(self.materia.cantidad, Decimal('4'))
+
+    def test_eliminar_libera_la_reserva(self):
+        from decimal import Decimal
+        from .services import materia_service, preparacion_service
+        preparacion_service.eliminar_preparacion(self.crear('6'))
+        self.materia.refresh_from_db()
+        self.assertEqual(self.materia.cantidad_disponible, Decimal('10'))
+        self.assertIn(self.materia, materia_service.get_materias_disponibles_para_preparacion())
+
+    def test_ajuste_no_baja_de_lo_reservado(self):
+        from decimal import Decimal
+        from .services import stock_service
+        self.crear('6')
+        with self.assertRaises(ValueError):
+            stock_service.ajustar_stock(self.materia, Decimal('5'))
+
+    def _admin(self, modelo):
+        from django.contrib import admin
+        from django.test import RequestFactory
+        request = RequestFactory().post('/')
+        request.user = self.usuario
+        return admin.site._registry[modelo], request
+
+    def test_admin_completar_y_eliminar_mueven_la_reserva(self):
+        from decimal import Decimal
+        from .models import PreparacionMateria
+        modelo_admin, request = self._admin(PreparacionMateria)
+        completada, abierta = self.crear('4'), self.crear('3')
+
+        completada.estado = 'completada'
+        modelo_admin.save_model(request, completada, None, True)
+        modelo_admin.delete_model(request, abierta)
+        self.materia.refresh_from_db()
+        self.assertEqual(
+            (self.materia.cantidad, self.materia.cantidad_reservada),
+            (Decimal('6'), Decimal('0'))
+        )
+        self.assertIsNotNone(completada.fecha_completado)
+
+        completada.cantidad_procesada = Decimal('1')
+        with self.assertRaises(ValueError):
+            modelo_admin.save_model(request, completada, None, True)
+
+    def test_admin_materia_no_pisa_los_saldos(self):
+        from decimal import Decimal
+        modelo_admin, request = self._admin(Materia)
+        self.crear('6')
+        self.assertIn('cantidad_reservada', modelo_admin.get_readonly_fields(request, self.materia))
+
+        # Loaded before the reservation below, as the admin form would be
+        editada = Materia.objects.get(pk=self.materia.pk)
+        self.crear('1')
+        editada.lote = 'R-2'
+        form = modelo_admin.get_form(request, editada)(instance=editada)
+        form.changed_data = ['lote']
+        modelo_admin.save_model(request, editada, form, True)
+        self.materia.refresh_from_db()
+        self.assertEqual((self.materia.lote, self.materia.cantidad_reservada), ('R-2', Decimal('7')))
+
+
+class ContadorEstadoTest(TestCase):
+    def setUp(self):
+        from decimal import Decimal
+        from django.contrib.auth.models import User
+        self.usuario = User.objects.create_user('prep_contador', password='x')
+        self.materia = Materia.objects.create(tipo='Lino', cantidad=Decimal('50'), lote='C-1')
+
+    def crear(self):
+        from decimal import Decimal
+        from .services import preparacion_service
+        return preparacion_service.crear_preparacion(
+            materia_prima=self.materia,
+            tipo_proceso='limpieza',
+            cantidad_procesada=Decimal('1'),
+            usuario_preparador=self.usuario,
+        )
+
+    def test_transiciones_mueven_los_contadores(self):
+        from .models import PreparacionMateria
+        from .services import contador_service, preparacion_service
+        completada = self.crear()
+        preparacion_service.iniciar_preparacion_proceso(completada, self.usuario)
+        preparacion_service.completar_preparacion_proceso(completada, self.usuario)
+        preparacion_service.eliminar_preparacion(self.crear())
+        self.crear()
+
+        contadores = contador_service.obtener_contadores(PreparacionMateria)
+        self.assertEqual(contadores['total'], 2)
+        self.assertEqual(contadores['estado'].get('pendiente'), 1)
+        self.assertEqual(contadores['estado'].get('completada'), 1)
+        self.assertEqual(contadores['estado'].get('en_proceso'), 0)
+        self.assertEqual(contadores['tipo_proceso'].get('limpieza'), 2)
+
+    def test_recount_reconstruye_y_dashboard_lee_una_consulta(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import ContadorEstado, PreparacionMateria
+        from .services import contador_service
+        self.crear()
+        ContadorEstado.objects.update(total=99)
+        call_command('recount', stdout=StringIO())
+        contadores = contador_service.obtener_contadores(PreparacionMateria)
+        self.assertEqual(contadores['total'], 1)
+        self.assertEqual(contadores['estado'], {'pendiente': 1, 'en_proceso': 0, 'completada': 0, 'rechazada': 0})
+        with self.assertNumQueries(1):
+            contador_service.obtener_contadores(PreparacionMateria)
+
+    def test_eliminar_materia_descuenta_preparaciones(self):
+        from .models import PreparacionMateria
+        from .services import contador_service, materia_service
+        self.crear()
+        materia_service.eliminar_materia(self.materia)
+        self.assertEqual(contador_service.obtener_contadores(PreparacionMateria)['total'], 0)
+
+
+class ResumenProduccionTest(TestCase):
+    def setUp(self):
+        from datetime import date
+        from decimal import Decimal
+        from django.contrib.auth.models import User
+        from .services import materia_service
+        self.usuario = User.objects.create_user('prep_resumen', password='x', first_name='Ana')
+        self.materia = materia_service.crear_materia(
+            {'tipo': 'Seda', 'cantidad': Decimal('40'), 'lote': 'RS-1', 'fecha_ingreso': date(2025, 3, 10)},
+            self.usuario
+        )
+
+    def crear_y_completar(self, cantidad):
+        from decimal import Decimal
+        from .services import preparacion_service
+        preparacion = preparacion_service.crear_preparacion(
+            materia_prima=self.materia,
+            tipo_proceso='mezclado',
+            cantidad_procesada=Decimal(cantidad),
+            usuario_preparador=self.usuario,
+        )
+        preparacion_service.iniciar_preparacion_proceso(preparacion, self.usuario)
+        preparacion_service.completar_preparacion_proceso(preparacion, self.usuario)
+        return preparacion
+
+    def leer(self):
+        from .services import resumen_service
+        return (
+            resumen_service.get_entradas_por_mes(),
+            resumen_service.get_materiales_procesados(),
+            resumen_service.get_preparadores_activos(),
+            resumen_service.get_resumen_por_material(),
+        )
+
+    def test_transiciones_actualizan_resumenes(self):
+        from decimal import Decimal
+        from .services import preparacion_service
+        self.crear_y_completar('5')
+        self.crear_y_completar('3')
+        pendiente = preparacion_service.crear_preparacion(
+            materia_prima=self.materia, tipo_proceso='mezclado',
+            cantidad_procesada=Decimal('2'), usuario_preparador=self.usuario,
+        )
+        preparacion_service.eliminar_preparacion(pendiente)
+
+        entradas, procesados, preparadores, por_material = self.leer()
+        self.assertEqual(entradas[0]['total'], 1)
+        self.assertEqual(entradas[0]['cantidad_total'], Decimal('40'))
+        self.assertEqual(procesados[0]['materia_tipo'], 'Seda')
+        self.assertEqual(procesados[0]['cantidad_procesada'], Decimal('8'))
+        self.assertEqual(procesados[0]['total_preparaciones'], 2)
+        self.assertEqual(preparadores[0]['usuario__first_name'], 'Ana')
+        self.assertEqual(preparadores[0]['total_preparaciones'], 2)
+        self.assertEqual(por_material[0]['cantidad_total'], Decimal('8'))
+
+    def test_reconstruir_coincide_con_incremental(self):
+        from django.core.management import call_command
+        from io import StringIO
+        self.crear_y_completar('5')
+        incremental = self.leer()
+        call_command('reconstruir_resumenes', stdout=StringIO())
+        self.assertEqual(self.leer(), incremental)
+
+    def test_cambiar_tipo_mueve_preparaciones_e_hilaturas(self):
+        from django.core.management import call_command
+        from django.db.models import Sum
+        from io import StringIO
+        from .models import ProcesoHilatura
+        from .services import materia_service, resumen_service
+        preparacion = self.crear_y_completar('5')
+        hilatura = ProcesoHilatura.objects.create(
+            preparacion_origen=preparacion, etapa='cardado', cantidad_fibra_entrada=5
+        )
+        resumen_service.registrar_alta(hilatura)
+        materia_service.actualizar_materia(self.materia, {'tipo': 'Seda cruda'})
+
+        incremental = self.leer()
+        self.assertEqual([fila['materia_tipo'] for fila in incremental[1]], ['Seda cruda'])
+        hilaturas = resumen_service._resumenes('hilatura').values('materia_tipo').annotate(creados=Sum('creados'))
+        self.assertEqual({fila['materia_tipo']: fila['creados'] for fila in hilaturas}, {'Seda': 0, 'Seda cruda': 1})
+        call_command('reconstruir_resumenes', stdout=StringIO())
+        self.assertEqual(self.leer(), incremental)
+
+
+class MetricasServiceTest(TestCase):
+    def test_metricas_del_mismo_modelo_son_una_consulta(self):
+        from decimal import Decimal
+        from django.db.models import Count, Q, Sum
+        from .services.metricas_service import Metrica, calcular
+        Materia.objects.create(tipo='Lana', cantidad=Decimal('5'), lote='M-1')
+        Materia.objects.create(tipo='Seda', cantidad=Decimal('7'), lote='M-2')
+        metricas = [
+            Metrica('total', Materia, Count),
+            Metrica('lana', Materia, Count, filtro=Q(tipo='Lana')),
+            Metrica('kg_seda', Materia, Sum, 'cantidad', filtro=Q(tipo='Seda')),
+            Metrica('kg_algodon', Materia, Sum, 'cantidad', filtro=Q(tipo='Algodon')),
+        ]
+        with self.assertNumQueries(1):
+            valores = calcular(metricas)
+        self.assertEqual(valores, {'total': 2, 'lana': 1, 'kg_seda': Decimal('7'), 'kg_algodon': 0})
+
+
+class DashboardCacheTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        cache.clear()
+        self.admin = User.objects.create_user('admin_cache', password='x')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.client.force_login(self.admin)
+
+    def test_escritura_invalida_y_cuenta_aciertos(self):
+        from django.urls import reverse
+        from .services import cache_service
+        url = reverse('admin_dashboard')
+        self.client.get(url)
+        with self.assertNumQueries(2):  # session and user (with its profile) only
+            self.client.get(url)
+        self.assertEqual(cache_service.get_estadisticas()['admin_dashboard']['aciertos'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Materia.objects.create(tipo='Cachemira', cantidad=3, lote='K-1')
+        response = self.client.get(url)
+        self.assertContains(response, 'Cachemira')
+        self.assertEqual(cache_service.get_estadisticas()['admin_dashboard']['fallos'], 2)
+
+    def test_recalculo_no_lee_el_snapshot_de_reportes(self):
+        from unittest import mock
+        from django.test.utils import CaptureQueriesContext
+        from django.db import connection
+        from .services import dashboard_service
+        # A stale snapshot would be cached under the version of the last write
+        with mock.patch('Texcore.routers.alias_reportes_disponible', return_value='no_configurado'), \
+                CaptureQueriesContext(connection) as consultas:
+            dashboard_service.get_admin_dashboard_stats()
+        self.assertTrue(consultas.captured_queries)
+
+    def test_interruptor_desactiva_la_cache(self):
+        from django.test import override_settings
+        from django.urls import reverse
+        from .services import cache_service
+        with override_settings(DASHBOARD_CACHE=False):
+            self.client.get(reverse('admin_dashboard'))
+            self.client.get(reverse('admin_dashboard'))
+        self.assertEqual(cache_service.get_estadisticas()['admin_dashboard']['aciertos'], 0)
+
+
+class DashboardPorUsuarioCacheTest(TestCase):
+    def setUp(self):
+        from decimal import Decimal
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        cache.clear()
+        self.preparador = User.objects.create_user('prep_cache', password='x')
+        self.preparador.profile.role = 'preparador'
+        self.preparador.profile.save()
+        self.otro = User.objects.create_user('otro_cache', password='x')
+        self.materia = Materia.objects.create(tipo='Lana', cantidad=Decimal('50'), lote='PU-1')
+        self.client.force_login(self.preparador)
+
+    def _crear_preparacion(self, usuario):
+        from decimal import Decimal
+        from .services import preparacion_service
+        with self.captureOnCommitCallbacks(execute=True):
+            preparacion_service.crear_preparacion(
+                materia_prima=self.materia, tipo_proceso='limpieza',
+                cantidad_procesada=Decimal('5'), usuario_preparador=usuario,
+            )
+
+    def test_aciertos_sin_consultas_e_invalidacion_por_usuario(self):
+        from django.urls import reverse
+        from .services import cache_service
+        url = reverse('preparador_dashboard')
+        self.client.get(url)
+        with self.assertNumQueries(2):  # session and user (with its profile) only
+            self.client.get(url)
+
+        # Another user's preparation only touches the shared numbers
+        self._crear_preparacion(self.otro)
+        version = cache_service.version('preparador_dashboard', self.preparador.pk)
+        self.client.get(url)
+        self.assertEqual(cache_service.version('preparador_dashboard', self.preparador.pk), version)
+        self.assertEqual(cache_service.get_estadisticas()['preparador_dashboard']['aciertos'], 2)
+
+        self._crear_preparacion(self.preparador)
+        response = self.client.get(url)
+        self.assertEqual(response.context['total_preparaciones'], 1)
+        self.assertEqual(cache_service.get_estadisticas()['preparador_dashboard']['fallos'], 2)
+
+    def test_la_clave_cambia_con_el_dia(self):
+        from datetime import timedelta
+        from unittest import mock
+        from django.urls import reverse
+        from django.utils import timezone
+        from .services import cache_service
+        url = reverse('preparador_dashboard')
+        self.client.get(url)
+        manana = timezone.localdate() + timedelta(days=1)
+        with mock.patch('django.utils.timezone.localdate', return_value=manana):
+            self.client.get(url)
+        self.assertEqual(cache_service.get_estadisticas()['preparador_dashboard']['fallos'], 2)
+
+    def test_movimiento_de_stock_invalida_el_dashboard_del_operario(self):
+        from decimal import Decimal
+        from django.urls import reverse
+        from .services import stock_service
+        operario = self.otro
+        operario.profile.role = 'operario'
+        operario.profile.save()
+        Materia.objects.filter(pk=self.materia.pk).update(usuario_registro=operario)
+        self.materia.refresh_from_db()
+        self.client.force_login(operario)
+        url = reverse('operario_dashboard')
+        self.client.get(url)
+
+        # A balance UPDATE sends no post_save
+        with self.captureOnCommitCallbacks(execute=True):
+            stock_service.registrar_entrada(self.materia, Decimal('7'))
+        response = self.client.get(url)
+        self.assertEqual(response.context['mis_entradas'][0]['cantidad'], Decimal('57'))
+
+
+class ReporteCacheTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.calculos = 0
+
+    def _calcular(self):
+        self.calculos += 1
+        return {'valor': self.calculos}
+
+    def test_filtros_normalizados_comparten_entrada(self):
+        from .services import cache_service
+        cache_service.obtener_reporte('reporte_hilaturas', {'estado': 'pendiente', 'etapa': ''}, self._calcular)
+        datos = cache_service.obtener_reporte(
+            'reporte_hilaturas', {'etapa': None, 'estado': ' pendiente'}, self._calcular
+        )
+        self.assertEqual(datos, {'valor': 1})
+        cache_service.obtener_reporte('reporte_hilaturas', {'estado': 'completada'}, self._calcular)
+        self.assertEqual(self.calculos, 2)
+
+    def test_sirve_el_valor_obsoleto_mientras_otro_recalcula(self):
+        from django.core.cache import cache
+        from django.test import override_settings
+        from .services import cache_service
+        cache_service.obtener_reporte('reporte_hilaturas', {}, self._calcular)
+        clave = cache_service._clave_reporte('reporte_hilaturas', {})
+        with override_settings(REPORT_CACHE_MAX_AGE={'reporte_hilaturas': 0}):
+            cache.add(f'{clave}:bloqueo', 'otro worker')
+            self.assertEqual(cache_service.obtener_reporte('reporte_hilaturas', {}, self._calcular), {'valor': 1})
+            cache.delete(f'{clave}:bloqueo')
+            self.assertEqual(cache_service.obtener_reporte('reporte_hilaturas', {}, self._calcular), {'valor': 2})
+
+    def test_peticiones_sin_valor_esperan_al_calculo_en_curso(self):
+        import threading
+        import time
+        from django.core.cache import cache
+        from .services import cache_service
+        clave = cache_service._clave_reporte('reporte_hilaturas', {})
+        cache.add(f'{clave}:bloqueo', 'otro worker')
+
+        def otro_worker():
+            time.sleep(0.2)
+            cache.set(clave, {'datos': {'valor': 'del otro'}, 'calculado': time.time()})
+            cache.delete(f'{clave}:bloqueo')
+
+        hilo = threading.Thread(target=otro_worker)
+        hilo.start()
+        datos = cache_service.obtener_reporte('reporte_hilaturas', {}, self._calcular)
+        hilo.join()
+        self.assertEqual(datos, {'valor': 'del otro'})
+        self.assertEqual(self.calculos, 0)
+
+
+class RolesSinConsultasTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.admin = User.objects.create_user('admin_roles', password='x')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.operario = User.objects.create_user('operario_roles', password='x')
+
+    def test_el_perfil_llega_con_el_usuario(self):
+        from django.contrib.auth import get_user
+        self.client.force_login(self.operario)
+        request = self.client.get(reverse('inicio')).wsgi_request
+        with self.assertNumQueries(1):
+            usuario = get_user(request)
+        with self.assertNumQueries(0):
+            self.assertEqual(usuario.profile.role, 'operario')
+
+    def test_cambio_de_rol_aplica_en_la_siguiente_peticion(self):
+        url = reverse('listar_usuarios')
+        self.client.force_login(self.operario)
+        self.assertRedirects(self.client.get(url), reverse('inicio'), fetch_redirect_response=False)
+
+        admin = Client()
+        admin.force_login(self.admin)
+        admin.post(reverse('editar_usuario', args=[self.operario.pk]), {
+            'first_name': 'Op', 'last_name': 'Erario', 'email': 'op@example.com',
+            'role': 'admin', 'is_active': 'on',
+        })
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class OpcionesFormularioTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.materia = Materia.objects.create(tipo='Lana', cantidad=20, lote='OP-1')
+
+    def test_el_formulario_se_construye_desde_la_cache(self):
+        from .forms import PreparacionMateriaForm
+        PreparacionMateriaForm()
+        with self.assertNumQueries(0):
+            html = str(PreparacionMateriaForm()['materia_prima'])
+        self.assertIn('Lana (Lote: OP-1)', html)
+
+    def test_una_escritura_de_stock_invalida_las_opciones(self):
+        from .forms import PreparacionMateriaForm
+        PreparacionMateriaForm()
+        with self.captureOnCommitCallbacks(execute=True):
+            Materia.objects.create(tipo='Seda', cantidad=5, lote='OP-2')
+        self.assertIn('Seda (Lote: OP-2)', str(PreparacionMateriaForm()['materia_prima']))
+
+    def test_valida_el_id_enviado_con_una_consulta(self):
+        from .forms import PreparacionMateriaForm
+        agotada = Materia.objects.create(tipo='Yute', cantidad=0, lote='OP-3')
+        datos = {'tipo_proceso': 'limpieza', 'cantidad_procesada': '5'}
+        self.assertTrue(PreparacionMateriaForm({**datos, 'materia_prima': self.materia.pk}).is_valid())
+        form = PreparacionMateriaForm({**datos, 'materia_prima': agotada.pk})
+        self.assertFalse(form.is_valid())
+        self.assertIn('materia_prima', form.errors)
+
+
+class FragmentoCacheTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        cache.clear()
+        self.admin = User.objects.create_user('admin_fragmentos', password='x')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.materia = Materia.objects.create(tipo='Lana', cantidad=40, lote='FR-1')
+        self.client.force_login(self.admin)
+
+    def test_solo_se_renderizan_los_fragmentos_afectados(self):
+        from .models import PreparacionMateria
+        from .services import cache_service
+        url = reverse('admin_dashboard')
+        self.client.get(url)
+        self.client.get(url)
+        estadisticas = cache_service.get_estadisticas()
+        self.assertEqual(estadisticas['admin_entradas_recientes'], {'aciertos': 1, 'fallos': 1, 'version': None})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PreparacionMateria.objects.create(
+                materia_prima=self.materia, tipo_proceso='limpieza', cantidad_procesada=5,
+                usuario_preparador=self.admin,
+            )
+        response = self.client.get(url)
+        self.assertContains(response, 'Limpieza')
+        estadisticas = cache_service.get_estadisticas()
+        self.assertEqual(estadisticas['admin_preparaciones_recientes']['fallos'], 2)
+        self.assertEqual(estadisticas['admin_entradas_recientes']['aciertos'], 2)
+
+    def test_un_acierto_no_escribe_en_la_cache(self):
+        from unittest import mock
+        from django.core.cache import cache
+        from django.test import override_settings
+        from .services import cache_service
+        url = reverse('admin_dashboard')
+        self.client.get(url)
+        with override_settings(DASHBOARD_CACHE_STATS_INTERVAL=3600), \
+                mock.patch.object(cache, 'add', wraps=cache.add) as add, \
+                mock.patch.object(cache, 'incr', wraps=cache.incr) as incr, \
+                mock.patch.object(cache, 'set', wraps=cache.set) as set_:
+            self.client.get(url)
+        self.assertEqual((add.call_count, incr.call_count, set_.call_count), (0, 0, 0))
+        # Counted in this process, added when the counters are read
+        self.assertEqual(cache_service.get_estadisticas()['admin_dashboard']['aciertos'], 1)
+
+    def test_las_versiones_de_dashboards_suben_antes_que_las_de_modelos(self):
+        from unittest import mock
+        from .services import cache_service
+        with self.captureOnCommitCallbacks() as callbacks:
+            cache_service.invalidar_modelos('Texcore.Materia')
+        with mock.patch.object(cache_service, '_incrementar') as incrementar:
+            for callback in callbacks:
+                callback()
+        claves = [llamada.args[0] for llamada in incrementar.call_args_list]
+        self.assertLess(
+            claves.index('cache_version:admin_dashboard'),
+            claves.index('cache_version:modelo:Texcore.Materia')
+        )
+
+    def test_fragmento_desconocido(self):
+        from django.template import Template, TemplateSyntaxError
+        with self.assertRaises(TemplateSyntaxError):
+            Template("{% load texcore_cache %}{% fragmento 'no_existe' %}{% endfragmento %}")
+
+
+class RespuestaCondicionalTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from .models import PreparacionMateria
+        self.preparador = User.objects.create_user('preparador_etag', password='x')
+        self.preparador.profile.role = 'preparador'
+        self.preparador.profile.save()
+        self.materia = Materia.objects.create(tipo='Lana', cantidad=40, lote='ET-1')
+        self.preparacion = PreparacionMateria.objects.create(
+            materia_prima=self.materia, tipo_proceso='limpieza', cantidad_procesada=5,
+            usuario_preparador=self.preparador,
+        )
+        self.client.force_login(self.preparador)
+
+    def test_detalle_sin_cambios_responde_304_sin_renderizar(self):
+        url = reverse('detalle_preparacion', args=[self.preparacion.pk])
+        primera = self.client.get(url)
+        self.assertEqual(primera.status_code, 200)
+        self.assertTrue(primera.has_header('Last-Modified'))
+        segunda = self.client.get(url, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(segunda.status_code, 304)
+        self.assertEqual(segunda.templates, [])
+
+        self.preparacion.observaciones = 'Revisada'
+        self.preparacion.save()
+        tercera = self.client.get(url, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertContains(tercera, 'Revisada')
+
+    def test_editar_la_materia_cambia_el_etag(self):
+        from .services import materia_service
+        url = reverse('detalle_preparacion', args=[self.preparacion.pk])
+        etag = self.client.get(url)['ETag']
+        materia_service.actualizar_materia(self.materia, {'lote': 'ET-2'})
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'ET-2')
+
+    def test_la_lista_cambia_al_borrar(self):
+        from .models import PreparacionMateria
+        url = reverse('listar_preparaciones')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url + '?estado=pendiente', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        PreparacionMateria.objects.create(
+            materia_prima=self.materia, tipo_proceso='cardado', cantidad_procesada=1,
+            usuario_preparador=self.preparador,
+        ).delete()
+        PreparacionMateria.objects.filter(pk=self.preparacion.pk).delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_un_nuevo_login_cambia_el_etag(self):
+        # The cached page's forms would carry the previous session's CSRF token
+        url = reverse('detalle_preparacion', args=[self.preparacion.pk])
+        etag = self.client.get(url)['ETag']
+        self.client.logout()
+        self.client.force_login(self.preparador)
+        self.client.cookies.pop('csrftoken', None)
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 304)
+
+    def test_los_mensajes_pendientes_desactivan_el_304(self):
+        url = reverse('detalle_preparacion', args=[self.preparacion.pk])
+        etag = self.client.get(url)['ETag']
+        self.client.get(reverse('listar_usuarios'))  # redirects with an error message
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class PrecompilarPlantillasTest(TestCase):
+    def test_compila_todas_y_el_render_no_vuelve_a_parsear(self):
+        from django.conf import settings
+        from django.template import engines
+        from django.test import override_settings
+        from .plantillas import nombres_plantillas, precompilar_plantillas
+
+        cache_loader = {**settings.TEMPLATES[0], 'APP_DIRS': False, 'OPTIONS': {
+            **settings.TEMPLATES[0]['OPTIONS'],
+            'loaders': [('django.template.loaders.cached.Loader', [
+                'django.template.loaders.app_directories.Loader',
+            ])],
+        }}
+        with override_settings(TEMPLATES=[cache_loader]):
+            compiladas, errores = precompilar_plantillas()
+            self.assertEqual(errores, [])
+            self.assertEqual(compiladas, nombres_plantillas())
+            self.assertIn('paginas/base.html', compiladas)
+
+            cargador = engines['django'].engine.template_loaders[0]
+            en_cache = set(cargador.get_template_cache)
+            self.client.get(reverse('login'))
+            self.assertEqual(set(cargador.get_template_cache), en_cache)
+
+
+class SQLiteCacheTest(TestCase):
+    def setUp(self):
+        import tempfile
+        from .cache_sqlite import SQLiteCache
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.ruta = f'{directorio.name}/cache.sqlite3'
+        self.cache = SQLiteCache(self.ruta, {'OPTIONS': {'MAX_ENTRIES': 4, 'CULL_FREQUENCY': 2}})
+
+    def test_compartida_entre_instancias(self):
+        from .cache_sqlite import SQLiteCache
+        otra = SQLiteCache(self.ruta, {})
+        self.cache.set('tabla', {'filas': [1, 2]})
+        self.assertEqual(otra.get('tabla'), {'filas': [1, 2]})
+        self.assertFalse(otra.add('tabla', 'otra'))
+        self.assertTrue(otra.delete('tabla'))
+        self.assertIsNone(self.cache.get('tabla'))
+
+    def test_expiracion(self):
+        self.cache.set('corta', 1, timeout=0)
+        self.assertIsNone(self.cache.get('corta'))
+        self.assertTrue(self.cache.add('corta', 'nueva'))
+        self.assertEqual(self.cache.get('corta'), 'nueva')
+        self.cache.set('fija', True, timeout=None)
+        self.assertIs(self.cache.get('fija'), True)
+
+    def test_incr_atomico_entre_hilos(self):
+        import threading
+        from .cache_sqlite import SQLiteCache
+        self.cache.set('version', 0, timeout=None)
+        self.assertEqual(self.cache.incr('version', 5), 5)
+
+        def sumar():
+            cache = SQLiteCache(self.ruta, {})
+            for _ in range(100):
+                cache.incr('version')
+        hilos = [threading.Thread(target=sumar) for _ in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(self.cache.get('version'), 405)
+        with self.assertRaises(ValueError):
+            self.cache.incr('no_existe')
+
+    def test_purga_los_menos_usados(self):
+        from itertools import count
+        from unittest import mock
+        from . import cache_sqlite
+        with mock.patch.object(cache_sqlite, 'time') as reloj:
+            reloj.time.side_effect = count(1000, 100)
+            for clave in 'abcde':
+                self.cache.set(clave, clave, timeout=None)
+            self.cache.get('a')  # 'a' is used again after the others were written
+        self.cache.purgar()
+        self.assertEqual(self.cache.get_many('abcde'), {'a': 'a', 'e': 'e'})
+
+
+class CargasPorPeticionTest(TestCase):
+    """Each view loads every row it needs once; the counts include session and user."""
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from .services import hilatura_service, preparacion_service
+        self.preparador = User.objects.create_user('preparador_cargas', password='x')
+        self.preparador.profile.role = 'preparador'
+        self.preparador.profile.save()
+        self.operario = User.objects.create_user('operario_cargas', password='x')
+        self.operario.profile.role = 'operario'
+        self.operario.profile.save()
+        self.materia = Materia.objects.create(tipo='Lana', cantidad=100, lote='CA-1')
+        self.preparacion = preparacion_service.crear_preparacion(self.materia, 'limpieza', 5, self.preparador)
+        self.origen = preparacion_service.crear_preparacion(self.materia, 'limpieza', 5, self.preparador)
+        preparacion_service.iniciar_preparacion_proceso(self.origen, self.preparador)
+        preparacion_service.completar_preparacion_proceso(self.origen, self.preparador)
+        self.hilatura, _ = hilatura_service.crear_proceso_hilatura('cardado', self.origen, 5, self.operario)
+
+    def consultas(self, usuario, metodo, nombre, datos=None, args=None):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.client.force_login(usuario)
+        self.client.get(reverse('inicio'))
+        url = reverse(nombre, args=args or [])
+        with CaptureQueriesContext(connection) as capturadas:
+            respuesta = getattr(self.client, metodo)(url, datos or {})
+        self.assertIn(respuesta.status_code, (200, 302))
+        return len(capturadas)
+
+    def test_vistas_de_hilatura(self):
+        h = [self.hilatura.pk]
+        self.assertEqual(self.consultas(self.operario, 'get', 'editar_hilatura', args=h), 4)
+        self.assertEqual(self.consultas(self.operario, 'post', 'editar_hilatura', {
+            'etapa': 'peinado', 'cantidad_fibra_entrada': '6', 'preparacion_origen': self.origen.pk,
+        }, args=h), 18)
+        self.assertEqual(self.consultas(self.operario, 'get', 'agregar_detalle_hilatura', args=h), 3)
+        self.assertEqual(self.consultas(self.operario, 'post', 'agregar_detalle_hilatura', {
+            'temperatura': '20',
+        }, args=h), 6)
+        self.assertEqual(self.consultas(self.operario, 'post', 'iniciar_hilatura', args=h), 10)
+        self.assertEqual(self.consultas(self.operario, 'post', 'completar_hilatura', {
+            'cantidad_hilo_salida': '4', 'calidad_resultado': 'buena',
+        }, args=h), 14)
+
+    def test_vistas_de_preparacion(self):
+        p = [self.preparacion.pk]
+        self.assertEqual(self.consultas(self.preparador, 'get', 'editar_preparacion', args=p), 4)
+        self.assertEqual(self.consultas(self.preparador, 'post', 'editar_preparacion', {
+            'materia_prima': self.materia.pk, 'tipo_proceso': 'apertura', 'cantidad_procesada': '6',
+        }, args=p), 25)
+        self.assertEqual(self.consultas(self.preparador, 'get', 'agregar_detalle_preparacion', args=p), 4)
+        self.assertEqual(self.consultas(self.preparador, 'post', 'agregar_detalle_preparacion', {
+            'temperatura': '20', 'humedad': '50', 'tiempo_proceso': '5',
+        }, args=p), 4)
+        # Starting and completing re-read the preparation with SELECT ... FOR UPDATE
+        self.assertEqual(self.consultas(self.preparador, 'post', 'iniciar_preparacion', args=p), 11)
+        self.assertEqual(self.consultas(self.preparador, 'post', 'completar_preparacion', args=p), 20)
+
+
+class PaginacionTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.utils import timezone
+        from .models import PreparacionMateria
+        self.admin = User.objects.create_user('admin_paginas', password='x')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        materia = Materia.objects.create(tipo='Lana', cantidad=100, lote='PG-1')
+        PreparacionMateria.objects.bulk_create([
+            PreparacionMateria(materia_prima=materia, tipo_proceso='limpieza', cantidad_procesada=1,
+                               estado='completada' if i % 2 else 'pendiente', usuario_preparador=self.admin)
+            for i in range(11)
+        ])
+        # Ties on fecha_inicio, so the id has to order within them
+        ahora = timezone.now()
+        for i, pk in enumerate(PreparacionMateria.objects.order_by('pk').values_list('pk', flat=True)):
+            PreparacionMateria.objects.filter(pk=pk).update(fecha_inicio=ahora - timezone.timedelta(hours=i // 3))
+        self.esperado = list(PreparacionMateria.objects.order_by('-fecha_inicio', 'id').values_list('pk', flat=True))
+        self.client.force_login(self.admin)
+
+    def recorrer(self, url, enlace):
+        """Follow `enlace` from `url`; return the ids of each page and the page objects."""
+        ids, paginas = [], []
+        while url:
+            pagina = self.client.get(url).context['preparaciones']
+            ids.append([p.pk for p in pagina])
+            paginas.append(pagina)
+            url = getattr(pagina, enlace)
+        return ids, paginas
+
+    def test_recorre_todas_las_filas_en_orden_y_vuelve(self):
+        from django.test import override_settings
+        with override_settings(PAGINACION_TAMANO=4):
+            adelante, paginas = self.recorrer(reverse('listar_preparaciones'), 'url_siguiente')
+            self.assertEqual([len(p) for p in adelante], [4, 4, 3])
+            self.assertEqual(sum(adelante, []), self.esperado)
+            self.assertIsNone(paginas[0].url_anterior)
+            self.assertIsNone(paginas[0].url_primera)
+
+            atras, _ = self.recorrer(paginas[-1].url_anterior, 'url_anterior')
+            self.assertEqual(atras, adelante[-2::-1])
+
+    def test_conserva_los_filtros_y_lee_una_pagina_por_consulta(self):
+        from django.db import connection
+        from django.test import override_settings
+        from django.test.utils import CaptureQueriesContext
+        from .models import PreparacionMateria
+        estados = dict(PreparacionMateria.objects.values_list('pk', 'estado'))
+        pendientes = [pk for pk in self.esperado if estados[pk] == 'pendiente']
+        with override_settings(PAGINACION_TAMANO=2):
+            ids, paginas = self.recorrer(reverse('listar_preparaciones') + '?estado=pendiente', 'url_siguiente')
+            self.assertEqual(sum(ids, []), pendientes)
+            self.assertIn('estado=pendiente', paginas[1].url_siguiente)
+
+            with CaptureQueriesContext(connection) as capturadas:
+                self.client.get(paginas[-1].url_anterior)
+        listado = [q['sql'] for q in capturadas if 'texcore_preparacionmateria' in q['sql'].lower()
+                   and 'LIMIT 3' in q['sql']]
+        self.assertEqual(len(listado), 1)
+        self.assertNotIn('OFFSET', listado[0])
+
+    def test_cursor_invalido_muestra_la_primera_pagina(self):
+        from django.test import override_settings
+        with override_settings(PAGINACION_TAMANO=4):
+            for cursor in ('basura', 'WzFd', 'WyJubyBlcyBmZWNoYSIsIDFd'):
+                pagina = self.client.get(reverse('listar_preparaciones'), {'despues': cursor}).context['preparaciones']
+                self.assertEqual([p.pk for p in pagina], self.esperado[:4])
+
+    def test_el_orden_debe_terminar_en_un_campo_unico(self):
+        from django.test import RequestFactory
+        from .models import PreparacionMateria
+        from .paginacion import paginar
+        with self.assertRaises(ValueError):
+            paginar(RequestFactory().get('/'), PreparacionMateria.objects.order_by('-fecha_inicio'))
+
+
+class ReporteStreamingTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from .models import PreparacionMateria
+        self.admin = User.objects.create_user('admin_streaming', password='x')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.materia = Materia.objects.create(tipo='Lana', cantidad=100, lote='ST-1')
+        self.origen = PreparacionMateria.objects.create(
+            materia_prima=self.materia, tipo_proceso='limpieza', cantidad_procesada=5,
+            usuario_preparador=self.admin, estado='completada',
+        )
+        self.client.force_login(self.admin)
+
+    def sembrar_hilaturas(self, cantidad, lote=5000):
+        from .models import ProcesoHilatura
+        for inicio in range(0, cantidad, lote):
+            ProcesoHilatura.objects.bulk_create([
+                ProcesoHilatura(preparacion_origen=self.origen, etapa='cardado', estado='completada',
+                                cantidad_fibra_entrada=10, cantidad_hilo_salida=9,
+                                titulo_hilo=f'Ne {i % 40}', usuario_operador=self.admin)
+                for i in range(inicio, min(inicio + lote, cantidad))
+            ])
+
+    def test_envia_la_cabecera_antes_de_leer_las_filas(self):
+        from django.db import connection
+        from django.test import override_settings
+        from django.test.utils import CaptureQueriesContext
+        self.sembrar_hilaturas(5)
+        with override_settings(REPORTE_BLOQUE_FILAS=2):
+            respuesta = self.client.get(reverse('reporte_hilaturas'))
+            self.assertTrue(respuesta.streaming)
+            partes = iter(respuesta.streaming_content)
+            with CaptureQueriesContext(connection) as capturadas:
+                cabeza = next(partes)
+            self.assertEqual(len(capturadas), 0)
+            self.assertIn(b'Estad', cabeza)
+            filas = [parte for parte in partes]
+        html = cabeza + b''.join(filas)
+        self.assertEqual(html.count(b'Ne '), 5)
+        self.assertEqual(len(filas), 4)  # three blocks of rows and the tail
+        self.assertIn(b'Volver a Lista', filas[-1])
+
+    def test_la_vista_no_deja_lecturas_de_reportes_activas(self):
+        from django.db import connection
+        from .routers import _alias_reportes
+        self.sembrar_hilaturas(3)
+        transacciones = len(connection.atomic_blocks)
+        for nombre in ['reporte_hilaturas', 'reporte_preparaciones', 'exportar_hilaturas_csv']:
+            respuesta = self.client.get(reverse(nombre))
+            # Rows still to send: no routing or transaction left open for them
+            self.assertIsNone(_alias_reportes.get())
+            self.assertEqual(len(connection.atomic_blocks), transacciones)
+            b''.join(respuesta.streaming_content)
+
+    def test_el_resumen_se_cachea_y_las_filas_se_leen_al_momento(self):
+        from decimal import Decimal
+        from django.core.cache import cache
+        from .services import preparacion_service
+        cache.clear()
+        url = reverse('reporte_preparaciones')
+        primera = self.client.get(url, {'estado': 'pendiente'})
+        b''.join(primera.streaming_content)
+        preparacion_service.crear_preparacion(
+            materia_prima=self.materia, tipo_proceso='apertura',
+            cantidad_procesada=Decimal('2'), usuario_preparador=self.admin,
+        )
+        respuesta = self.client.get(url, {'estado': 'pendiente'})
+        html = b''.join(respuesta.streaming_content).decode()
+        # Summary within REPORT_CACHE_MAX_AGE, labelled with its time; rows current
+        self.assertEqual(respuesta.context['total_preparaciones'], 0)
+        self.assertEqual(respuesta.context['generado'], primera.context['generado'])
+        self.assertIn('Resumen calculado el', html)
+        self.assertIn('Apertura', html)
+
+    def test_los_resumenes_se_sirven_como_fragmentos_cacheados(self):
+        from django.core.cache import cache
+        from .services import cache_service
+        cache.clear()
+        cache_service.reiniciar_estadisticas()
+        for nombre in ['reporte_preparaciones', 'reporte_hilaturas']:
+            for _ in range(2):
+                b''.join(self.client.get(reverse(nombre)).streaming_content)
+        estadisticas = cache_service.get_estadisticas()
+        for fragmento in ['reporte_preparaciones_resumen', 'reporte_hilaturas_resumen']:
+            self.assertEqual(estadisticas[fragmento], {'aciertos': 1, 'fallos': 1, 'version': None})
+
+    def test_reporte_vacio_muestra_la_fila_de_aviso(self):
+        respuesta = self.client.get(reverse('reporte_preparaciones'), {'estado': 'pendiente'})
+        html = b''.join(respuesta.streaming_content).decode()
+        self.assertIn('No hay preparaciones que coincidan', html)
+        self.assertEqual(html.count('<tbody>'), 1)
+
+    def test_memoria_de_un_reporte_de_200k_filas(self):
+        """Slow (about two minutes): runs with PRUEBAS_VOLUMEN=1."""
+        import gc
+        import os
+        import time
+        if not os.environ.get('PRUEBAS_VOLUMEN'):
+            self.skipTest('PRUEBAS_VOLUMEN=1 para medir el reporte de 200k filas')
+        if not os.path.exists('/proc/self/statm'):
+            self.skipTest('Se mide el RSS con /proc/self/statm (Linux)')
+        pagina = os.sysconf('SC_PAGE_SIZE')
+
+        def rss():
+            with open('/proc/self/statm') as statm:
+                return int(statm.read().split()[1]) * pagina
+
+        self.sembrar_hilaturas(200_000)
+        gc.collect()
+        inicial = pico = rss()
+        inicio = time.perf_counter()
+        respuesta = self.client.get(reverse('reporte_hilaturas'))
+        primer_byte = time.perf_counter() - inicio
+        filas = 0
+        for parte in respuesta.streaming_content:
+            filas += parte.count(b'<tr>')
+            pico = max(pico, rss())
+        respuesta.close()
+        total = time.perf_counter() - inicio
+        print(f'\nreporte_hilaturas con 200000 filas: primer byte {primer_byte * 1000:.0f} ms, '
+              f'total {total:.1f} s, RSS {inicial / 2 ** 20:.0f} MiB -> pico {pico / 2 ** 20:.0f} MiB '
+              f'(+{(pico - inicial) / 2 ** 20:.1f})')
+        self.assertEqual(filas, 200_000 + 1)  # plus the header row
+        # A materialized report holds every row: well over 100 MiB at this size
+        self.assertLess(pico - inicial, 64 * 2 ** 20)
+
+
+class ExportacionTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from .models import PreparacionMateria, DetallePreparacion, ProcesoHilatura, DetalleHilatura
+        self.admin = User.objects.create_user('admin_csv', password='x')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.materia = Materia.objects.create(tipo='Lana', cantidad=100, lote='=HYPERLINK("x")')
+        self.completada = PreparacionMateria.objects.create(
+            materia_prima=self.materia, tipo_proceso='ajuste_proporciones', cantidad_procesada=5,
+            usuario_preparador=self.admin, estado='completada',
+        )
+        pendiente = PreparacionMateria.objects.create(
+            materia_prima=self.materia, tipo_proceso='limpieza', cantidad_procesada=3,
+            usuario_preparador=self.admin,
+        )
+        DetallePreparacion.objects.create(preparacion=self.completada, equipo_utilizado='Abridora 1')
+        DetallePreparacion.objects.create(preparacion=pendiente, equipo_utilizado='Abridora 2')
+        hilatura = ProcesoHilatura.objects.create(
+            preparacion_origen=self.completada, etapa='hilado', cantidad_fibra_entrada=5,
+            usuario_operador=self.admin,
+        )
+        DetalleHilatura.objects.create(hilatura=hilatura, maquina_hiladora='Continua 3', grado_torsion='alta')
+        self.client.force_login(self.admin)
+
+    def leer(self, nombre, datos=None):
+        import csv
+        import io
+        respuesta = self.client.get(reverse(nombre), datos or {})
+        self.assertTrue(respuesta.streaming)
+        self.assertIn('attachment;', respuesta['Content-Disposition'])
+        texto = b''.join(respuesta.streaming_content).decode('utf-8')
+        self.assertTrue(texto.startswith('﻿'))
+        return list(csv.reader(io.StringIO(texto[1:])))
+
+    def test_preparaciones_con_los_filtros_del_reporte(self):
+        filas = self.leer('exportar_preparaciones_csv', {'estado': 'completada'})
+        self.assertEqual(filas[0][:4], ['ID', 'Materia prima', 'Lote', 'Proceso'])
+        self.assertEqual(len(filas), 2)
+        fila = dict(zip(filas[0], filas[1]))
+        self.assertEqual(fila['ID'], str(self.completada.pk))
+        self.assertEqual(fila['Proceso'], 'Ajuste de Proporciones')
+        self.assertEqual(fila['Estado'], 'Completada')
+        self.assertEqual(fila['Calidad'], '')
+
+        detalles = self.leer('exportar_detalles_preparacion_csv', {'estado': 'completada'})
+        self.assertEqual([fila[5] for fila in detalles[1:]], ['Abridora 1'])
+
+    def test_hilaturas_y_sus_detalles(self):
+        filas = self.leer('exportar_hilaturas_csv', {'etapa': 'hilado'})
+        self.assertEqual(len(filas), 2)
+        self.assertEqual(len(self.leer('exportar_hilaturas_csv', {'etapa': 'cardado'})), 1)
+        detalles = self.leer('exportar_detalles_hilatura_csv', {'etapa': 'hilado'})
+        fila = dict(zip(detalles[0], detalles[1]))
+        self.assertEqual(fila['Máquina'], 'Continua 3')
+        self.assertEqual(fila['Grado de torsión'], 'Alta Torsión')
+
+    def test_materias_neutraliza_formulas(self):
+        filas = self.leer('exportar_materias_csv')
+        fila = dict(zip(filas[0], filas[1]))
+        self.assertEqual(fila['Lote'], '\'=HYPERLINK("x")')
+        self.assertEqual(fila['Disponible'], '100.00')
+
+    def test_envia_las_filas_por_bloques(self):
+        from django.test import override_settings
+        from .models import PreparacionMateria
+        PreparacionMateria.objects.bulk_create([
+            PreparacionMateria(materia_prima=self.materia, tipo_proceso='limpieza', cantidad_procesada=1)
+            for _ in range(5)
+        ])
+        with override_settings(REPORTE_BLOQUE_FILAS=3):
+            respuesta = self.client.get(reverse('exportar_preparaciones_csv'))
+            partes = list(respuesta.streaming_content)
+        self.assertEqual(len(partes), 4)  # header, 3 + 3 + 1 rows
+
+    def libro(self, nombre, datos=None):
+        import io
+        from django.core.management import call_command
+        from openpyxl import load_workbook
+        call_command('recount', stdout=io.StringIO())
+        respuesta = self.client.get(reverse(nombre), datos or {})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('.xlsx"', respuesta['Content-Disposition'])
+        return load_workbook(io.BytesIO(b''.join(respuesta.streaming_content)))
+
+    def test_reporte_preparaciones_en_excel(self):
+        libro = self.libro('exportar_reporte_preparaciones_xlsx', {'estado': 'completada'})
+        self.assertEqual(libro.sheetnames, ['Resumen', 'Por material', 'Preparaciones'])
+        resumen = dict(libro['Resumen'].iter_rows(min_row=2, values_only=True))
+        self.assertEqual(resumen['Total preparaciones'], 1)
+        self.assertEqual(resumen['Filtro: estado'], 'completada')
+        self.assertEqual(list(libro['Por material'].iter_rows(min_row=2, values_only=True)), [('Lana', 1, 5)])
+        filas = list(libro['Preparaciones'].iter_rows(values_only=True))
+        self.assertEqual(len(filas), 2)
+        fila = dict(zip(filas[0], filas[1]))
+        self.assertEqual(fila['Estado'], 'Completada')
+        self.assertEqual(fila['Lote'], '=HYPERLINK("x")')
+        celda = libro['Preparaciones'].cell(row=2, column=3)
+        self.assertEqual(celda.data_type, 's')
+
+    def test_reporte_hilaturas_en_excel(self):
+        libro = self.libro('exportar_reporte_hilaturas_xlsx', {'etapa': 'cardado'})
+        self.assertEqual(libro.sheetnames, ['Resumen', 'Procesos'])
+        resumen = dict(libro['Resumen'].iter_rows(min_row=2, values_only=True))
+        self.assertEqual(resumen['Total procesos'], 1)
+        self.assertEqual(resumen['Hilado'], 1)
+        self.assertEqual(libro['Procesos'].max_row, 1)
+
+    def test_reporte_en_excel_rechaza_mas_filas_que_el_limite(self):
+        import io
+        from django.contrib.messages import get_messages
+        from django.core.management import call_command
+        from django.test import override_settings
+        from .models import ProcesoHilatura
+        ProcesoHilatura.objects.create(
+            preparacion_origen=self.completada, etapa='cardado', cantidad_fibra_entrada=5,
+            usuario_operador=self.admin,
+        )
+        call_command('recount', stdout=io.StringIO())
+        with override_settings(EXPORTACION_XLSX_MAX_FILAS=1):
+            for nombre, reporte, filtro in [
+                ('exportar_reporte_preparaciones_xlsx', 'reporte_preparaciones', 'fecha_fin=2999-01-01'),
+                ('exportar_reporte_hilaturas_xlsx', 'reporte_hilaturas', 'fecha_hasta=2999-01-01'),
+            ]:
+                respuesta = self.client.get(f'{reverse(nombre)}?{filtro}')
+                self.assertRedirects(respuesta, f'{reverse(reporte)}?{filtro}', fetch_redirect_response=False)
+            mensajes = [str(m) for m in get_messages(respuesta.wsgi_request)]
+            self.assertIn('Exportar CSV', mensajes[-1])
+            # Within the limit the file is still sent
+            respuesta = self.client.get(reverse('exportar_reporte_preparaciones_xlsx'), {'estado': 'completada'})
+            self.assertEqual(respuesta.status_code, 200)
+
+
+class SnapshotAnaliticoTest(TestCase):
+    def setUp(self):
+        import tempfile
+        from decimal import Decimal
+        from .models import PreparacionMateria, DetallePreparacion, ProcesoHilatura
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+        self.ruta = f'{directorio.name}/texcore.duckdb'
+        materia = Materia.objects.create(tipo='Lana', cantidad=Decimal('100.25'), lote='L-1')
+        self.preparacion = PreparacionMateria.objects.create(
+            materia_prima=materia, tipo_proceso='limpieza', cantidad_procesada=Decimal('5.50'),
+        )
+        self.detalle = DetallePreparacion.objects.create(preparacion=self.preparacion, temperatura=Decimal('21.5'))
+        DetallePreparacion.objects.create(preparacion=self.preparacion, equipo_utilizado='Abridora')
+        ProcesoHilatura.objects.create(preparacion_origen=self.preparacion, cantidad_fibra_entrada=Decimal('5.50'))
+
+    def consultar(self, sql):
+        import duckdb
+        with duckdb.connect(self.ruta, read_only=True) as conexion:
+            return conexion.execute(sql).fetchall()
+
+    def test_columnas_tipadas_en_duckdb_y_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from . import analitica
+        resultado = analitica.exportar(self.ruta, self.directorio)
+        self.assertEqual(resultado['detallepreparacion'], {'copiadas': 2, 'borradas': 0, 'total': 2})
+
+        tipos = dict((nombre, tipo) for nombre, tipo, *_ in self.consultar('DESCRIBE materia'))
+        self.assertEqual(tipos['cantidad'], 'DECIMAL(12,2)')
+        self.assertEqual(tipos['cantidad_disponible'], 'DECIMAL(12,2)')
+        self.assertEqual(tipos['fecha_ingreso'], 'DATE')
+        self.assertEqual(tipos['updated_at'], 'TIMESTAMP WITH TIME ZONE')
+        self.assertEqual(tipos['usuario_registro_id'], 'INTEGER')  # auth.User uses AutoField
+        self.assertEqual(self.consultar('SELECT cantidad::VARCHAR FROM materia'), [('100.25',)])
+
+        esquema = pq.read_schema(f'{self.directorio}/detallepreparacion.parquet')
+        self.assertEqual(esquema.field('temperatura').type, pa.decimal128(5, 2))
+        self.assertEqual(esquema.field('tiempo_proceso').type, pa.int32())
+        self.assertEqual(pq.read_table(f'{self.directorio}/procesohilatura.parquet').num_rows, 1)
+
+    def test_solo_copia_los_cambios_y_quita_los_borrados(self):
+        from datetime import timedelta
+        from django.db.models import F
+        from . import analitica
+        from .models import PreparacionMateria, DetallePreparacion, ProcesoHilatura
+        analitica.exportar(self.ruta, '')
+        # Later runs: what the first one copied is now well before the watermark
+        for modelo in (Materia, PreparacionMateria, DetallePreparacion, ProcesoHilatura):
+            modelo.objects.update(updated_at=F('updated_at') - timedelta(hours=1))
+        self.preparacion.observaciones = 'Revisada'
+        self.preparacion.save()
+        self.detalle.delete()
+
+        resultado = analitica.exportar(self.ruta, '')
+        self.assertEqual(resultado['preparacionmateria']['copiadas'], 1)
+        self.assertEqual(resultado['materia']['copiadas'], 0)
+        self.assertEqual(resultado['detallepreparacion'], {'copiadas': 0, 'borradas': 1, 'total': 1})
+        self.assertEqual(self.consultar('SELECT observaciones FROM preparacionmateria'), [('Revisada',)])
+        self.assertEqual(self.consultar('SELECT count(*) FROM detallepreparacion'), [(1,)])
+
+
+class TablaParcialTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from .models import PreparacionMateria, ProcesoHilatura
+        self.admin = User.objects.create_user('admin_tabla', password='x')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        materia = Materia.objects.create(tipo='Lana', cantidad=100, lote='TP-1')
+        preparaciones = PreparacionMateria.objects.bulk_create([
+            PreparacionMateria(materia_prima=materia, tipo_proceso='limpieza', cantidad_procesada=1,
+                               estado='completada' if i % 2 else 'pendiente')
+            for i in range(5)
+        ])
+        ProcesoHilatura.objects.bulk_create([
+            ProcesoHilatura(preparacion_origen=preparaciones[0], etapa='hilado' if i % 2 else 'cardado',
+                            cantidad_fibra_entrada=1)
+            for i in range(5)
+        ])
+        self.client.force_login(self.admin)
+
+    def test_solo_la_tabla_con_enlaces_al_listado(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from django.test import override_settings
+        with override_settings(PAGINACION_TAMANO=2):
+            respuesta = self.client.get(reverse('tabla_preparaciones'), {'estado': 'pendiente'})
+            pagina = self.client.get(reverse('listar_preparaciones'), {'estado': 'pendiente'})
+        self.assertNotContains(respuesta, '<html')
+        self.assertNotContains(respuesta, 'Total de preparaciones')
+        siguiente = respuesta.context['preparaciones'].url_siguiente
+        self.assertTrue(siguiente.startswith(reverse('listar_preparaciones') + '?'))
+        self.assertIn('estado=pendiente', siguiente)
+        self.assertEqual(siguiente, pagina.context['preparaciones'].url_siguiente)
+        self.assertIn(respuesta.content.decode(), pagina.content.decode())
+
+        call_command('recount', stdout=StringIO())
+        self.assertContains(self.client.get(reverse('tabla_preparaciones')), 'Total de preparaciones: 5')
+
+    def test_la_tabla_de_hilaturas_no_recalcula_estadisticas(self):
+        from unittest import mock
+        with mock.patch('Texcore.services.hilatura_service.obtener_estadisticas_hilatura') as estadisticas:
+            respuesta = self.client.get(reverse('tabla_hilaturas'), {'etapa': 'hilado'})
+        estadisticas.assert_not_called()
+        self.assertEqual(len(respuesta.context['hilaturas']), 2)
+        self.assertContains(respuesta, 'Hilado', count=2)
+        self.assertNotContains(respuesta, 'Total Procesos')
+
+    def test_requiere_el_rol_del_listado(self):
+        from django.contrib.auth.models import User
+        operario = User.objects.create_user('operario_tabla', password='x')
+        self.client.force_login(operario)
+        self.assertEqual(self.client.get(reverse('tabla_preparaciones')).status_code, 302)
@@ -19,6 +19,7 @@ urlpatterns = [
     path('dashboard/preparador/', dashboard_views.preparador_dashboard, name='preparador_dashboard'),
     path('materias/', materia_views.listar_materias, name='index_materia'),
     path('materias/crear/', materia_views.crear_materia, name='crear_materia'),
+    path('materias/exportar.csv', materia_views.exportar_materias_csv, name='exportar_materias_csv'),
     path('materias/editar/', materia_views.editar_materia_no_id, name='editar_materia_no_id'),
     path('materias/editar/<int:materia_id>/', materia_views.editar_materia, name='editar_materia'),
     path('materias/eliminar/<int:materia_id>/', materia_views.eliminar_materia, name='eliminar_materia'),
@@ -31,6 +32,7 @@ urlpatterns = [
     
     # Preparación de materias primas (preparador + admin)
     path('preparaciones/', preparacion_views.listar_preparaciones, name='listar_preparaciones'),
+    path('preparaciones/tabla/', preparacion_views.tabla_preparaciones, name='tabla_preparaciones'),
     path('preparaciones/crear/', preparacion_views.crear_preparacion, name='crear_preparacion'),
     path('preparaciones/<int:preparacion_id>/', preparacion_views.detalle_preparacion, name='detalle_preparacion'),
     path('preparaciones/<int:preparacion_id>/iniciar/', preparacion_views.iniciar_preparacion, name='iniciar_preparacion'),
@@ -39,9 +41,13 @@ urlpatterns = [
     path('preparaciones/<int:preparacion_id>/eliminar/', preparacion_views.eliminar_preparacion, name='eliminar_preparacion'),
     path('preparaciones/<int:preparacion_id>/detalle/', preparacion_views.agregar_detalle_preparacion, name='agregar_detalle_preparacion'),
     path('preparaciones/reporte/', preparacion_views.reporte_preparaciones, name='reporte_preparaciones'),
+    path('preparaciones/exportar.csv', preparacion_views.exportar_preparaciones_csv, name='exportar_preparaciones_csv'),
+    path('preparaciones/detalles/exportar.csv', preparacion_views.exportar_detalles_preparacion_csv, name='exportar_detalles_preparacion_csv'),
+    path('preparaciones/reporte.xlsx', preparacion_views.exportar_reporte_preparaciones_xlsx, name='exportar_reporte_preparaciones_xlsx'),
     
     # Hilatura (operario + admin)
     path('hilaturas/', hilatura_views.listar_hilaturas, name='listar_hilaturas'),
+    path('hilaturas/tabla/', hilatura_views.tabla_hilaturas, name='tabla_hilaturas'),
     path('hilaturas/crear/', hilatura_views.crear_hilatura, name='crear_hilatura'),
     path('hilaturas/<int:hilatura_id>/', hilatura_views.detalle_hilatura, name='detalle_hilatura'),
     path('hilaturas/<int:hilatura_id>/iniciar/', hilatura_views.iniciar_hilatura, name='iniciar_hilatura'),
@@ -50,4 +56,7 @@ urlpatterns = [
     path('hilaturas/<int:hilatura_id>/eliminar/', hilatura_views.eliminar_hilatura, name='eliminar_hilatura'),
     path('hilaturas/<int:hilatura_id>/detalle/', hilatura_views.agregar_detalle_hilatura, name='agregar_detalle_hilatura'),
     path('hilaturas/reporte/', hilatura_views.reporte_hilaturas, name='reporte_hilaturas'),
+    path('hilaturas/exportar.csv', hilatura_views.exportar_hilaturas_csv, name='exportar_hilaturas_csv'),
+    path('hilaturas/detalles/exportar.csv', hilatura_views.exportar_detalles_hilatura_csv, name='exportar_detalles_hilatura_csv'),
+    path('hilaturas/reporte.xlsx', hilatura_views.exportar_reporte_hilaturas_xlsx, name='exportar_reporte_hilaturas_xlsx'),
 ]
\ No newline at end of file
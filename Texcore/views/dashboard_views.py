@@ -1,15 +1,17 @@
 """
 Dashboard views - role-specific dashboard pages.
 """
+from functools import partial
 from typing import Any
 from django.shortcuts import render, redirect
+from django.utils import timezone
 from ..decorators import (
     admin_required,
     operario_required,
     preparador_required,
     any_role_required
 )
-from ..services import dashboard_service
+from ..services import cache_service, dashboard_service
 
 
 @any_role_required
@@ -28,19 +30,44 @@ def dashboard(request: Any):
 @admin_required
 def admin_dashboard(request):
     """Administrative dashboard with statistics and reports."""
-    context = dashboard_service.get_admin_dashboard_stats()
+    # Fragment versions are read before the data, never after
+    versiones = cache_service.versiones_modelos()
+    context = cache_service.obtener_o_calcular(
+        'admin_dashboard', dashboard_service.get_admin_dashboard_stats
+    )
+    context = {**context, 'versiones_cache': versiones}
     return render(request, 'paginas/admin_dashboard.html', context)
 
 
 @operario_required
 def operario_dashboard(request):
     """Operario dashboard with quick access to common tasks."""
-    context = dashboard_service.get_operario_dashboard_stats(request.user)
+    hoy = timezone.localdate()
+    context = {
+        **cache_service.obtener_o_calcular(
+            'operario_dashboard',
+            partial(dashboard_service.get_operario_dashboard_stats, request.user),
+            usuario_id=request.user.pk
+        ),
+        **cache_service.obtener_o_calcular(
+            'resumen_del_dia', partial(dashboard_service.get_resumen_del_dia, hoy), dia=hoy
+        ),
+    }
     return render(request, 'paginas/operario_dashboard.html', context)
 
 
 @preparador_required
 def preparador_dashboard(request):
     """Dashboard específico para preparadores de materias primas."""
-    context = dashboard_service.get_preparador_dashboard_stats(request.user)
+    hoy = timezone.localdate()
+    context = {
+        **cache_service.obtener_o_calcular(
+            'preparador_dashboard',
+            partial(dashboard_service.get_preparador_dashboard_stats, request.user, hoy),
+            usuario_id=request.user.pk, dia=hoy
+        ),
+        **cache_service.obtener_o_calcular(
+            'resumen_del_dia', partial(dashboard_service.get_resumen_del_dia, hoy), dia=hoy
+        ),
+    }
     return render(request, 'paginas/preparador_dashboard.html', context)
@@ -1,51 +1,44 @@
 """
 Hilatura views - spinning process management.
 """
+from functools import partial
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
+from django.urls import reverse
 from decimal import Decimal
 from ..models import ProcesoHilatura, DetalleHilatura
+from ..paginacion import paginar
+from ..routers import lectura_de_reportes
+from ..streaming import respuesta_csv, respuesta_tabla_en_streaming, respuesta_xlsx
 from ..decorators import (
     admin_required,
     operario_required,
-    admin_or_operario_required
+    admin_or_operario_required,
+    respuesta_condicional
+)
+from ..services import (
+    hilatura_service, cache_service, exportacion_service, opciones_service, validadores_service
 )
-from ..services import hilatura_service
 
 
 @admin_or_operario_required
+@respuesta_condicional(validadores_service.validador_lista_hilaturas)
 def listar_hilaturas(request):
     """Lista todos los procesos de hilatura con filtros."""
-    hilaturas = hilatura_service.get_all_hilaturas()
-    
-    # Apply filters
-    estado = request.GET.get('estado')
-    etapa = request.GET.get('etapa')
-    fecha_desde = request.GET.get('fecha_desde')
-    fecha_hasta = request.GET.get('fecha_hasta')
-    
-    if estado or etapa or fecha_desde or fecha_hasta:
-        hilaturas = hilatura_service.filtrar_hilaturas(
-            estado=estado,
-            etapa=etapa,
-            fecha_desde=fecha_desde,
-            fecha_hasta=fecha_hasta
-        )
-    
-    # Estadísticas
-    estadisticas = hilatura_service.obtener_estadisticas_hilatura()
-    
     context = {
-        'hilaturas': hilaturas,
-        'estadisticas': estadisticas,
-        'filtro_estado': estado,
-        'filtro_etapa': etapa,
-        'filtro_fecha_desde': fecha_desde,
-        'filtro_fecha_hasta': fecha_hasta,
+        **_contexto_tabla(request),
+        'estadisticas': hilatura_service.obtener_estadisticas_hilatura(),
     }
     return render(request, 'hilatura/lista.html', context)
 
 
+@admin_or_operario_required
+@respuesta_condicional(validadores_service.validador_lista_hilaturas)
+def tabla_hilaturas(request):
+    """Solo la tabla del listado, para cambiar de filtro o de página sin recargar estadísticas."""
+    return render(request, 'hilatura/lista_tabla.html', _contexto_tabla(request))
+
+
 @operario_required
 def crear_hilatura(request):
     """Crear un nuevo proceso de hilatura."""
@@ -61,7 +54,9 @@ def crear_hilatura(request):
             preparacion_origen = None
             if preparacion_id:
                 from ..models import PreparacionMateria
-                preparacion_origen = PreparacionMateria.objects.get(pk=preparacion_id)
+                preparacion_origen = PreparacionMateria.objects.select_related(
+                    'materia_prima'
+                ).get(pk=preparacion_id)
             
             # Create using service
             hilatura, error_msg = hilatura_service.crear_proceso_hilatura(
@@ -83,7 +78,7 @@ def crear_hilatura(request):
             messages.error(request, f"Error al crear proceso: {str(e)}")
     
     # Get available preparaciones
-    preparaciones = hilatura_service.get_preparaciones_disponibles()
+    preparaciones = opciones_service.get_preparaciones_completadas()
     
     context = {
         'preparaciones': preparaciones,
@@ -92,6 +87,7 @@ def crear_hilatura(request):
 
 
 @admin_or_operario_required
+@respuesta_condicional(validadores_service.validador_detalle_hilatura, con_fecha=True)
 def detalle_hilatura(request, hilatura_id):
     """Ver detalle de un proceso de hilatura."""
     hilatura = get_object_or_404(ProcesoHilatura, pk=hilatura_id)
@@ -153,7 +149,7 @@ def completar_hilatura(request, hilatura_id):
 @operario_required
 def editar_hilatura(request, hilatura_id):
     """Editar un proceso de hilatura."""
-    hilatura = get_object_or_404(ProcesoHilatura, pk=hilatura_id)
+    hilatura = get_object_or_404(hilatura_service.get_hilaturas_con_origen(), pk=hilatura_id)
     
     if request.method == 'POST':
         try:
@@ -168,10 +164,12 @@ def editar_hilatura(request, hilatura_id):
             preparacion_id = request.POST.get('preparacion_origen')
             if preparacion_id:
                 from ..models import PreparacionMateria
-                datos_actualizados['preparacion_origen'] = PreparacionMateria.objects.get(pk=preparacion_id)
+                datos_actualizados['preparacion_origen'] = PreparacionMateria.objects.select_related(
+                    'materia_prima'
+                ).get(pk=preparacion_id)
             
             success, message = hilatura_service.actualizar_proceso_hilatura(
-                hilatura_id=hilatura_id,
+                hilatura=hilatura,
                 datos_actualizados=datos_actualizados
             )
             
@@ -185,7 +183,7 @@ def editar_hilatura(request, hilatura_id):
             messages.error(request, f"Error al editar proceso: {str(e)}")
     
     # Get available preparaciones
-    preparaciones = hilatura_service.get_preparaciones_disponibles()
+    preparaciones = opciones_service.get_preparaciones_completadas()
     
     context = {
         'hilatura': hilatura,
@@ -213,7 +211,7 @@ def eliminar_hilatura(request, hilatura_id):
 @operario_required
 def agregar_detalle_hilatura(request, hilatura_id):
     """Agregar detalle a un proceso de hilatura."""
-    hilatura = get_object_or_404(ProcesoHilatura, pk=hilatura_id)
+    hilatura = get_object_or_404(hilatura_service.get_hilaturas_con_origen(), pk=hilatura_id)
     
     if request.method == 'POST':
         try:
@@ -238,7 +236,7 @@ def agregar_detalle_hilatura(request, hilatura_id):
             detalle_data = {k: v for k, v in detalle_data.items() if v is not None and v != ''}
             
             detalle, error_msg = hilatura_service.agregar_detalle_hilatura(
-                hilatura_id=hilatura_id,
+                hilatura=hilatura,
                 detalle_data=detalle_data
             )
             
@@ -259,7 +257,60 @@ def agregar_detalle_hilatura(request, hilatura_id):
 
 @admin_or_operario_required
 def reporte_hilaturas(request):
-    """Generar reporte de procesos de hilatura."""
+    """Generar reporte de procesos de hilatura; la tabla se envía por bloques."""
+    filtros = _filtros_reporte(request)
+    # Cached summary (with the time it was computed); the rows are read fresh
+    context = {
+        **cache_service.obtener_reporte(
+            'reporte_hilaturas', filtros,
+            partial(hilatura_service.obtener_reporte_hilaturas, **filtros)
+        ),
+        'filtro_estado': filtros['estado'],
+        'filtro_etapa': filtros['etapa'],
+    }
+    return respuesta_tabla_en_streaming(
+        request, 'hilatura/reporte.html', context,
+        'hilatura/reporte_filas.html', 'hilaturas',
+        hilatura_service.iterar_reporte_hilaturas(**filtros),
+    )
+
+
+@admin_or_operario_required
+def exportar_hilaturas_csv(request):
+    """Exportar a CSV los procesos de hilatura, con los filtros del listado."""
+    return respuesta_csv('hilaturas', *exportacion_service.exportar_hilaturas(**_filtros_reporte(request)))
+
+
+@admin_or_operario_required
+def exportar_detalles_hilatura_csv(request):
+    """Exportar a CSV los detalles de los procesos filtrados."""
+    return respuesta_csv(
+        'detalles_hilatura', *exportacion_service.exportar_detalles_hilatura(**_filtros_reporte(request))
+    )
+
+
+@admin_or_operario_required
+def exportar_reporte_hilaturas_xlsx(request):
+    """Exportar a Excel el reporte de hilatura: hoja de resumen y hoja de procesos."""
+    filtros = _filtros_reporte(request)
+    # The workbook is written before returning: summary and rows from the same transaction
+    with lectura_de_reportes():
+        rechazo = exportacion_service.rechazo_xlsx(
+            hilatura_service.filtrar_hilaturas(**filtros).count(), 'procesos'
+        )
+        if rechazo:
+            messages.error(request, rechazo)
+            return redirect(f"{reverse('reporte_hilaturas')}?{request.GET.urlencode()}")
+        reporte = hilatura_service.obtener_reporte_hilaturas(**filtros)
+        return respuesta_xlsx('reporte_hilaturas', [
+            ('Resumen', *exportacion_service.resumen_hilaturas(reporte, filtros)),
+            ('Procesos', *exportacion_service.exportar_hilaturas(**filtros)),
+        ])
+
+
+# Helper functions
+def _contexto_tabla(request):
+    """Página de procesos filtrados del listado; sus enlaces llevan al listado."""
     hilaturas = hilatura_service.get_all_hilaturas()
     
     # Apply filters
@@ -276,19 +327,25 @@ def reporte_hilaturas(request):
             fecha_hasta=fecha_hasta
         )
     
-    # Estadísticas
-    estadisticas = hilatura_service.obtener_estadisticas_hilatura()
-    
-    context = {
-        'hilaturas': hilaturas,
-        'estadisticas': estadisticas,
+    return {
+        'hilaturas': paginar(request, hilaturas, ruta=reverse('listar_hilaturas')),
         'filtro_estado': estado,
         'filtro_etapa': etapa,
+        'filtro_fecha_desde': fecha_desde,
+        'filtro_fecha_hasta': fecha_hasta,
+    }
+
+
+def _filtros_reporte(request):
+    """Filtros de filtrar_hilaturas() tomados de la petición."""
+    return {
+        'estado': request.GET.get('estado'),
+        'etapa': request.GET.get('etapa'),
+        'fecha_desde': request.GET.get('fecha_desde'),
+        'fecha_hasta': request.GET.get('fecha_hasta'),
     }
-    return render(request, 'hilatura/reporte.html', context)
 
 
-# Helper functions
 def _get_decimal_or_none(value):
     """Convert string to Decimal or return None."""
     if value and value.strip():
@@ -6,17 +6,25 @@ from django.views.decorators.http import require_POST
 from django.contrib import messages
 from ..forms import MateriaForm
 from ..models import Materia
+from ..paginacion import paginar
+from ..streaming import respuesta_csv
 from ..decorators import admin_or_operario_required, operario_required
-from ..services import materia_service
+from ..services import exportacion_service, materia_service
 
 
 @admin_or_operario_required
 def listar_materias(request):
-    """List all materias ordered by newest first."""
-    materias = materia_service.get_all_materias()
+    """List all materias ordered by newest first, one page at a time."""
+    materias = paginar(request, materia_service.get_all_materias())
     return render(request, 'libros/index.html', {'materias': materias})
 
 
+@admin_or_operario_required
+def exportar_materias_csv(request):
+    """Export every materia to CSV, streamed row by row."""
+    return respuesta_csv('materias', *exportacion_service.exportar_materias())
+
+
 @operario_required
 def crear_materia(request):
     """
@@ -55,9 +63,13 @@ def editar_materia(request, materia_id: int):
     if request.method == 'POST':
         form = MateriaForm(request.POST, instance=materia)
         if form.is_valid():
-            form.save()
-            messages.success(request, 'Materia actualizada correctamente.')
-            return redirect('index_materia')
+            # Stock changes are recorded in the ledger by the service
+            try:
+                materia_service.actualizar_materia(materia, form.cleaned_data, request.user)
+                messages.success(request, 'Materia actualizada correctamente.')
+                return redirect('index_materia')
+            except ValueError as e:
+                messages.error(request, str(e))
     else:
         form = MateriaForm(instance=materia)
     
@@ -69,7 +81,7 @@ def editar_materia(request, materia_id: int):
 def eliminar_materia(request, materia_id: int):
     """Delete a Materia (POST only)."""
     materia = get_object_or_404(Materia, pk=materia_id)
-    materia.delete()
+    materia_service.eliminar_materia(materia)
     messages.success(request, 'Materia eliminada correctamente.')
     return redirect('index_materia')
 
@@ -1,38 +1,39 @@
 """
 Preparacion views - material preparation process management.
 """
+from functools import partial
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
+from django.urls import reverse
 from ..forms import PreparacionMateriaForm, DetallePreparacionForm, FiltroPreparacionForm
 from ..models import PreparacionMateria, DetallePreparacion
+from ..paginacion import paginar
+from ..routers import lectura_de_reportes
+from ..streaming import respuesta_csv, respuesta_tabla_en_streaming, respuesta_xlsx
 from ..decorators import (
     admin_required,
     preparador_required,
-    admin_or_preparador_required
+    admin_or_preparador_required,
+    respuesta_condicional
+)
+from ..services import (
+    preparacion_service, dashboard_service, cache_service, contador_service, exportacion_service,
+    opciones_service, validadores_service
 )
-from ..services import preparacion_service, materia_service, dashboard_service
 
 
 @admin_or_preparador_required
+@respuesta_condicional(validadores_service.validador_lista_preparaciones)
 def listar_preparaciones(request):
     """Lista todas las preparaciones con filtros."""
-    preparaciones = preparacion_service.get_all_preparaciones()
-    
-    # Apply filters if they exist
-    filtro_form = FiltroPreparacionForm(request.GET)
-    if filtro_form.is_valid():
-        preparaciones = preparacion_service.filtrar_preparaciones(
-            estado=filtro_form.cleaned_data.get('estado'),
-            tipo_proceso=filtro_form.cleaned_data.get('tipo_proceso'),
-            fecha_desde=filtro_form.cleaned_data.get('fecha_desde'),
-            fecha_hasta=filtro_form.cleaned_data.get('fecha_hasta')
-        )
-    
-    context = {
-        'preparaciones': preparaciones,
-        'filtro_form': filtro_form,
-    }
-    return render(request, 'preparacion/lista.html', context)
+    return render(request, 'preparacion/lista.html', _contexto_tabla(request))
+
+
+@admin_or_preparador_required
+@respuesta_condicional(validadores_service.validador_lista_preparaciones)
+def tabla_preparaciones(request):
+    """Solo la tabla del listado, para cambiar de filtro o de página sin recargar la página."""
+    return render(request, 'preparacion/lista_tabla.html', _contexto_tabla(request))
 
 
 @preparador_required
@@ -52,7 +53,7 @@ def crear_preparacion(request):
                 messages.error(request, error_msg)
                 return render(request, 'preparacion/crear.html', {
                     'form': form,
-                    'materias_con_stock': materia_service.get_materias_disponibles_para_preparacion(),
+                    'materias_con_stock': opciones_service.get_materias_disponibles(),
                 })
             
             # Check for low stock warning
@@ -92,7 +93,7 @@ def crear_preparacion(request):
         form = PreparacionMateriaForm()
     
     # Get additional info for template
-    materias_con_stock = materia_service.get_materias_disponibles_para_preparacion()
+    materias_con_stock = opciones_service.get_materias_disponibles()
     
     context = {
         'form': form,
@@ -102,6 +103,7 @@ def crear_preparacion(request):
 
 
 @admin_or_preparador_required
+@respuesta_condicional(validadores_service.validador_detalle_preparacion, con_fecha=True)
 def detalle_preparacion(request, preparacion_id):
     """Ver detalles de una preparación específica."""
     preparacion = get_object_or_404(
@@ -140,7 +142,9 @@ def iniciar_preparacion(request, preparacion_id):
 @preparador_required
 def completar_preparacion(request, preparacion_id):
     """Completar una preparación en proceso."""
-    preparacion = get_object_or_404(PreparacionMateria, pk=preparacion_id)
+    preparacion = get_object_or_404(
+        PreparacionMateria.objects.select_related('materia_prima'), pk=preparacion_id
+    )
     
     # Use service to complete preparation (includes stock update)
     success, message = preparacion_service.completar_preparacion_proceso(
@@ -161,7 +165,7 @@ def agregar_detalle_preparacion(request, preparacion_id):
     preparacion = get_object_or_404(PreparacionMateria, pk=preparacion_id)
     
     # Only assigned preparador can add details
-    if preparacion.usuario_preparador != request.user:
+    if preparacion.usuario_preparador_id != request.user.pk:
         messages.error(request, 'Solo puedes agregar detalles a tus propias preparaciones.')
         return redirect('listar_preparaciones')
     
@@ -193,7 +197,7 @@ def editar_preparacion(request, preparacion_id):
     preparacion = get_object_or_404(PreparacionMateria, pk=preparacion_id)
     
     # Only assigned preparador can edit
-    if preparacion.usuario_preparador != request.user:
+    if preparacion.usuario_preparador_id != request.user.pk:
         messages.error(request, 'Solo puedes editar tus propias preparaciones.')
         return redirect('listar_preparaciones')
     
@@ -205,9 +209,12 @@ def editar_preparacion(request, preparacion_id):
     if request.method == 'POST':
         form = PreparacionMateriaForm(request.POST, instance=preparacion)
         if form.is_valid():
-            form.save()
-            messages.success(request, 'Preparación actualizada exitosamente.')
-            return redirect('detalle_preparacion', preparacion_id=preparacion.id)
+            try:
+                preparacion_service.actualizar_preparacion(form.instance)
+                messages.success(request, 'Preparación actualizada exitosamente.')
+                return redirect('detalle_preparacion', preparacion_id=preparacion.id)
+            except ValueError as e:
+                messages.error(request, str(e))
         else:
             for field, errors in form.errors.items():
                 messages.error(request, f'{field}: {errors}')
@@ -231,7 +238,7 @@ def eliminar_preparacion(request, preparacion_id):
         return redirect('detalle_preparacion', preparacion_id=preparacion.id)
     
     if request.method == 'POST':
-        preparacion.delete()
+        preparacion_service.eliminar_preparacion(preparacion)
         messages.success(request, 'Preparación eliminada exitosamente.')
         return redirect('listar_preparaciones')
     
@@ -240,16 +247,81 @@ def eliminar_preparacion(request, preparacion_id):
 
 @admin_or_preparador_required
 def reporte_preparaciones(request):
-    """Generar reporte de preparaciones."""
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
-    estado_filtro = request.GET.get('estado')
-    
-    # Use service to get report statistics
-    context = dashboard_service.get_reporte_preparaciones_stats(
-        fecha_inicio=fecha_inicio,
-        fecha_fin=fecha_fin,
-        estado_filtro=estado_filtro
+    """Generar reporte de preparaciones; la tabla se envía por bloques."""
+    filtros = _filtros_reporte(request)
+    # Cached summary (with the time it was computed); the rows are read fresh
+    context = cache_service.obtener_reporte(
+        'reporte_preparaciones', filtros,
+        partial(dashboard_service.get_reporte_preparaciones_stats, **filtros)
+    )
+    return respuesta_tabla_en_streaming(
+        request, 'preparacion/reporte.html', context,
+        'preparacion/reporte_filas.html', 'preparaciones',
+        dashboard_service.iterar_reporte_preparaciones(**filtros),
     )
+
+
+@admin_or_preparador_required
+def exportar_preparaciones_csv(request):
+    """Exportar a CSV las preparaciones del reporte, con sus filtros."""
+    return respuesta_csv('preparaciones', *exportacion_service.exportar_preparaciones(**_filtros_reporte(request)))
+
+
+@admin_or_preparador_required
+def exportar_detalles_preparacion_csv(request):
+    """Exportar a CSV los detalles de las preparaciones del reporte."""
+    return respuesta_csv(
+        'detalles_preparacion', *exportacion_service.exportar_detalles_preparacion(**_filtros_reporte(request))
+    )
+
+
+@admin_or_preparador_required
+def exportar_reporte_preparaciones_xlsx(request):
+    """Exportar a Excel el reporte: resumen, resumen por material y preparaciones."""
+    filtros = _filtros_reporte(request)
+    # The workbook is written before returning: summary and rows from the same transaction
+    with lectura_de_reportes():
+        reporte = dashboard_service.get_reporte_preparaciones_stats(**filtros)
+        # The report's total counts the rows the sheet would hold
+        rechazo = exportacion_service.rechazo_xlsx(reporte['total_preparaciones'], 'preparaciones')
+        if rechazo:
+            messages.error(request, rechazo)
+            return redirect(f"{reverse('reporte_preparaciones')}?{request.GET.urlencode()}")
+        return respuesta_xlsx('reporte_preparaciones', [
+            ('Resumen', *exportacion_service.resumen_preparaciones(reporte, filtros)),
+            ('Por material', *exportacion_service.resumen_por_material(reporte)),
+            ('Preparaciones', *exportacion_service.exportar_preparaciones(**filtros)),
+        ])
+
+
+def _contexto_tabla(request):
+    """Página de preparaciones filtradas del listado; sus enlaces llevan al listado."""
+    preparaciones = preparacion_service.get_all_preparaciones()
+    
+    # Apply filters if they exist
+    filtro_form = FiltroPreparacionForm(request.GET)
+    if filtro_form.is_valid():
+        preparaciones = preparacion_service.filtrar_preparaciones(
+            estado=filtro_form.cleaned_data.get('estado'),
+            tipo_proceso=filtro_form.cleaned_data.get('tipo_proceso'),
+            fecha_desde=filtro_form.cleaned_data.get('fecha_desde'),
+            fecha_hasta=filtro_form.cleaned_data.get('fecha_hasta')
+        )
+    
+    # The total comes from the state counters; a filtered total would cost a COUNT(*)
+    filtrado = filtro_form.is_valid() and any(filtro_form.cleaned_data.values())
     
-    return render(request, 'preparacion/reporte.html', context)
+    return {
+        'preparaciones': paginar(request, preparaciones, ruta=reverse('listar_preparaciones')),
+        'filtro_form': filtro_form,
+        'total_preparaciones': None if filtrado else contador_service.obtener_contadores(PreparacionMateria)['total'],
+    }
+
+
+def _filtros_reporte(request):
+    """Filtros del reporte de preparaciones, compartidos con sus exportaciones."""
+    return {
+        'fecha_inicio': request.GET.get('fecha_inicio'),
+        'fecha_fin': request.GET.get('fecha_fin'),
+        'estado_filtro': request.GET.get('estado'),
+    }
@@ -7,14 +7,15 @@ from django.contrib.auth.models import User
 from django.contrib import messages
 from ..models import Profile
 from ..decorators import admin_required
+from ..paginacion import paginar
 
 
 @admin_required
 def listar_usuarios(request):
     """List all users with their roles - Admin only."""
-    usuarios = User.objects.select_related('profile').all().order_by('username')
+    usuarios = User.objects.select_related('profile').order_by('username')
     context = {
-        'usuarios': usuarios,
+        'usuarios': paginar(request, usuarios),
     }
     return render(request, 'usuarios/lista.html', context)
 
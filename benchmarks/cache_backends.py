@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""
+Cache backend benchmark: LocMem vs file-based vs the shared SQLite cache.
+
+Measures get (hit and miss), set and incr latency in one process, with
+values shaped like the cached dashboards. Then several processes increment
+the same version counter at once and the final value is compared with the
+expected one: LocMem is per process and the file-based cache increments with
+get + set, so both lose updates; the SQLite cache must not.
+
+Usage:
+    python benchmarks/cache_backends.py --operaciones 5000 --procesos 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+BACKENDS = ['locmem', 'archivo', 'sqlite']
+
+
+def _setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LoginCRUD.settings.production')
+    import django
+    django.setup()
+
+
+def crear_cache(nombre: str, directorio: str):
+    """Build a backend instance, shared through `directorio` when it can be."""
+    from django.core.cache.backends.filebased import FileBasedCache
+    from django.core.cache.backends.locmem import LocMemCache
+    from Texcore.cache_sqlite import SQLiteCache
+
+    opciones = {'OPTIONS': {'MAX_ENTRIES': 100_000}}
+    if nombre == 'locmem':
+        return LocMemCache('bench', opciones)
+    if nombre == 'archivo':
+        return FileBasedCache(os.path.join(directorio, 'archivos'), opciones)
+    return SQLiteCache(os.path.join(directorio, 'cache.sqlite3'), opciones)
+
+
+def valor_dashboard(i: int) -> dict:
+    """A value shaped like a cached dashboard: a few counters and recent rows."""
+    return {
+        'total_materias': i,
+        'entradas_recientes': [
+            {'id': j, 'tipo': f'Tipo {j % 12}', 'cantidad': j * 1.5, 'lote': f'L-{j}'}
+            for j in range(10)
+        ],
+    }
+
+
+def cronometrar(operacion, claves) -> dict:
+    """Run `operacion` once per key; return mean and p99 in microseconds."""
+    tiempos = []
+    for clave in claves:
+        inicio = time.perf_counter()
+        operacion(clave)
+        tiempos.append((time.perf_counter() - inicio) * 1_000_000)
+    tiempos.sort()
+    return {'media': statistics.fmean(tiempos), 'p99': tiempos[int(len(tiempos) * 0.99) - 1]}
+
+
+def latencias(nombre: str, directorio: str, operaciones: int) -> dict:
+    cache = crear_cache(nombre, directorio)
+    cache.clear()
+    claves = [f'dashboard:{i}' for i in range(operaciones)]
+    valor = valor_dashboard(1)
+    resultados = {
+        'set': cronometrar(lambda clave: cache.set(clave, valor), claves),
+        'get': cronometrar(cache.get, claves),
+        'get (fallo)': cronometrar(cache.get, [f'{clave}:no' for clave in claves]),
+    }
+    cache.set('version', 0, timeout=None)
+    resultados['incr'] = cronometrar(lambda clave: cache.incr('version'), claves)
+    return resultados
+
+
+def trabajador(nombre: str, directorio: str, operaciones: int, inicio: float) -> None:
+    """Increment the shared counter and print the elapsed time as JSON."""
+    cache = crear_cache(nombre, directorio)
+    cache.add('version', 0, timeout=None)
+    time.sleep(max(0.0, inicio - time.time()))
+    comienzo = time.perf_counter()
+    for _ in range(operaciones):
+        cache.incr('version')
+    print(json.dumps({'segundos': time.perf_counter() - comienzo, 'final': cache.get('version')}))
+
+
+def concurrencia(nombre: str, directorio: str, procesos: int, operaciones: int) -> dict:
+    crear_cache(nombre, directorio).clear()
+    inicio = time.time() + 2  # let every process finish django.setup()
+    hijos = [
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--trabajador', nombre,
+             '--directorio', directorio, '--operaciones', str(operaciones), '--inicio', str(inicio)],
+            stdout=subprocess.PIPE, text=True,
+        )
+        for _ in range(procesos)
+    ]
+    salidas = [json.loads(hijo.communicate()[0].strip().splitlines()[-1]) for hijo in hijos]
+    return {
+        'incr_s': procesos * operaciones / max(s['segundos'] for s in salidas),
+        # What a fresh reader sees; LocMem has no shared state to read
+        'final': crear_cache(nombre, directorio).get('version') if nombre != 'locmem'
+                 else max(s['final'] for s in salidas),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--operaciones', type=int, default=5000)
+    parser.add_argument('--procesos', type=int, default=3)
+    parser.add_argument('--trabajador', choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument('--directorio', help=argparse.SUPPRESS)
+    parser.add_argument('--inicio', type=float, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    _setup_django()
+    if args.trabajador:
+        return trabajador(args.trabajador, args.directorio, args.operaciones, args.inicio)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        print(f'Latencia en µs ({args.operaciones} operaciones, media / p99)')
+        print(f'{"backend":<10}' + ''.join(f'{op:>20}' for op in ('set', 'get', 'get (fallo)', 'incr')))
+        for nombre in BACKENDS:
+            r = latencias(nombre, directorio, args.operaciones)
+            print(f'{nombre:<10}' + ''.join(
+                f'{r[op]["media"]:>11.1f} / {r[op]["p99"]:>6.1f}' for op in ('set', 'get', 'get (fallo)', 'incr')
+            ))
+
+        esperado = args.procesos * args.operaciones
+        print(f'\n{args.procesos} procesos incrementando el mismo contador (esperado {esperado})')
+        print(f'{"backend":<10}{"incr/s":>10}{"final":>10}')
+        for nombre in BACKENDS:
+            r = concurrencia(nombre, directorio, args.procesos, args.operaciones)
+            print(f'{nombre:<10}{r["incr_s"]:>10.0f}{r["final"]:>10}')
+
+
+if __name__ == '__main__':
+    main()
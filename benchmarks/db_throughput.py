@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""
+Read/write throughput benchmark with several concurrent worker processes.
+
+Simulates the gunicorn setup: N processes share one database, some of them
+complete preparations (the write path that decrements stock) while the rest
+load the admin dashboard. Runs the same workload with and without the SQLite
+tuning profile (and optionally on PostgreSQL) and prints operations per second
+and lock errors.
+
+Usage:
+    python benchmarks/db_throughput.py --workers 3 --escritores 1 --segundos 10
+
+    # Same workload on PostgreSQL too (POSTGRES_HOST/USER/PASSWORD from the env).
+    # WARNING: the given database is flushed before the run.
+    python benchmarks/db_throughput.py --postgres-db textilapp_bench
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def _setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LoginCRUD.settings.production')
+    import django
+    django.setup()
+
+
+def preparar(registros: int) -> None:
+    """Create the schema and seed data in the scratch database."""
+    _setup_django()
+    from django.core.management import call_command
+    from django.contrib.auth.models import User
+    from Texcore.models import Materia
+
+    call_command('migrate', verbosity=0, interactive=False)
+    call_command('flush', verbosity=0, interactive=False)
+    preparador = User.objects.create_user('bench_preparador', password='bench')
+    preparador.profile.role = 'preparador'
+    preparador.profile.save()
+    Materia.objects.bulk_create([
+        Materia(tipo=f'Tipo {i % 12}', cantidad=1_000_000, unidad_medida='kg',
+                lote=f'B-{i}', usuario_registro=preparador)
+        for i in range(registros)
+    ])
+
+
+def trabajador(rol: str, segundos: float, inicio: float) -> None:
+    """Run one worker loop and print its counters as JSON."""
+    _setup_django()
+    import random
+    from decimal import Decimal
+    from django.db import OperationalError, close_old_connections
+    from django.contrib.auth.models import User
+    from Texcore.models import Materia
+    from Texcore.services import dashboard_service, preparacion_service
+
+    preparador = User.objects.get(username='bench_preparador')
+    materia_ids = list(Materia.objects.values_list('id', flat=True))
+
+    time.sleep(max(0.0, inicio - time.time()))
+    fin = time.time() + segundos
+    operaciones = errores = 0
+    while time.time() < fin:
+        try:
+            if rol == 'escritura':
+                materia = Materia.objects.get(pk=random.choice(materia_ids))
+                preparacion = preparacion_service.crear_preparacion(
+                    materia_prima=materia,
+                    tipo_proceso='limpieza',
+                    cantidad_procesada=Decimal('1.00'),
+                    usuario_preparador=preparador,
+                )
+                preparacion_service.iniciar_preparacion_proceso(preparacion, preparador)
+                preparacion_service.completar_preparacion_proceso(preparacion, preparador)
+            else:
+                stats = dashboard_service.get_admin_dashboard_stats()
+                # Force evaluation of the lazy querysets, like the template would
+                for valor in stats.values():
+                    if hasattr(valor, '__iter__') and not isinstance(valor, (str, dict)):
+                        list(valor)
+            operaciones += 1
+        except OperationalError:
+            errores += 1
+            close_old_connections()
+
+    print(json.dumps({'rol': rol, 'operaciones': operaciones, 'errores': errores}))
+
+
+def ejecutar_escenario(nombre: str, env_extra: dict, args) -> dict:
+    """Prepare a fresh database and run all workers against it."""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='LoginCRUD.settings.production', **env_extra)
+    script = os.path.abspath(__file__)
+
+    subprocess.run([sys.executable, script, '--preparar', '--registros', str(args.registros)],
+                   env=env, check=True)
+
+    inicio = time.time() + 2  # let every process finish django.setup()
+    procesos = []
+    for i in range(args.workers):
+        rol = 'escritura' if i < args.escritores else 'lectura'
+        procesos.append(subprocess.Popen(
+            [sys.executable, script, '--trabajador', rol,
+             '--segundos', str(args.segundos), '--inicio', str(inicio)],
+            env=env, stdout=subprocess.PIPE, text=True,
+        ))
+
+    totales = {'escritura': [0, 0], 'lectura': [0, 0]}
+    for proceso in procesos:
+        salida, _ = proceso.communicate()
+        resultado = json.loads(salida.strip().splitlines()[-1])
+        totales[resultado['rol']][0] += resultado['operaciones']
+        totales[resultado['rol']][1] += resultado['errores']
+
+    return {
+        'escenario': nombre,
+        'escrituras_s': totales['escritura'][0] / args.segundos,
+        'lecturas_s': totales['lectura'][0] / args.segundos,
+        'errores': totales['escritura'][1] + totales['lectura'][1],
+    }
+
+
+def escenarios(args, directorio: str):
+    """Yield (name, environment) pairs for every configuration to compare."""
+    yield 'sqlite sin tuning', {
+        'SQLITE_PATH': os.path.join(directorio, 'sin_tuning.sqlite3'),
+        'SQLITE_TUNING': 'False',
+    }
+    yield 'sqlite con tuning', {
+        'SQLITE_PATH': os.path.join(directorio, 'con_tuning.sqlite3'),
+        'SQLITE_TUNING': 'True',
+    }
+    if args.postgres_db:
+        yield 'postgresql (pool)', {
+            'DATABASE_ENGINE': 'postgresql',
+            'POSTGRES_DB': args.postgres_db,
+            'REPORTING_DB': 'off',
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--escritores', type=int, default=1)
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--registros', type=int, default=500)
+    parser.add_argument('--postgres-db', help='Base PostgreSQL desechable para comparar (se vacía)')
+    parser.add_argument('--preparar', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--trabajador', choices=['lectura', 'escritura'], help=argparse.SUPPRESS)
+    parser.add_argument('--inicio', type=float, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.preparar:
+        return preparar(args.registros)
+    if args.trabajador:
+        return trabajador(args.trabajador, args.segundos, args.inicio)
+
+    print(f'{args.workers} workers ({args.escritores} escritores), {args.segundos}s por escenario')
+    print(f'{"escenario":<24}{"escrituras/s":>14}{"lecturas/s":>12}{"errores":>10}')
+    with tempfile.TemporaryDirectory() as directorio:
+        for nombre, env_extra in escenarios(args, directorio):
+            r = ejecutar_escenario(nombre, env_extra, args)
+            print(f'{r["escenario"]:<24}{r["escrituras_s"]:>14.1f}{r["lecturas_s"]:>12.1f}{r["errores"]:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""
+XLSX export benchmark: write-only workbook vs a workbook built in memory.
+
+Seeds a scratch database with N spinning processes and writes the report
+sheet of exportar_reporte_hilaturas_xlsx (exportar_hilaturas() rows) twice,
+each in its own process: with escribir_xlsx(), the write-only workbook the
+view uses, and with a plain openpyxl Workbook that keeps a cell object per
+value until it is saved. Both read the same values_list() rows; only the
+writer changes. Reports wall time, peak RSS growth over the process after
+Django setup, and file size.
+
+Usage:
+    python benchmarks/exportar_xlsx.py --filas 100000 1000000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+MODOS = ['escritura', 'memoria']
+LOTE = 10_000
+
+
+def _setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LoginCRUD.settings.production')
+    os.environ.setdefault('REPORTING_DB', 'off')
+    import django
+    django.setup()
+
+
+def _rss_mib() -> float:
+    """Peak resident set size of this process so far (ru_maxrss is KiB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def sembrar(filas: int) -> None:
+    """Create the schema and `filas` spinning processes, inserted in batches."""
+    from django.core.management import call_command
+    from django.contrib.auth.models import User
+    from Texcore.models import Materia, PreparacionMateria, ProcesoHilatura
+
+    call_command('migrate', verbosity=0, interactive=False)
+    operario = User.objects.create_user('bench_operario', password='bench')
+    materia = Materia.objects.create(tipo='Algodón', cantidad=10_000, lote='B-1', usuario_registro=operario)
+    preparaciones = PreparacionMateria.objects.bulk_create([
+        PreparacionMateria(materia_prima=materia, tipo_proceso='limpieza', cantidad_procesada=10,
+                           estado='completada', usuario_preparador=operario)
+        for _ in range(100)
+    ])
+    estados = ['pendiente', 'en_proceso', 'completada']
+    etapas = ['cardado', 'peinado', 'hilado']
+    for inicio in range(0, filas, LOTE):
+        ProcesoHilatura.objects.bulk_create([
+            ProcesoHilatura(preparacion_origen=preparaciones[i % 100], etapa=etapas[i % 3],
+                            estado=estados[i % 3], cantidad_fibra_entrada=10, cantidad_hilo_salida=9,
+                            titulo_hilo='Ne 30/1', torsion=800, resistencia=15,
+                            observaciones='Observación de prueba ' * 3, usuario_operador=operario)
+            for i in range(inicio, min(inicio + LOTE, filas))
+        ])
+
+
+def medir(modo: str) -> dict:
+    """Write the report sheet with one writer; return time, RSS growth and size."""
+    from openpyxl import Workbook
+    from Texcore.services import exportacion_service
+    from Texcore.streaming import _celda_xlsx, escribir_xlsx
+
+    base = _rss_mib()
+    inicio = time.perf_counter()
+    encabezados, filas = exportacion_service.exportar_hilaturas()
+    with tempfile.TemporaryFile() as archivo:
+        if modo == 'escritura':
+            escribir_xlsx(archivo, [('Procesos', encabezados, filas)])
+        else:
+            libro = Workbook()
+            hoja = libro.active
+            hoja.title = 'Procesos'
+            hoja.append(encabezados)
+            for fila in filas:
+                hoja.append([_celda_xlsx(hoja, valor) for valor in fila])
+            libro.save(archivo)
+        tamano = archivo.tell()
+    return {
+        'segundos': time.perf_counter() - inicio,
+        'rss_mib': _rss_mib() - base,
+        'mib': tamano / 2**20,
+    }
+
+
+def _hijo(argumentos: list) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, __file__, *argumentos],
+                          capture_output=True, text=True, env=os.environ.copy())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, nargs='+', default=[100_000], help='Procesos sembrados por medición')
+    parser.add_argument('--sembrar', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--medir', choices=MODOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.sembrar is not None or args.medir:
+        _setup_django()
+        if args.sembrar is not None:
+            sembrar(args.sembrar)
+        else:
+            print(json.dumps(medir(args.medir)))
+        return
+
+    print(f'{"filas":>9}{"escritor":>11}{"s":>9}{"RSS MiB":>10}{"archivo MiB":>13}')
+    for filas in args.filas:
+        with tempfile.TemporaryDirectory() as directorio:
+            os.environ['SQLITE_PATH'] = os.path.join(directorio, 'xlsx.sqlite3')
+            semilla = _hijo(['--sembrar', str(filas)])
+            if semilla.returncode:
+                raise SystemExit(semilla.stderr)
+            for modo in MODOS:
+                resultado = _hijo(['--medir', modo])
+                if resultado.returncode:
+                    # e.g. -9: killed by the OOM killer
+                    print(f'{filas:>9}{modo:>11}   falló (código {resultado.returncode})', flush=True)
+                    continue
+                medida = json.loads(resultado.stdout)
+                print(f'{filas:>9}{modo:>11}{medida["segundos"]:>9.1f}'
+                      f'{medida["rss_mib"]:>10.1f}{medida["mib"]:>13.1f}', flush=True)
+    print('escritura: escribir_xlsx() (write-only); memoria: openpyxl Workbook() guardado al final')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+Polling client benchmark for the list and detail pages.
+
+Simulates a shop-floor tablet that reloads the same page over and over while
+nothing changes. The "antes" client sends no validators, so every poll renders
+the full page; the "despues" client sends the ETag of its last response back
+in If-None-Match and gets 304 Not Modified. Prints polls per second, bytes and
+SQL queries per poll for each page.
+
+Usage:
+    python benchmarks/polling.py --segundos 5 --registros 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def _setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LoginCRUD.settings.production')
+    import django
+    django.setup()
+
+
+def preparar(registros: int):
+    """Create the schema and seed data; return the user and the detail ids."""
+    from django.core.management import call_command
+    from django.contrib.auth.models import User
+    from Texcore.models import Materia, PreparacionMateria, ProcesoHilatura
+
+    call_command('migrate', verbosity=0, interactive=False)
+    admin = User.objects.create_user('bench_admin', password='bench')
+    admin.profile.role = 'admin'
+    admin.profile.save()
+    materias = Materia.objects.bulk_create([
+        Materia(tipo=f'Tipo {i % 12}', cantidad=1000, unidad_medida='kg',
+                lote=f'B-{i}', usuario_registro=admin)
+        for i in range(max(1, registros // 10))
+    ])
+    preparaciones = PreparacionMateria.objects.bulk_create([
+        PreparacionMateria(materia_prima=materias[i % len(materias)], tipo_proceso='limpieza',
+                           cantidad_procesada=1, estado='completada', usuario_preparador=admin)
+        for i in range(registros)
+    ])
+    hilaturas = ProcesoHilatura.objects.bulk_create([
+        ProcesoHilatura(preparacion_origen=preparaciones[i], cantidad_fibra_entrada=1,
+                        usuario_operador=admin)
+        for i in range(registros)
+    ])
+    return admin, preparaciones[0].pk, hilaturas[0].pk
+
+
+def sondear(cliente, url: str, segundos: float, condicional: bool) -> dict:
+    """Poll one URL for `segundos` and return the averages."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    etag = None
+    sondeos = bytes_totales = consultas = 0
+    fin = time.perf_counter() + segundos
+    while time.perf_counter() < fin:
+        cabeceras = {'HTTP_IF_NONE_MATCH': etag} if condicional and etag else {}
+        with CaptureQueriesContext(connection) as capturadas:
+            respuesta = cliente.get(url, **cabeceras)
+        if respuesta.status_code not in (200, 304):
+            raise SystemExit(f'{url}: respuesta inesperada {respuesta.status_code}')
+        etag = respuesta.get('ETag', etag)
+        sondeos += 1
+        bytes_totales += len(respuesta.content)
+        consultas += len(capturadas)
+    return {
+        'sondeos_s': sondeos / segundos,
+        'bytes': bytes_totales / sondeos,
+        'consultas': consultas / sondeos,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--segundos', type=float, default=5, help='Duración de cada medición')
+    parser.add_argument('--registros', type=int, default=2000, help='Preparaciones e hilaturas sembradas')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        os.environ['SQLITE_PATH'] = os.path.join(directorio, 'polling.sqlite3')
+        os.environ.setdefault('REPORTING_DB', 'off')
+        _setup_django()
+        from django.test import Client
+        from django.test.utils import setup_test_environment
+        from django.urls import reverse
+
+        setup_test_environment()  # allows the 'testserver' host
+        admin, preparacion_id, hilatura_id = preparar(args.registros)
+        cliente = Client()
+        cliente.force_login(admin)
+
+        paginas = [
+            ('listar_preparaciones', reverse('listar_preparaciones')),
+            ('detalle_preparacion', reverse('detalle_preparacion', args=[preparacion_id])),
+            ('listar_hilaturas', reverse('listar_hilaturas')),
+            ('detalle_hilatura', reverse('detalle_hilatura', args=[hilatura_id])),
+        ]
+        print(f'{args.registros} registros, {args.segundos}s por medición')
+        print(f'{"página":<22}{"cliente":<10}{"sondeos/s":>11}{"bytes":>10}{"consultas":>11}')
+        for nombre, url in paginas:
+            for etiqueta, condicional in (('antes', False), ('despues', True)):
+                r = sondear(cliente, url, args.segundos, condicional)
+                print(f'{nombre:<22}{etiqueta:<10}{r["sondeos_s"]:>11.1f}'
+                      f'{r["bytes"]:>10.0f}{r["consultas"]:>11.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+"""
+Render-time benchmark for every page template, with and without the cached loader.
+
+Seeds a scratch database with many rows, requests every page once as the role
+that can see it and captures the context its view passed to the template.
+Then measures, per template, the parse cost that an engine with the plain
+loaders pays on every call (and a worker with the cached loader pays on its
+first request unless the templates are precompiled at boot) and the render
+time with that context. Queries the template makes lazily count as render
+time, like in production.
+
+Usage:
+    python benchmarks/render_plantillas.py --registros 2000 --repeticiones 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+CARGADORES = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def _setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LoginCRUD.settings.production')
+    import django
+    django.setup()
+
+
+def preparar(registros: int) -> dict:
+    """Create the schema and seed data; return the users and the ids used by the URLs."""
+    from django.core.management import call_command
+    from django.contrib.auth.models import User
+    from Texcore.models import (
+        Materia, PreparacionMateria, DetallePreparacion, ProcesoHilatura, DetalleHilatura
+    )
+
+    call_command('migrate', verbosity=0, interactive=False)
+    usuarios = {}
+    for rol in ('admin', 'preparador', 'operario'):
+        usuario = User.objects.create_user(f'bench_{rol}', password='bench',
+                                           first_name='Bench', last_name=rol.title())
+        usuario.profile.role = rol
+        usuario.profile.save()
+        usuarios[rol] = usuario
+
+    estados = ['pendiente', 'en_proceso', 'completada']
+    materias = Materia.objects.bulk_create([
+        Materia(tipo=f'Tipo {i % 12}', cantidad=1000, unidad_medida='kg',
+                lote=f'B-{i}', usuario_registro=usuarios['operario'])
+        for i in range(registros)
+    ])
+    preparaciones = PreparacionMateria.objects.bulk_create([
+        PreparacionMateria(materia_prima=materias[i], tipo_proceso='limpieza',
+                           cantidad_procesada=10, estado=estados[i % 3],
+                           observaciones='Observación de prueba ' * 5,
+                           usuario_preparador=usuarios['preparador'])
+        for i in range(registros)
+    ])
+    hilaturas = ProcesoHilatura.objects.bulk_create([
+        ProcesoHilatura(preparacion_origen=preparaciones[i], etapa='cardado', estado=estados[i % 3],
+                        cantidad_fibra_entrada=10, cantidad_hilo_salida=9,
+                        usuario_operador=usuarios['operario'])
+        for i in range(registros)
+    ])
+    DetallePreparacion.objects.bulk_create([
+        DetallePreparacion(preparacion=preparaciones[0], temperatura=20, humedad=50,
+                           tiempo_proceso=30, equipo_utilizado=f'Equipo {i}',
+                           notas_tecnicas='Nota técnica de prueba')
+        for i in range(50)
+    ])
+    DetalleHilatura.objects.bulk_create([
+        DetalleHilatura(hilatura=hilaturas[0], velocidad_maquina=100, numero_husos=400,
+                        maquina_hiladora=f'Hiladora {i}', notas_tecnicas='Nota técnica de prueba')
+        for i in range(50)
+    ])
+    call_command('recount', verbosity=0)
+    call_command('reconstruir_resumenes', verbosity=0)
+    return {
+        'usuarios': usuarios,
+        'materia': materias[0].pk,
+        'preparacion': preparaciones[0].pk,
+        'hilatura': hilaturas[0].pk,
+    }
+
+
+def paginas(datos: dict):
+    """Yield (role, url name, args) for every page that renders a template."""
+    yield None, 'login', []
+    for nombre in ('admin_dashboard', 'index_materia', 'listar_usuarios',
+                   'crear_usuario', 'listar_preparaciones', 'reporte_preparaciones',
+                   'listar_hilaturas', 'reporte_hilaturas'):
+        yield 'admin', nombre, []
+    yield 'admin', 'editar_usuario', [datos['usuarios']['operario'].pk]
+    yield 'admin', 'detalle_preparacion', [datos['preparacion']]
+    yield 'admin', 'detalle_hilatura', [datos['hilatura']]
+    yield 'preparador', 'preparador_dashboard', []
+    yield 'preparador', 'crear_preparacion', []
+    yield 'preparador', 'editar_preparacion', [datos['preparacion']]
+    yield 'preparador', 'agregar_detalle_preparacion', [datos['preparacion']]
+    yield 'operario', 'operario_dashboard', []
+    yield 'operario', 'crear_materia', []
+    yield 'operario', 'editar_materia', [datos['materia']]
+    yield 'operario', 'crear_hilatura', []
+    yield 'operario', 'editar_hilatura', [datos['hilatura']]
+    yield 'operario', 'agregar_detalle_hilatura', [datos['hilatura']]
+
+
+def capturar_contextos(datos: dict) -> dict:
+    """Request every page and keep {template name: flattened context}."""
+    from django.test import Client
+    from django.test.signals import template_rendered
+    from django.urls import reverse
+
+    contextos = {}
+    capturados = []
+
+    def al_renderizar(sender, template, context, **kwargs):
+        capturados.append((template.name, context.flatten()))
+
+    template_rendered.connect(al_renderizar)
+    try:
+        for rol, nombre, argumentos in paginas(datos):
+            cliente = Client()
+            if rol:
+                cliente.force_login(datos['usuarios'][rol])
+            capturados.clear()
+            respuesta = cliente.get(reverse(nombre, args=argumentos))
+            if respuesta.status_code != 200 or not capturados:
+                print(f'{nombre}: sin plantilla (HTTP {respuesta.status_code}), se omite')
+                continue
+            # The first signal is the page itself; parents and includes come after
+            plantilla, contexto = capturados[0]
+            contextos.setdefault(plantilla, contexto)
+    finally:
+        template_rendered.disconnect(al_renderizar)
+    return contextos
+
+
+def cadena_extends(motor, nombre: str) -> list:
+    """The template and the parents it extends, all parsed by its first render."""
+    from django.template.loader_tags import ExtendsNode
+
+    cadena = [nombre]
+    nodos = motor.get_template(nombre).nodelist.get_nodes_by_type(ExtendsNode)
+    while nodos and nodos[0].parent_name.var:
+        cadena.append(nodos[0].parent_name.var)
+        nodos = motor.get_template(cadena[-1]).nodelist.get_nodes_by_type(ExtendsNode)
+    return cadena
+
+
+def medir_parseo(motor, nombre: str, repeticiones: int) -> float:
+    """Average milliseconds of parsing a template and its parents (no cached loader)."""
+    cadena = cadena_extends(motor, nombre)
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for plantilla in cadena:
+            motor.get_template(plantilla)
+    return (time.perf_counter() - inicio) * 1000 / repeticiones
+
+
+def medir_render(plantilla, contexto: dict, repeticiones: int) -> float:
+    """Average milliseconds of rendering an already compiled template."""
+    from django.template import Context
+
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        plantilla.render(Context(contexto))
+    return (time.perf_counter() - inicio) * 1000 / repeticiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--registros', type=int, default=2000, help='Filas por tabla sembradas')
+    parser.add_argument('--repeticiones', type=int, default=20, help='Renders por plantilla y motor')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        os.environ['SQLITE_PATH'] = os.path.join(directorio, 'render.sqlite3')
+        os.environ.setdefault('REPORTING_DB', 'off')
+        os.environ.setdefault('DASHBOARD_CACHE', 'False')  # measure full renders, not cached fragments
+        _setup_django()
+        from django.template import Engine
+        from django.template.backends.django import get_installed_libraries
+        from django.test.utils import setup_test_environment, teardown_test_environment
+
+        datos = preparar(args.registros)
+        setup_test_environment()  # 'testserver' host and the template_rendered signal
+        contextos = capturar_contextos(datos)
+        teardown_test_environment()
+
+        librerias = get_installed_libraries()
+        sin_cache = Engine(loaders=CARGADORES, libraries=librerias)
+        con_cache = Engine(loaders=[('django.template.loaders.cached.Loader', CARGADORES)],
+                           libraries=librerias)
+        print(f'{args.registros} registros, {args.repeticiones} repeticiones (ms)')
+        print(f'{"plantilla":<36}{"parseo":>9}{"render":>9}{"parseo/frío":>13}')
+        totales = [0.0, 0.0]
+        for nombre, contexto in sorted(contextos.items()):
+            parseo = medir_parseo(sin_cache, nombre, args.repeticiones)
+            render = medir_render(con_cache.get_template(nombre), contexto, args.repeticiones)
+            totales[0] += parseo
+            totales[1] += render
+            print(f'{nombre:<36}{parseo:>9.2f}{render:>9.2f}{parseo / (parseo + render):>13.0%}')
+        print(f'{"total":<36}{totales[0]:>9.2f}{totales[1]:>9.2f}'
+              f'{totales[0] / (totales[0] + totales[1]):>13.0%}')
+        print('parseo/frío: parte del primer render de un worker sin precompilar que es parseo')
+
+
+if __name__ == '__main__':
+    main()
@@ -135,6 +135,34 @@ python init_data.py || {
     echo "⚠️ Sample data initialization failed, but continuing deployment..."
 }
 
+# Rebuild derived statistics (sample data is inserted without the services)
+echo "🧮 Rebuilding state counters and daily rollups..."
+python manage.py recount
+python manage.py reconstruir_resumenes
+
+# Read-only snapshot used by dashboards and reports, refreshed in background.
+# Same default as production.py: a snapshot only on SQLite, off otherwise.
+if [ "$(echo "${DATABASE_ENGINE:-sqlite}" | tr '[:upper:]' '[:lower:]')" = "sqlite" ]; then
+    REPORTING_DB_POR_DEFECTO=snapshot
+else
+    REPORTING_DB_POR_DEFECTO=off
+fi
+if [ "$(echo "${REPORTING_DB:-$REPORTING_DB_POR_DEFECTO}" | tr '[:upper:]' '[:lower:]')" = "snapshot" ]; then
+    echo "📊 Creating reporting snapshot..."
+    python manage.py refrescar_snapshot_reportes
+    python manage.py refrescar_snapshot_reportes --intervalo "${REPORTING_SNAPSHOT_INTERVAL:-300}" > /dev/null &
+fi
+
+# Columnar snapshot for analysts, refreshed in background when scheduled
+if [ -n "${ANALITICA_INTERVALO:-}" ]; then
+    echo "📈 Scheduling analytics snapshot every ${ANALITICA_INTERVALO}s..."
+    python manage.py exportar_analitica --intervalo "${ANALITICA_INTERVALO}" > /dev/null &
+fi
+
+# Fail before starting the workers if a template does not compile
+echo "🧩 Compiling templates..."
+python manage.py precompilar_plantillas
+
 # Start Gunicorn
 echo "Starting Gunicorn..."
 exec gunicorn LoginCRUD.wsgi:application \